@@ -1,5 +1,11 @@
-from app.gui import GUI
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Headless mode: never import the Tk GUI
+        from app.cli import main
+        sys.exit(main())
+
+    from app.gui import GUI
     gui = GUI()
-    gui.run()
\ No newline at end of file
+    gui.run()
@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from app.price_series import PriceSeries
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError, with_rate_limiter
+
+# Alpha Vantage free-tier quotas
+REQUESTS_PER_MINUTE = 5
+REQUESTS_PER_DAY = 25
+
+class QuotaExhaustedError(Exception):
+    """Raised when waiting for the next request slot would take longer than allowed."""
+
+class TokenBucket:
+    """
+    A bucket holding up to capacity tokens, refilled continuously over period seconds.
+    """
+    def __init__(self, capacity: float, period: float, now: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available."""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class RateLimiter:
+    """
+    Thread-safe limiter enforcing Alpha Vantage's per-minute and per-day request quotas.
+    """
+    def __init__(self, per_minute: int = REQUESTS_PER_MINUTE, per_day: int = REQUESTS_PER_DAY,
+                 max_wait: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.max_wait = max_wait
+        now = clock()
+        self.buckets = [TokenBucket(per_minute, 60.0, now), TokenBucket(per_day, 86400.0, now)]
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request may be sent, then use up one token from every bucket.
+
+        Raises:
+            QuotaExhaustedError: If the wait would exceed max_wait seconds.
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            self.sleep(wait)
+
+    def try_acquire(self) -> float:
+        """
+        Use up one token from every bucket if a request may be sent now, without blocking.
+
+        Returns:
+            float: 0 if the request may be sent, else the seconds until the next slot.
+
+        Raises:
+            QuotaExhaustedError: If the wait would exceed max_wait seconds.
+        """
+        with self.lock:
+            now = self.clock()
+            for bucket in self.buckets:
+                bucket.refill(now)
+            wait = max(bucket.wait_time() for bucket in self.buckets)
+            if wait == 0:
+                for bucket in self.buckets:
+                    bucket.tokens -= 1
+                return 0.0
+        if self.max_wait is not None and wait > self.max_wait:
+            raise QuotaExhaustedError(f"Next request slot is {wait:.0f} seconds away")
+        return wait
+
+    def penalize(self):
+        """Empty the per-minute bucket after the API reports throttling, so every worker backs off."""
+        with self.lock:
+            self.buckets[0].refill(self.clock())
+            self.buckets[0].tokens = min(self.buckets[0].tokens, 0.0)
+
+@dataclass
+class BatchResult:
+    symbol: str
+    series: Optional[PriceSeries] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.series is not None
+
+class BatchFetcher:
+    """
+    Fetches many symbols concurrently while sharing one rate limiter.
+    """
+    def __init__(self, fetcher: StockDataFetcher, rate_limiter: Optional[RateLimiter] = None,
+                 max_workers: int = 4, max_retries: int = 3, backoff: float = 2.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        # A paced copy, so the caller's fetcher does not keep the batch quota after the batch
+        self.fetcher = with_rate_limiter(fetcher, self.rate_limiter)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+    def fetch_one(self, symbol: str, date_start: datetime, date_end: datetime) -> BatchResult:
+        """
+        Fetch one symbol, retrying with exponential backoff on throttling and connection errors.
+        """
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                series = self.fetcher.fetch_daily_price_series(symbol, date_start, date_end)
+            except ThrottledError as e:
+                self.rate_limiter.penalize()
+                error = e
+            except requests.RequestException as e:
+                error = e
+            except Exception as e:
+                return BatchResult(symbol, error=e)
+            else:
+                if series is None:
+                    return BatchResult(symbol, error=ValueError(f"Failed to fetch stock data for {symbol}"))
+                return BatchResult(symbol, series)
+
+            if attempt < self.max_retries:
+                self.sleep(self.backoff * 2 ** attempt)
+        return BatchResult(symbol, error=error)
+
+    def fetch_many(self, symbols: Iterable[str], date_start: datetime, date_end: datetime) -> Iterator[BatchResult]:
+        """
+        Fetch several symbols concurrently.
+
+        Args:
+            symbols (Iterable[str]): The ticker symbols to fetch.
+            date_start (datetime): First date to include.
+            date_end (datetime): Last date to include.
+
+        Yields:
+            BatchResult: One result per symbol, in the order the fetches finish.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch_one, symbol, date_start, date_end) for symbol in symbols]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,343 @@
+import argparse
+import sys
+from datetime import date
+from typing import List, Optional
+
+from app.batch_fetcher import REQUESTS_PER_DAY, REQUESTS_PER_MINUTE, RateLimiter
+from app.config import API_KEY_ENV, resolve_api_key
+from app.instrumentation import PROFILE_ENV, profiling, profiling_from_env, report
+from app.memo import MemoCache
+from app.price_cache import CACHE_FORMATS, DEFAULT_CACHE_DIR
+from app.price_series import PRICE_COLUMNS
+from app.resample import parse_frequency
+from app.rule_expressions import parse_condition
+from app.spreadsheet_manager import SpreadSheetManager
+
+# Longest wait for a request slot in multi-symbol commands, in seconds: enough for the
+# per-minute quota, far too short for the daily one
+QUOTA_MAX_WAIT = 300.0
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+def frequency_argument(value: str) -> str:
+    try:
+        return parse_frequency(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app", description="Josh Hansen's Epic Stock Tracker")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="fetch prices and write the highlighted Excel report without the GUI")
+    run.add_argument("--symbols", nargs="+", required=True, help="ticker symbols to report on")
+    run.add_argument("--start", type=parse_date, required=True, help="first date, YYYY-MM-DD")
+    run.add_argument("--end", type=parse_date, required=True, help="last date, YYYY-MM-DD")
+    run.add_argument("--out", required=True,
+                     help="workbook to write, or a directory when --workbook-per-symbol is given")
+    add_rule_arguments(run)
+    add_frequency_argument(run)
+    run.add_argument("--rule", nargs=3, action="append", default=[], metavar=("EXPRESSION", "COLUMNS", "COLOR"),
+                     help="also highlight COLUMNS (comma-separated) in COLOR where EXPRESSION holds, e.g. "
+                          "--rule 'streak(3, up) and daily(2, up) or cumulative(10, 8)' close,percent_change green; "
+                          "later rules take precedence")
+    run.add_argument("--writer", choices=["streaming", "conditional", "pandas"], default="streaming",
+                     help="how a single-symbol workbook is written")
+    run.add_argument("--workbook-per-symbol", action="store_true",
+                     help="write one workbook per symbol instead of one sheet per symbol")
+    run.add_argument("--workers", type=int, default=None, help="worker processes for multi-symbol runs")
+    add_quota_arguments(run)
+    run.add_argument("--api-key", default=None, help=f"Alpha Vantage key; defaults to ${API_KEY_ENV} or api_key.txt")
+    add_cache_arguments(run)
+    run.add_argument("--update", action="store_true",
+                     help="append the days since the last row of an existing --out workbook instead of rewriting it; "
+                          "not available with --rule")
+    add_profile_arguments(run)
+    add_sweep_parser(commands)
+    add_screen_parser(commands)
+    add_monitor_parser(commands)
+    return parser
+
+def add_rule_arguments(command):
+    command.add_argument("--consecutive-days", type=int, default=5)
+    command.add_argument("--daily-threshold", type=float, default=2.5, help="daily percent threshold")
+    command.add_argument("--period-threshold", type=float, default=5.0, help="period percent threshold")
+    command.add_argument("--period-days", type=int, default=5)
+
+def add_frequency_argument(command):
+    command.add_argument("--frequency", type=frequency_argument, default="daily",
+                         help="aggregate daily bars into weekly, monthly or N-day (e.g. 3d) bars first; "
+                              "day counts then count bars")
+
+def add_sweep_parser(commands):
+    sweep = commands.add_parser("sweep", help="count the days every combination of rule parameters would highlight")
+    sweep.add_argument("--symbol", required=True, help="ticker symbol to sweep")
+    sweep.add_argument("--start", type=parse_date, required=True, help="first date, YYYY-MM-DD")
+    sweep.add_argument("--end", type=parse_date, required=True, help="last date, YYYY-MM-DD")
+    sweep.add_argument("--out", required=True, help="summary workbook to write")
+    sweep.add_argument("--days", type=int, nargs="+", default=list(range(2, 11)),
+                       help="streak and window lengths to try")
+    sweep.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 1, 1.5, 2, 2.5, 3, 4, 5],
+                       help="daily percent thresholds to try")
+    sweep.add_argument("--period-thresholds", type=float, nargs="+", default=None,
+                       help="cumulative percent thresholds to try; defaults to --thresholds")
+    add_frequency_argument(sweep)
+    sweep.add_argument("--api-key", default=None, help=f"Alpha Vantage key; defaults to ${API_KEY_ENV} or api_key.txt")
+    add_cache_arguments(sweep)
+    add_profile_arguments(sweep)
+
+def add_screen_parser(commands):
+    screen = commands.add_parser("screen", help="rank the symbols whose last day triggers a report rule")
+    symbols = screen.add_mutually_exclusive_group(required=True)
+    symbols.add_argument("--symbols", nargs="+", help="ticker symbols to screen")
+    symbols.add_argument("--symbols-file", metavar="FILE", help="file with one ticker symbol per line")
+    screen.add_argument("--start", type=parse_date, required=True, help="first date, YYYY-MM-DD")
+    screen.add_argument("--end", type=parse_date, required=True, help="last date, YYYY-MM-DD")
+    screen.add_argument("--out", required=True, help="workbook of ranked matches to write")
+    add_rule_arguments(screen)
+    add_frequency_argument(screen)
+    add_quota_arguments(screen)
+    screen.add_argument("--api-key", default=None, help=f"Alpha Vantage key; defaults to ${API_KEY_ENV} or api_key.txt")
+    add_cache_arguments(screen)
+    add_profile_arguments(screen)
+
+def add_monitor_parser(commands):
+    monitor = commands.add_parser("monitor", help="poll a watchlist and alert when a report rule highlights a new day")
+    symbols = monitor.add_mutually_exclusive_group(required=True)
+    symbols.add_argument("--symbols", nargs="+", help="ticker symbols to watch")
+    symbols.add_argument("--symbols-file", metavar="FILE", help="file with one ticker symbol per line")
+    add_rule_arguments(monitor)
+    monitor.add_argument("--interval", type=float, default=900.0, help="seconds between polls of the watchlist")
+    monitor.add_argument("--cycles", type=int, default=None, help="stop after this many polls")
+    add_quota_arguments(monitor)
+    monitor.add_argument("--json-log", metavar="FILE", help="append alerts to this file as JSON lines")
+    monitor.add_argument("--sqlite", metavar="FILE", help="record alerts in this SQLite database")
+    monitor.add_argument("--webhook", metavar="URL", help="POST each poll's alerts to this URL")
+    monitor.add_argument("--api-key", default=None, help=f"Alpha Vantage key; defaults to ${API_KEY_ENV} or api_key.txt")
+
+def add_quota_arguments(command):
+    command.add_argument("--per-minute", type=int, default=REQUESTS_PER_MINUTE, help="API requests allowed per minute")
+    command.add_argument("--per-day", type=int, default=REQUESTS_PER_DAY, help="API requests allowed per day")
+
+def add_cache_arguments(command):
+    command.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="where downloaded prices are cached")
+    command.add_argument("--cache-format", choices=sorted(CACHE_FORMATS), default="npz",
+                         help="memmap keeps long histories on disk and pages in only the dates used")
+    command.add_argument("--no-cache", action="store_true", help="always download prices")
+    command.add_argument("--memo-dir", default=None,
+                         help="also keep derived values (percent changes, streaks, rule masks) here, "
+                              "so later runs over the same prices reuse them")
+
+def add_profile_arguments(command):
+    command.add_argument("--profile", action="store_true",
+                         help=f"print per-stage timings, rows, bytes and peak memory to stderr (or set ${PROFILE_ENV})")
+    command.add_argument("--profile-json", metavar="FILE", help="also write the per-stage summary as JSON")
+    command.add_argument("--profile-memory", action="store_true",
+                         help="include peak allocations per stage; slows the workbook writers noticeably")
+    command.add_argument("--cprofile", metavar="FILE", help="write a cProfile dump of the run")
+
+def build_user_input(args: argparse.Namespace) -> dict:
+    """Translate command-line arguments into the input dict the GUI would produce."""
+    return {
+        "symbol": args.symbols[0],
+        "start_date": args.start,
+        "end_date": args.end,
+        "consecutive_change": {"days": args.consecutive_days},
+        "daily_threshold": {"percent": args.daily_threshold},
+        "period_change": {"percent": args.period_threshold, "days": args.period_days},
+        "file_path": args.out,
+        "writer": args.writer,
+        "frequency": args.frequency,
+        "custom_rules": [
+            {"expression": expression, "columns": columns.split(","), "background_color": color}
+            for expression, columns, color in args.rule
+        ],
+    }
+
+def rule_errors(rules: List[List[str]]) -> List[str]:
+    """Problems with --rule arguments, checked before anything is fetched."""
+    if not rules:
+        return []
+    from app.excel_writer import color_map
+
+    errors = []
+    for expression, columns, color in rules:
+        try:
+            parse_condition(expression)
+        except ValueError as e:
+            errors.append(str(e))
+        unknown = [column for column in columns.split(",") if column not in PRICE_COLUMNS + ("percent_change",)]
+        if unknown:
+            errors.append(f"unknown column {', '.join(unknown)} in --rule; choose from "
+                          f"{', '.join(PRICE_COLUMNS + ('percent_change',))}")
+        if color not in color_map:
+            errors.append(f"unknown color {color!r} in --rule; choose from {', '.join(color_map)}")
+    return errors
+
+def batch_rate_limiter(args: argparse.Namespace, symbols: List[str]) -> RateLimiter:
+    """
+    The rate limiter for a multi-symbol command, with a warning when the symbols outnumber the daily quota.
+
+    Instead of blocking for hours once the quota is used, a request whose slot is more than
+    QUOTA_MAX_WAIT seconds away fails and its symbol is reported with the other errors.
+    """
+    if len(symbols) > args.per_day:
+        print(f"warning: {len(symbols)} symbols but only {args.per_day} requests allowed per day (--per-day); "
+              f"symbols not already cached will fail once the quota is used", file=sys.stderr)
+    return RateLimiter(args.per_minute, args.per_day, max_wait=QUOTA_MAX_WAIT)
+
+def run(args: argparse.Namespace) -> int:
+    """Check the arguments shared by every command, then run the command, profiled if asked."""
+    api_key = resolve_api_key(args.api_key)
+    if not api_key:
+        print(f"No API key: pass --api-key, set {API_KEY_ENV} or create api_key.txt", file=sys.stderr)
+        return 2
+    if args.start >= args.end:
+        print("--end must be after --start", file=sys.stderr)
+        return 2
+
+    manager = SpreadSheetManager(api_key, cache_dir=None if args.no_cache else args.cache_dir,
+                                 cache_format=args.cache_format,
+                                 memo=MemoCache(disk_dir=args.memo_dir) if args.memo_dir else None)
+    command = {"sweep": run_sweep, "screen": run_screen}.get(args.command, run_reports)
+    if not (args.profile or args.profile_json or args.profile_memory or args.cprofile):
+        with profiling_from_env():
+            return command(manager, args)
+
+    with profiling(args.profile_memory, args.cprofile) as recorder:
+        code = command(manager, args)
+    report(recorder, args.profile_json)
+    return code
+
+def run_reports(manager: SpreadSheetManager, args: argparse.Namespace) -> int:
+    errors = rule_errors(args.rule)
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+        return 2
+    user_input = build_user_input(args)
+
+    if args.update:
+        if len(args.symbols) != 1 or args.workbook_per_symbol or args.writer == "conditional" or args.frequency != "daily":
+            print("--update works on a single-symbol daily streaming or pandas workbook", file=sys.stderr)
+            return 2
+        if args.rule:
+            print("--update cannot be combined with --rule: custom rules are only evaluated over the whole "
+                  "series, so regenerate the report instead", file=sys.stderr)
+            return 2
+        try:
+            update = manager.update_excel_file(user_input)
+        except Exception as e:
+            print(f"{args.symbols[0]}: {e}", file=sys.stderr)
+            return 1
+        print(f"{args.out}: {update.rows_appended} rows appended, {len(update.highlighted_dates)} dates newly highlighted")
+        for day in update.highlighted_dates:
+            print(f"  {day.isoformat()}")
+        return 0
+
+    if len(args.symbols) == 1 and not args.workbook_per_symbol:
+        try:
+            print(manager.create_excel_file(user_input))
+        except Exception as e:
+            print(f"{args.symbols[0]}: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    batch = manager.create_batch_report(args.symbols, user_input, one_workbook_per_symbol=args.workbook_per_symbol,
+                                        max_workers=args.workers, rate_limiter=batch_rate_limiter(args, args.symbols))
+    for file_name in batch.files:
+        print(file_name)
+    for symbol, error in batch.errors.items():
+        print(f"{symbol}: {error}", file=sys.stderr)
+    return 1 if batch.errors else 0
+
+def run_sweep(manager: SpreadSheetManager, args: argparse.Namespace) -> int:
+    user_input = {
+        "symbol": args.symbol,
+        "start_date": args.start,
+        "end_date": args.end,
+        "file_path": args.out,
+        "frequency": args.frequency,
+        "sweep": {"num_days": args.days, "thresholds": args.thresholds, "period_thresholds": args.period_thresholds},
+    }
+    try:
+        print(manager.create_sweep_file(user_input))
+    except Exception as e:
+        print(f"{args.symbol}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def read_symbols(args: argparse.Namespace) -> List[str]:
+    """The symbols given with --symbols, or read from --symbols-file skipping blank and # lines."""
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return args.symbols
+
+def run_screen(manager: SpreadSheetManager, args: argparse.Namespace) -> int:
+    symbols = read_symbols(args)
+    user_input = {
+        "start_date": args.start,
+        "end_date": args.end,
+        "consecutive_change": {"days": args.consecutive_days},
+        "daily_threshold": {"percent": args.daily_threshold},
+        "period_change": {"percent": args.period_threshold, "days": args.period_days},
+        "file_path": args.out,
+        "frequency": args.frequency,
+    }
+    screen = manager.create_screen_file(symbols, user_input, rate_limiter=batch_rate_limiter(args, symbols))
+    for file_name in screen.files:
+        print(file_name)
+    for symbol, error in screen.errors.items():
+        print(f"{symbol}: {error}", file=sys.stderr)
+    return 1 if screen.errors else 0
+
+def run_monitor(args: argparse.Namespace) -> int:
+    """Poll the watchlist until --cycles polls have run or the process is interrupted."""
+    import asyncio
+    from app.monitor import FetcherQuoteSource, JsonLogSink, SQLiteSink, WatchlistMonitor, WebhookSink
+    from app.stock_data_fetcher import StockDataFetcher
+
+    api_key = resolve_api_key(args.api_key)
+    if not api_key:
+        print(f"No API key: pass --api-key, set {API_KEY_ENV} or create api_key.txt", file=sys.stderr)
+        return 2
+    rules = SpreadSheetManager.build_formatting_rules({
+        "consecutive_change": {"days": args.consecutive_days},
+        "daily_threshold": {"percent": args.daily_threshold},
+        "period_change": {"percent": args.period_threshold, "days": args.period_days},
+    })
+    sinks = []
+    if args.json_log:
+        sinks.append(JsonLogSink(args.json_log))
+    if args.sqlite:
+        sinks.append(SQLiteSink(args.sqlite))
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+    source = FetcherQuoteSource(StockDataFetcher(api_key), RateLimiter(args.per_minute, args.per_day))
+    monitor = WatchlistMonitor(read_symbols(args), rules, source, sinks, interval=args.interval)
+
+    def show(cycle):
+        for alert in cycle.alerts:
+            direction = alert.params.get("direction")
+            print(f"{alert.day.isoformat()} {alert.symbol} {alert.kind}" + (f" ({direction})" if direction else "")
+                  + f" close={alert.close:g}", flush=True)
+        for name, error in cycle.errors.items():
+            print(f"{name}: {error}", file=sys.stderr)
+
+    try:
+        asyncio.run(monitor.run(cycles=args.cycles, on_cycle=show))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command in ("run", "sweep", "screen"):
+        return run(args)
+    if args.command == "monitor":
+        return run_monitor(args)
+    return 2
@@ -0,0 +1,175 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from app.excel_writer import SHEET_COLUMNS, StyleKey, color_map, discard_workbook, render_sheet, write_sheet
+from app.formatting import FormattingRule
+from app.instrumentation import span
+from app.price_series import PriceSeries
+
+FIRST_DATA_ROW = 2
+# Excel rejects formulas longer than 8192 characters
+MAX_FORMULA_LENGTH = 8192
+
+@dataclass
+class ConditionalRule:
+    """
+    A formatting rule translated into an Excel formula.
+
+    The formula is written for the top row of the data and uses relative row references,
+    so Excel re-evaluates it for every row of the range. parameter is the value the formula
+    reads from its parameter cell, with label describing it on the sheet.
+    """
+    rule: FormattingRule
+    formula: str
+    label: Optional[str] = None
+    parameter: Optional[float] = None
+
+def column_letter(column: str) -> str:
+    """Sheet column letter of a data column; column A holds the dates."""
+    return get_column_letter(SHEET_COLUMNS.index(column) + 2)
+
+def row_offset(offset: int) -> str:
+    """ROW() shifted by offset rows, e.g. 'ROW()-2'."""
+    if offset == 0:
+        return 'ROW()'
+    return f'ROW(){offset:+d}'
+
+def any_window(terms: List[str]) -> str:
+    return terms[0] if len(terms) == 1 else f"OR({','.join(terms)})"
+
+def threshold_formula(percent_threshold_cell: str, direction: str) -> str:
+    cell = f"${column_letter('percent_change')}{FIRST_DATA_ROW}"
+    comparison = f">={percent_threshold_cell}" if direction == 'positive' else f"<=-{percent_threshold_cell}"
+    return f"AND(ISNUMBER({cell}),{cell}{comparison})"
+
+def consecutive_formula(num_days: int, direction: str) -> str:
+    """
+    True when the row is inside some num_days window whose percent changes all have the given sign.
+
+    Only numbers are counted, so an empty percent change breaks the window as NaN does in Python.
+    """
+    column = f"${column_letter('percent_change')}:${column_letter('percent_change')}"
+    comparison = '>0' if direction == 'positive' else '<0'
+    terms = []
+    for k in range(num_days):
+        window = f"INDEX({column},{row_offset(-k)}):INDEX({column},{row_offset(num_days - 1 - k)})"
+        count = f"SUMPRODUCT(ISNUMBER({window})*({window}{comparison}))={num_days}"
+        terms.append(count if k == 0 else f"IF({row_offset(-k)}<{FIRST_DATA_ROW},FALSE,{count})")
+    return any_window(terms)
+
+def cumulative_formula(num_days: int, percent_threshold_cell: str, last_row: int) -> str:
+    """
+    True when the row is inside some num_days window whose close-to-close change reaches the threshold.
+
+    As in Python, a window with an empty close never matches, unless its first close is 0.
+    """
+    column = f"${column_letter('close')}:${column_letter('close')}"
+    terms = []
+    for k in range(num_days):
+        start = f"INDEX({column},{row_offset(-k)})"
+        end = f"INDEX({column},{row_offset(num_days - 1 - k)})"
+        change = f"IF({start}=0,0,({end}-{start})/{start}*100)"
+        outside = f"OR({row_offset(-k)}<{FIRST_DATA_ROW},{row_offset(num_days - 1 - k)}>{last_row})"
+        missing = f"OR(NOT(ISNUMBER({start})),AND({start}<>0,NOT(ISNUMBER({end}))))"
+        terms.append(f"IF({outside},FALSE,IF({missing},FALSE,ABS({change})>=ABS({percent_threshold_cell})))")
+    return any_window(terms)
+
+def translate_rule(rule: FormattingRule, last_row: int, parameter_cell: str) -> Optional[ConditionalRule]:
+    """
+    Translate a factory-built rule into a conditional-formatting formula.
+
+    Args:
+        rule (FormattingRule): The rule to translate.
+        last_row (int): The last data row on the sheet.
+        parameter_cell (str): Absolute reference of the cell that will hold the rule's threshold.
+
+    Returns:
+        Optional[ConditionalRule]: The translation, or None if the rule has no formula equivalent.
+    """
+    params = rule.params
+    color = rule.format_style.background_color
+    if rule.kind == 'threshold_change':
+        formula = threshold_formula(parameter_cell, params['direction'])
+        translated = ConditionalRule(rule, formula, f"Daily {params['direction']} change % ({color})",
+                                     params['percent_threshold'])
+    elif rule.kind == 'consecutive_change' and params['num_days'] >= 1:
+        translated = ConditionalRule(rule, consecutive_formula(params['num_days'], params['direction']))
+    elif rule.kind == 'cumulative_change' and params['num_days'] >= 1:
+        formula = cumulative_formula(params['num_days'], parameter_cell, last_row)
+        translated = ConditionalRule(rule, formula, f"{params['num_days']}-day cumulative change % ({color})",
+                                     params['percent_threshold'])
+    else:
+        return None
+    if len(translated.formula) > MAX_FORMULA_LENGTH:
+        return None
+    return translated
+
+def write_conditional_workbook(file_name: str, series: PriceSeries, rules: Sequence[FormattingRule],
+                               title: str = 'Stock Data') -> str:
+    """
+    Write prices with formatting rules exported as native Excel conditional formatting.
+
+    Threshold, consecutive and cumulative rules become one formula rule per range. Their thresholds
+    live in a parameter block beside the data, so they can be changed in Excel. Rules without a
+    formula equivalent are evaluated here and written as static fills, which Excel draws beneath
+    any conditional format. If writing fails, the streamed sheet is discarded.
+
+    Args:
+        file_name (str): Path of the workbook to create.
+        series (PriceSeries): The prices to write.
+        rules (Sequence[FormattingRule]): Formatting rules; later rules take precedence.
+        title (str): The worksheet title.
+
+    Returns:
+        str: The file name.
+    """
+    last_row = FIRST_DATA_ROW + len(series) - 1
+    parameter_column = get_column_letter(len(SHEET_COLUMNS) + 4)
+    side_rows: List[List[Any]] = [["Parameter", "Value"]]
+    translated: List[ConditionalRule] = []
+    static_rules: List[FormattingRule] = []
+
+    for rule in rules:
+        parameter_cell = f"${parameter_column}${len(side_rows) + 1}"
+        conditional = translate_rule(rule, last_row, parameter_cell)
+        if conditional is None:
+            static_rules.append(rule)
+            continue
+        translated.append(conditional)
+        if conditional.label is not None:
+            side_rows.append([conditional.label, conditional.parameter])
+
+    workbook = Workbook(write_only=True)
+    registered: Dict[StyleKey, str] = {}
+    sheet = render_sheet(series, static_rules, title)
+    try:
+        with span('write.rows') as record:
+            worksheet = write_sheet(workbook, sheet, registered, side_rows if len(side_rows) > 1 else ())
+            record.add(rows=len(series))
+
+        # openpyxl numbers rules in the order they are added and Excel gives the lowest number
+        # precedence, so add the last rule first to keep later rules on top
+        for conditional in reversed(translated if len(series) > 0 else []):
+            style = conditional.rule.format_style
+            columns = style.columns if isinstance(style.columns, list) else [style.columns]
+            ranges = ' '.join(f"{column_letter(column)}{FIRST_DATA_ROW}:{column_letter(column)}{last_row}"
+                              for column in columns)
+            worksheet.conditional_formatting.add(ranges, FormulaRule(
+                formula=[conditional.formula],
+                fill=PatternFill(start_color=color_map[style.background_color], end_color=color_map[style.background_color], fill_type="solid"),
+                font=Font(color=color_map[style.font_color], bold=style.bold),
+            ))
+
+        with span('write.save') as record:
+            workbook.save(file_name)
+            record.add(bytes=os.path.getsize(file_name))
+    except BaseException:
+        discard_workbook(workbook)
+        raise
+    return file_name
@@ -0,0 +1,29 @@
+import os
+from typing import Optional
+
+API_KEY_ENV = 'ALPHAVANTAGE_API_KEY'
+# Point the fetcher at another server, e.g. app.mock_server for offline load tests
+BASE_URL_ENV = 'ALPHAVANTAGE_BASE_URL'
+
+def get_api_key(file_path='api_key.txt'):
+    if os.path.exists(file_path):
+        with open(file_path, 'r') as file:
+            return file.read().strip()
+    return None
+
+def save_api_key(api_key, file_path='api_key.txt'):
+    with open(file_path, 'w') as file:
+        file.write(api_key)
+
+def resolve_api_key(api_key: Optional[str] = None, file_path: str = 'api_key.txt') -> Optional[str]:
+    """
+    Find the Alpha Vantage API key without prompting.
+
+    Args:
+        api_key (Optional[str]): A key given explicitly, e.g. on the command line.
+        file_path (str): The key file written by the GUI.
+
+    Returns:
+        Optional[str]: The explicit key, else the ALPHAVANTAGE_API_KEY environment variable, else the key file.
+    """
+    return api_key or os.environ.get(API_KEY_ENV) or get_api_key(file_path)
@@ -1,7 +1,11 @@
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Any, List, Dict, Tuple, Union
 from datetime import datetime
 
+from app.price_series import PriceSeries
+
+StockData = Union[PriceSeries, Dict[datetime, Dict[str, float]]]
+
 class DataProcessor:
     @staticmethod
     def calculate_percent_change(current_value: float, previous_value: float) -> float:
@@ -20,28 +24,58 @@ class DataProcessor:
         return ((current_value - previous_value) / previous_value) * 100
 
     @staticmethod
-    def calculate_daily_percent_changes(data: Dict[datetime, Dict[str, float]]) -> Dict[datetime, float]:
+    def sorted_dates_and_closes(data: StockData) -> Tuple[List[Any], np.ndarray]:
         """
-        Calculate daily percent changes for closing prices.
+        Get the sorted dates and matching closing prices of a series or legacy dict.
 
         Args:
-            data (Dict[datetime, Dict[str, float]]): Dictionary of dates and their stock data.
+            data (StockData): A PriceSeries or dictionary of dates and their stock data.
 
         Returns:
-            Dict[datetime, float]: Dictionary of dates and their percent changes.
+            Tuple[List[Any], np.ndarray]: The sorted dates (keys of the input for dicts) and their closing prices.
         """
+        if isinstance(data, PriceSeries):
+            return data.date_list(), data.close
         sorted_dates = sorted(key for key in data.keys() if key != 'stock_symbol')
-        percent_changes = {}
-        for i in range(1, len(sorted_dates)):
-            current_date = sorted_dates[i]
-            previous_date = sorted_dates[i-1]
-            current_close = data[current_date]['close']
-            previous_close = data[previous_date]['close']
-            
-            percent_changes[current_date] = DataProcessor.calculate_percent_change(current_close, previous_close)
-        
+        closes = np.array([data[date]['close'] for date in sorted_dates], dtype=np.float64)
+        return sorted_dates, closes
+
+    @staticmethod
+    def daily_percent_change_array(closes: np.ndarray) -> np.ndarray:
+        """
+        Calculate daily percent changes for an array of closing prices.
+
+        Args:
+            closes (np.ndarray): Closing prices sorted by date.
+
+        Returns:
+            np.ndarray: Percent change for each row, aligned with closes. The first row is NaN.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        percent_changes = np.full(closes.shape, np.nan)
+        if closes.size < 2:
+            return percent_changes
+        previous = closes[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = ((closes[1:] - previous) / previous) * 100
+        percent_changes[1:] = np.where(previous == 0, 0.0, changes)
         return percent_changes
 
+    @staticmethod
+    def calculate_daily_percent_changes(data: StockData) -> Dict[datetime, float]:
+        """
+        Calculate daily percent changes for closing prices.
+
+        Args:
+            data (StockData): A PriceSeries or dictionary of dates and their stock data.
+
+        Returns:
+            Dict[datetime, float]: Dictionary of dates and their percent changes.
+        """
+        sorted_dates, closes = DataProcessor.sorted_dates_and_closes(data)
+        percent_changes = DataProcessor.daily_percent_change_array(closes)
+        return dict(zip(sorted_dates[1:], percent_changes[1:].tolist()))
+
     @staticmethod
     def check_consecutive_changes(percent_changes: Dict[datetime, float], num_days: int, direction: str) -> Dict[datetime, bool]:
         """
@@ -56,21 +90,186 @@ class DataProcessor:
             Dict[datetime, bool]: Dictionary of dates and boolean indicating if the date is part of a consecutive change streak.
         """
         sorted_dates = sorted(percent_changes.keys())
-        result = {date: False for date in sorted_dates}
-        
-        for i in range(len(sorted_dates) - num_days + 1):
-            consecutive = True
-            for j in range(num_days):
-                change = percent_changes[sorted_dates[i+j]]
-                if (direction == 'positive' and change <= 0) or (direction == 'negative' and change >= 0):
-                    consecutive = False
-                    break
-            
-            if consecutive:
-                for j in range(num_days):
-                    result[sorted_dates[i+j]] = True
-        
-        return result
+        changes = np.array([percent_changes[date] for date in sorted_dates], dtype=np.float64)
+        result = DataProcessor.consecutive_change_mask(changes, num_days, direction)
+        return dict(zip(sorted_dates, result.tolist()))
+
+    @staticmethod
+    def mark_windows(window_starts: np.ndarray, num_days: int, length: int) -> np.ndarray:
+        """
+        Expand window start positions into a mask of every row covered by a window.
+
+        Args:
+            window_starts (np.ndarray): Boolean array, True where a num_days window starting at that row is selected.
+            num_days (int): Length of each window.
+            length (int): Number of rows in the resulting mask.
+
+        Returns:
+            np.ndarray: Boolean mask of length rows.
+        """
+        selected = np.asarray(window_starts, dtype=np.int64)
+        coverage = np.zeros(length + 1, dtype=np.int64)
+        coverage[:selected.size] += selected
+        coverage[num_days:num_days + selected.size] -= selected
+        return np.cumsum(coverage[:length]) > 0
+
+    @staticmethod
+    def streak_lengths(moves: np.ndarray) -> np.ndarray:
+        """
+        Length of the run of True values each row belongs to.
+
+        Args:
+            moves (np.ndarray): Boolean array, True where the row moved in the streak's direction.
+
+        Returns:
+            np.ndarray: Run length for each row, 0 where moves is False.
+        """
+        moves = np.asarray(moves, dtype=bool)
+        edges = np.diff(np.concatenate(([0], moves.view(np.int8), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_lengths = np.flatnonzero(edges == -1) - run_starts
+        coverage = np.zeros(moves.size + 1, dtype=np.int64)
+        coverage[run_starts] += run_lengths
+        coverage[run_starts + run_lengths] -= run_lengths
+        return np.cumsum(coverage[:moves.size])
+
+    @staticmethod
+    def window_change_scores(closes: np.ndarray, num_days: int) -> np.ndarray:
+        """
+        Largest absolute cumulative percent change of any num_days window containing each row.
+
+        A row is highlighted by cumulative_change_mask exactly when its score reaches the threshold.
+
+        Args:
+            closes (np.ndarray): Closing prices sorted by date.
+            num_days (int): Window length.
+
+        Returns:
+            np.ndarray: Score for each row; -inf for rows in no window.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        if num_days < 1 or closes.size < num_days:
+            return np.full(closes.size, -np.inf)
+        start_prices = closes[:closes.size - num_days + 1]
+        end_prices = closes[num_days - 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = ((end_prices - start_prices) / start_prices) * 100
+        changes = np.abs(np.where(start_prices == 0, 0.0, changes))
+        # A window with a missing close never reaches a threshold
+        changes[np.isnan(changes)] = -np.inf
+        # Row r lies in the windows starting at r - num_days + 1 .. r
+        padding = np.full(num_days - 1, -np.inf)
+        return DataProcessor.rolling_max(np.concatenate((padding, changes, padding)), num_days)
+
+    @staticmethod
+    def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+        """
+        Maximum of every window of consecutive values, in O(n) whatever the window length.
+
+        Uses the van Herk/Gil-Werman method: within fixed blocks of window values, prefix and suffix
+        running maxima are taken once, and each window is the maximum of one suffix and one prefix.
+
+        Args:
+            values (np.ndarray): The values; should not contain NaN.
+            window (int): Window length, at least 1.
+
+        Returns:
+            np.ndarray: max(values[i:i + window]) for each i, length len(values) - window + 1 (or 0).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        count = values.size - window + 1
+        if count <= 0:
+            return np.zeros(0)
+        blocks = np.full(-(-values.size // window) * window, -np.inf)
+        blocks[:values.size] = values
+        blocks = blocks.reshape(-1, window)
+        prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+        suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+        starts = np.arange(count)
+        return np.maximum(suffix[starts], prefix[starts + window - 1])
+
+    @staticmethod
+    def consecutive_change_mask(percent_changes: np.ndarray, num_days: int, direction: str) -> np.ndarray:
+        """
+        Mark rows that are part of a streak of num_days positive or negative percent changes.
+
+        Args:
+            percent_changes (np.ndarray): Percent changes sorted by date. NaN breaks a streak.
+            num_days (int): Number of consecutive days to check.
+            direction (str): 'positive' or 'negative'.
+
+        Returns:
+            np.ndarray: Boolean mask aligned with percent_changes.
+        """
+        percent_changes = np.asarray(percent_changes, dtype=np.float64)
+        if direction == 'positive':
+            moves = percent_changes > 0
+        elif direction == 'negative':
+            moves = percent_changes < 0
+        else:
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+
+        result = np.zeros(moves.size, dtype=bool)
+        if num_days < 1 or moves.size < num_days:
+            return result
+
+        # Run-length encode the streaks: +1 where a run starts, -1 just after it ends
+        edges = np.diff(np.concatenate(([0], moves.view(np.int8), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        long_runs = (run_ends - run_starts) >= num_days
+
+        coverage = np.zeros(moves.size + 1, dtype=np.int64)
+        coverage[run_starts[long_runs]] += 1
+        coverage[run_ends[long_runs]] -= 1
+        return np.cumsum(coverage[:moves.size]) > 0
+
+    @staticmethod
+    def threshold_change_mask(percent_changes: np.ndarray, percent_threshold: float, direction: str) -> np.ndarray:
+        """
+        Mark rows whose percent change is beyond a threshold in the specified direction.
+
+        Args:
+            percent_changes (np.ndarray): Percent changes sorted by date. NaN never matches.
+            percent_threshold (float): Threshold for percent change.
+            direction (str): 'positive' or 'negative'.
+
+        Returns:
+            np.ndarray: Boolean mask aligned with percent_changes.
+        """
+        percent_changes = np.asarray(percent_changes, dtype=np.float64)
+        if direction == 'positive':
+            return percent_changes >= percent_threshold
+        elif direction == 'negative':
+            return percent_changes <= -percent_threshold
+        else:
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+
+    @staticmethod
+    def cumulative_change_mask(closes: np.ndarray, num_days: int, percent_threshold: float) -> np.ndarray:
+        """
+        Mark rows inside any num_days window whose cumulative percent change reaches the threshold.
+
+        Args:
+            closes (np.ndarray): Closing prices sorted by date.
+            num_days (int): Number of days to check for cumulative change.
+            percent_threshold (float): Threshold for cumulative percent change.
+
+        Returns:
+            np.ndarray: Boolean mask aligned with closes.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        if num_days < 1 or closes.size < num_days:
+            return np.zeros(closes.size, dtype=bool)
+
+        # Compare each window's last close with its first using shifted views
+        start_prices = closes[:closes.size - num_days + 1]
+        end_prices = closes[num_days - 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cumulative_changes = ((end_prices - start_prices) / start_prices) * 100
+        cumulative_changes = np.where(start_prices == 0, 0.0, cumulative_changes)
+        window_starts = np.abs(cumulative_changes) >= abs(percent_threshold)
+        return DataProcessor.mark_windows(window_starts, num_days, closes.size)
 
     @staticmethod
     def check_threshold_change(percent_changes: Dict[datetime, float], percent_threshold: float, direction: str) -> Dict[datetime, bool]:
@@ -93,30 +292,18 @@ class DataProcessor:
             raise ValueError("Direction must be either 'positive' or 'negative'")
 
     @staticmethod
-    def check_cumulative_change(data: Dict[datetime, Dict[str, float]], num_days: int, percent_threshold: float) -> Dict[datetime, bool]:
+    def check_cumulative_change(data: StockData, num_days: int, percent_threshold: float) -> Dict[datetime, bool]:
         """
         Check if there is a cumulative percent change of threshold over num_days.
         
         Args:
-            data (Dict[datetime, Dict[str, float]]): Dictionary of dates and their stock data.
+            data (StockData): A PriceSeries or dictionary of dates and their stock data.
             num_days (int): Number of days to check for cumulative change.
             percent_threshold (float): Threshold for cumulative percent change.
 
         Returns:
             Dict[datetime, bool]: Dictionary of dates and boolean indicating if the condition is met.
         """
-        sorted_dates = sorted(key for key in data.keys() if key != 'stock_symbol')
-        result = {date: False for date in sorted_dates}
-        
-        for i in range(len(sorted_dates) - num_days + 1):
-            start_date = sorted_dates[i]
-            end_date = sorted_dates[i + num_days - 1]
-            start_price = data[start_date]['close']
-            end_price = data[end_date]['close']
-            
-            cumulative_change = DataProcessor.calculate_percent_change(end_price, start_price)
-            if abs(cumulative_change) >= abs(percent_threshold):
-                for j in range(num_days):
-                    result[sorted_dates[i + j]] = True
-        
-        return result
\ No newline at end of file
+        sorted_dates, closes = DataProcessor.sorted_dates_and_closes(data)
+        result = DataProcessor.cumulative_change_mask(closes, num_days, percent_threshold)
+        return dict(zip(sorted_dates, result.tolist()))
\ No newline at end of file
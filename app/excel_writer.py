@@ -0,0 +1,226 @@
+import os
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+from app.formatting import FormatStyle, FormattingRule, RuleContext
+from app.instrumentation import span
+from app.price_series import PriceSeries, PRICE_COLUMNS
+
+color_map = {
+    "red": "FFFF0000",
+    "green": "FF00FF00",
+    "orange": "FFFFA500",
+    "black": "FF000000",
+    "lightblue": "FFADD8E6",
+    "yellow": "FFFFFF00"
+}
+
+SHEET_COLUMNS = list(PRICE_COLUMNS) + ["percent_change"]
+
+# Excel's General number format shows at most 11 characters
+GENERAL_FORMAT_WIDTH = 11
+DATE_WIDTH = 10
+MIN_COLUMN_WIDTH = 12
+# Rows converted to Python values and written between progress reports
+PROGRESS_ROWS = 5000
+
+StyleKey = Tuple[str, str, bool]
+
+def style_key(style: FormatStyle) -> StyleKey:
+    return (style.background_color, style.font_color, style.bold)
+
+def named_style(key: StyleKey) -> NamedStyle:
+    """Build the shared workbook style for one background/font/bold combination."""
+    background_color, font_color, bold = key
+    style = NamedStyle(name=f"highlight_{background_color}_{font_color}{'_bold' if bold else ''}")
+    style.fill = PatternFill(start_color=color_map[background_color], end_color=color_map[background_color], fill_type="solid")
+    style.font = Font(color=color_map[font_color], bold=bold)
+    return style
+
+def display_width(values: np.ndarray) -> int:
+    """
+    Estimate how many characters Excel needs to show a numeric column in General format.
+
+    Args:
+        values (np.ndarray): The column values; NaN cells are written empty.
+
+    Returns:
+        int: The widest value's display length.
+    """
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return 0
+    if np.any(values != np.floor(values)):
+        return GENERAL_FORMAT_WIDTH
+    largest = float(np.max(np.abs(values)))
+    digits = int(np.floor(np.log10(largest))) + 1 if largest >= 1 else 1
+    return min(digits + int(np.any(values < 0)), GENERAL_FORMAT_WIDTH)
+
+@dataclass
+class RenderedSheet:
+    """
+    A worksheet reduced to plain arrays, ready to be written.
+
+    cell_styles holds, for every data cell, an index into styles or -1 for no highlight.
+    """
+    title: str
+    dates: np.ndarray
+    columns: List[str]
+    values: np.ndarray
+    cell_styles: np.ndarray
+    styles: List[StyleKey]
+
+    def column_widths(self) -> List[int]:
+        """Column widths for the date index followed by each data column, computed from the arrays."""
+        widths = [max(DATE_WIDTH + 2, MIN_COLUMN_WIDTH)]
+        for i, column in enumerate(self.columns):
+            widths.append(max(max(len(column), display_width(self.values[:, i])) + 2, MIN_COLUMN_WIDTH))
+        return widths
+
+def render_sheet(series: PriceSeries, rules: Sequence[FormattingRule], title: str = 'Stock Data',
+                 context: Optional[RuleContext] = None) -> RenderedSheet:
+    """
+    Evaluate the formatting rules and lay out one sheet of prices.
+
+    Later rules take precedence where rules highlight the same cell.
+
+    Args:
+        series (PriceSeries): The prices to write.
+        rules (Sequence[FormattingRule]): Formatting rules, in the order they are applied.
+        title (str): The worksheet title.
+        context (Optional[RuleContext]): Derived values shared with other rules, if already computed.
+
+    Returns:
+        RenderedSheet: The laid-out sheet.
+    """
+    with span('write.render') as record:
+        record.add(rows=len(series))
+        return _render_sheet(series, rules, title, context)
+
+def _render_sheet(series: PriceSeries, rules: Sequence[FormattingRule], title: str,
+                  context: Optional[RuleContext]) -> RenderedSheet:
+    context = context if context is not None else RuleContext(series)
+    values = np.column_stack([series.open, series.high, series.low, series.close, context.percent_changes])
+    cell_styles = np.full(values.shape, -1, dtype=np.int16)
+
+    styles: List[StyleKey] = []
+    for rule in rules:
+        key = style_key(rule.format_style)
+        if key not in styles:
+            styles.append(key)
+        columns = rule.format_style.columns if isinstance(rule.format_style.columns, list) else [rule.format_style.columns]
+        column_indexes = [SHEET_COLUMNS.index(column) for column in columns]
+        rows = np.flatnonzero(rule.evaluate(context))
+        cell_styles[np.ix_(rows, column_indexes)] = styles.index(key)
+
+    return RenderedSheet(title, series.dates, list(SHEET_COLUMNS), values, cell_styles, styles)
+
+def write_sheet(workbook: Workbook, sheet: RenderedSheet, registered: Dict[StyleKey, str],
+                side_rows: Sequence[Sequence[Any]] = (), progress: Optional[Callable[[int], None]] = None):
+    """
+    Stream one rendered sheet into a write-only workbook.
+
+    Args:
+        workbook (Workbook): A workbook opened with write_only=True.
+        sheet (RenderedSheet): The sheet to write.
+        registered (Dict[StyleKey, str]): Named styles already added to the workbook; updated in place.
+        side_rows (Sequence[Sequence[Any]]): Extra cells placed one blank column to the right of the data,
+            starting on the header row.
+        progress (Optional[Callable[[int], None]]): Called with the number of data rows written so far,
+            every PROGRESS_ROWS rows and once the sheet is complete.
+    """
+    worksheet = workbook.create_sheet(sheet.title)
+    widths = sheet.column_widths()
+    if side_rows:
+        widths.append(MIN_COLUMN_WIDTH)
+        for column in zip(*side_rows):
+            widths.append(max(max(len(str(value)) for value in column) + 2, MIN_COLUMN_WIDTH))
+    for i, width in enumerate(widths):
+        worksheet.column_dimensions[get_column_letter(i + 1)].width = width
+
+    style_names = []
+    for key in sheet.styles:
+        if key not in registered:
+            style = named_style(key)
+            workbook.add_named_style(style)
+            registered[key] = style.name
+        style_names.append(registered[key])
+
+    def side_cells(row_index: int) -> List[Any]:
+        return [None] + list(side_rows[row_index]) if row_index < len(side_rows) else []
+
+    worksheet.append([None] + sheet.columns + side_cells(0))
+    row_count = len(sheet.dates)
+    styled = (sheet.cell_styles >= 0).any(axis=1)
+    # Rows become Python objects one chunk at a time, so memory does not grow with the sheet
+    for start in range(0, row_count, PROGRESS_ROWS):
+        if progress is not None:
+            progress(start)
+        chunk = sheet.values[start:start + PROGRESS_ROWS]
+        values = np.where(np.isnan(chunk), None, chunk).tolist()
+        days = sheet.dates[start:start + PROGRESS_ROWS].astype(object).tolist()
+        for i, day, row in zip(range(start, start + len(days)), days, values):
+            if styled[i]:
+                for j, style_index in enumerate(sheet.cell_styles[i].tolist()):
+                    if style_index >= 0:
+                        cell = WriteOnlyCell(worksheet, value=row[j])
+                        cell.style = style_names[style_index]
+                        row[j] = cell
+            worksheet.append([day] + row + side_cells(i + 1))
+    for i in range(row_count + 1, len(side_rows)):
+        worksheet.append([None] * (len(sheet.columns) + 1) + side_cells(i))
+    if progress is not None:
+        progress(row_count)
+    return worksheet
+
+def discard_workbook(workbook: Workbook):
+    """Close an unsaved write-only workbook's sheets and delete the temporary files they stream into."""
+    for worksheet in workbook.worksheets:
+        if not worksheet.closed:
+            worksheet.close()
+        if worksheet._writer is not None and os.path.exists(worksheet._writer.out):
+            os.remove(worksheet._writer.out)
+
+def write_workbook(file_name: str, sheets: Sequence[RenderedSheet],
+                   progress: Optional[Callable[[float], None]] = None) -> str:
+    """
+    Stream rendered sheets into an xlsx file using openpyxl's write-only mode.
+
+    Each highlight combination is registered once as a named style and applied as rows are written,
+    so memory stays flat as the row count grows.
+
+    Args:
+        file_name (str): Path of the workbook to create.
+        sheets (Sequence[RenderedSheet]): The sheets to write, in order.
+        progress (Optional[Callable[[float], None]]): Called with the fraction of rows written so far.
+            If it raises, nothing is saved. If saving fails, the streamed sheets are discarded.
+
+    Returns:
+        str: The file name.
+    """
+    workbook = Workbook(write_only=True)
+    registered: Dict[StyleKey, str] = {}
+    total_rows = max(sum(len(sheet.dates) for sheet in sheets), 1)
+    rows_before = 0
+    try:
+        for sheet in sheets:
+            sheet_progress = None
+            if progress is not None:
+                sheet_progress = lambda rows, before=rows_before: progress((before + rows) / total_rows)
+            with span('write.rows') as record:
+                write_sheet(workbook, sheet, registered, progress=sheet_progress)
+                record.add(rows=len(sheet.dates))
+            rows_before += len(sheet.dates)
+        with span('write.save') as record:
+            workbook.save(file_name)
+            record.add(bytes=os.path.getsize(file_name))
+    except BaseException:
+        discard_workbook(workbook)
+        raise
+    return file_name
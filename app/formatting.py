@@ -1,7 +1,11 @@
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Union
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
 from datetime import datetime
-from app.data_processor import DataProcessor  # Import DataProcessor
+import numpy as np
+from app.data_processor import DataProcessor, StockData  # Import DataProcessor
+from app.instrumentation import span
+from app.memo import MemoCache, fingerprint
+from app.price_series import PriceSeries
 
 @dataclass
 class FormatStyle:
@@ -10,47 +14,178 @@ class FormatStyle:
     font_color: str = "black"
     bold: bool = False
 
+class RuleContext:
+    """
+    Derived values for one series, computed once and shared by every rule evaluated against it.
+
+    With a memo, derived values are also cached across contexts under a fingerprint of the closing
+    prices, so evaluating the same prices again, e.g. after tweaking one rule's parameters, reuses
+    every value whose inputs did not change.
+    """
+    def __init__(self, data: StockData, memo: Optional[MemoCache] = None):
+        self.data = data
+        if isinstance(data, PriceSeries):
+            self.closes = data.close
+            self._dates = None
+        else:
+            self._dates, self.closes = DataProcessor.sorted_dates_and_closes(data)
+        self.memo = memo
+        self._fingerprint = None
+        self._derived: Dict[Hashable, Any] = {}
+
+    @property
+    def dates(self) -> List[Any]:
+        """Sorted dates, aligned with every mask computed from this context."""
+        if self._dates is None:
+            self._dates = self.data.date_list()
+        return self._dates
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the closing prices; every derived value depends on them alone."""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.closes)
+        return self._fingerprint
+
+    @property
+    def percent_changes(self) -> np.ndarray:
+        """Daily percent changes aligned with the dates; the first row is NaN."""
+        def compute():
+            with span('process.percent_changes') as record:
+                record.add(rows=len(self.closes))
+                return DataProcessor.daily_percent_change_array(self.closes)
+        return self.derived(('percent_changes',), compute)
+
+    def derived(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        A value computed from this series on first request and cached under key.
+
+        Rules that need the same intermediate (streak lengths, window scores, a sub-condition's mask)
+        ask for it under the same key, so it is computed once however many rules use it. Keys are
+        tuples of strings and numbers.
+        """
+        if key not in self._derived:
+            if self.memo is None:
+                self._derived[key] = compute()
+            else:
+                self._derived[key] = self.memo.get_or_compute((self.fingerprint,) + key, compute)
+        return self._derived[key]
+
+    def streak_lengths(self, direction: str) -> np.ndarray:
+        """Length of the positive or negative streak each row belongs to; 0 outside streaks."""
+        def compute():
+            if direction == 'positive':
+                moves = self.percent_changes > 0
+            elif direction == 'negative':
+                moves = self.percent_changes < 0
+            else:
+                raise ValueError("Direction must be either 'positive' or 'negative'")
+            return DataProcessor.streak_lengths(moves)
+        return self.derived(('streak_lengths', direction), compute)
+
+    def window_change_scores(self, num_days: int) -> np.ndarray:
+        """Largest absolute num_days window change containing each row; -inf outside every window."""
+        return self.derived(('window_change_scores', num_days),
+                            lambda: DataProcessor.window_change_scores(self.closes, num_days))
+
+    def __len__(self) -> int:
+        return len(self.closes)
+
 class FormattingRule:
-    def __init__(self, condition: Callable, format_style: FormatStyle):
-        self.condition = condition
+    """
+    Pairs a condition with the style to apply where it holds.
+
+    Rules are evaluated either through ``mask``, a callable taking a RuleContext and
+    returning a boolean array for the whole series, or through the legacy
+    ``condition(data, date)`` callable, which is called once per date.
+
+    Rules built by FormattingRuleFactory also record their ``kind`` and ``params``
+    so exporters can translate them, e.g. into Excel conditional formatting.
+    """
+    def __init__(self, condition: Optional[Callable] = None, format_style: FormatStyle = None,
+                 mask: Optional[Callable[[RuleContext], np.ndarray]] = None,
+                 kind: Optional[str] = None, params: Optional[Dict[str, Any]] = None):
+        if condition is None and mask is None:
+            raise ValueError("A formatting rule needs a condition or a mask")
+        self.mask = mask
+        self.kind = kind
+        self.params = params or {}
+        self.condition = condition if condition is not None else self._condition_from_mask
         self.format_style = format_style
 
-    def apply(self, data: Dict[datetime, Dict[str, float]]) -> Dict[datetime, FormatStyle]:
-        return {date: self.format_style if self.condition(data, date) else None
+    def _condition_from_mask(self, data: StockData, date: Any) -> bool:
+        context = RuleContext(data)
+        return dict(zip(context.dates, self.evaluate(context).tolist())).get(date, False)
+
+    def evaluate(self, data: Union[StockData, RuleContext]) -> np.ndarray:
+        """
+        Evaluate the rule over a whole series.
+
+        Args:
+            data (Union[StockData, RuleContext]): The stock data, or a context shared with other rules.
+
+        Returns:
+            np.ndarray: Boolean mask aligned with the sorted dates.
+        """
+        context = data if isinstance(data, RuleContext) else RuleContext(data)
+        with span(f'rules.{self.kind or "custom"}') as record:
+            record.add(rows=len(context))
+            if self.mask is not None and self.kind is not None:
+                # kind and params describe the rule fully, so equal rules share one mask
+                key = ('rule', self.kind) + tuple(sorted(self.params.items()))
+                return context.derived(key, lambda: np.asarray(self.mask(context), dtype=bool))
+            if self.mask is not None:
+                return np.asarray(self.mask(context), dtype=bool)
+            return np.fromiter((bool(self.condition(context.data, date)) for date in context.dates),
+                               dtype=bool, count=len(context))
+
+    def apply(self, data: StockData, context: Optional[RuleContext] = None) -> Dict[datetime, FormatStyle]:
+        if self.mask is None:
+            return {date: self.format_style if self.condition(data, date) else None
+                    for date in data.keys()}
+
+        context = context if context is not None else RuleContext(data)
+        matches = dict(zip(context.dates, self.evaluate(context).tolist()))
+        return {date: self.format_style if matches.get(date, False) else None
                 for date in data.keys()}
 
 class FormattingRuleFactory:
     @staticmethod
     def consecutive_change_rule(num_days: int, direction: str, columns: Union[str, List[str]], format_style: FormatStyle) -> FormattingRule:
-        def condition(data, date):
-            percent_changes = DataProcessor.calculate_daily_percent_changes(data)
-            consecutive_changes = DataProcessor.check_consecutive_changes(percent_changes, num_days, direction)
-            return consecutive_changes.get(date, False)
-        
+        if direction not in ('positive', 'negative'):
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+
+        def mask(context):
+            # Same rows as DataProcessor.consecutive_change_mask, from streak lengths shared with other rules
+            if num_days < 1:
+                return np.zeros(len(context), dtype=bool)
+            return context.streak_lengths(direction) >= num_days
+
         style_dict = format_style.__dict__.copy()
         style_dict.pop('columns', None)
         style = FormatStyle(columns=columns, **style_dict)
-        return FormattingRule(condition, style)
+        return FormattingRule(format_style=style, mask=mask, kind='consecutive_change',
+                              params={'num_days': num_days, 'direction': direction})
 
     @staticmethod
     def threshold_change_rule(percent_threshold: float, direction: str, columns: Union[str, List[str]], format_style: FormatStyle) -> FormattingRule:
-        def condition(data, date):
-            percent_changes = DataProcessor.calculate_daily_percent_changes(data)
-            threshold_changes = DataProcessor.check_threshold_change(percent_changes, percent_threshold, direction)
-            return threshold_changes.get(date, False)
-        
+        def mask(context):
+            return DataProcessor.threshold_change_mask(context.percent_changes, percent_threshold, direction)
+
         style_dict = format_style.__dict__.copy()
         style_dict.pop('columns', None)
         style = FormatStyle(columns=columns, **style_dict)
-        return FormattingRule(condition, style)
+        return FormattingRule(format_style=style, mask=mask, kind='threshold_change',
+                              params={'percent_threshold': percent_threshold, 'direction': direction})
 
     @staticmethod
     def cumulative_change_rule(num_days: int, percent_threshold: float, columns: Union[str, List[str]], format_style: FormatStyle) -> FormattingRule:
-        def condition(data, date):
-            cumulative_changes = DataProcessor.check_cumulative_change(data, num_days, percent_threshold)
-            return cumulative_changes.get(date, False)
-        
+        def mask(context):
+            # Same rows as DataProcessor.cumulative_change_mask, from window scores shared with other rules
+            return context.window_change_scores(num_days) >= abs(percent_threshold)
+
         style_dict = format_style.__dict__.copy()
         style_dict.pop('columns', None)
         style = FormatStyle(columns=columns, **style_dict)
-        return FormattingRule(condition, style)
\ No newline at end of file
+        return FormattingRule(format_style=style, mask=mask, kind='cumulative_change',
+                              params={'num_days': num_days, 'percent_threshold': percent_threshold})
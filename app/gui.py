@@ -1,19 +1,11 @@
+from app.config import get_api_key, save_api_key
+from app.resample import FREQUENCIES
 from app.spreadsheet_manager import SpreadSheetManager
+from app.task_runner import BackgroundRunner
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkcalendar import DateEntry
 from datetime import date, timedelta
-import os
-
-def get_api_key(file_path='api_key.txt'):
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            return file.read().strip()
-    return None
-
-def save_api_key(api_key, file_path='api_key.txt'):
-    with open(file_path, 'w') as file:
-        file.write(api_key)
 
 class GUI:
     def __init__(self):
@@ -30,6 +22,8 @@ class GUI:
         self.prompt_for_file_path()
 
         self.spreadsheet_manager = SpreadSheetManager(self.api_key)
+        # Reports are generated on a worker thread so the window stays responsive
+        self.runner = BackgroundRunner()
 
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -86,6 +80,11 @@ class GUI:
         self.end_date.grid(row=2, column=1, sticky=(tk.W, tk.E), padx=5, pady=5)
         self.end_date.set_date(date.today())  # Default value
 
+        ttk.Label(basic_frame, text="Bars:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        self.frequency = ttk.Combobox(basic_frame, values=FREQUENCIES, state="readonly")
+        self.frequency.grid(row=3, column=1, sticky=(tk.W, tk.E), padx=5, pady=5)
+        self.frequency.set("daily")  # Default value
+
         basic_frame.columnconfigure(1, weight=1)
         self.start_date.bind("<<DateEntrySelected>>", self.update_end_date_min)
 
@@ -191,17 +190,51 @@ class GUI:
                 "percent": float(self.period_threshold_entry.get()),
                 "days": int(self.period_days_entry.get())
             },
-            "file_path": self.file_path  # Add file path to user input
+            "file_path": self.file_path,  # Add file path to user input
+            "frequency": self.frequency.get()
         }
 
     def fetch_data(self):
         if self.validate_inputs():
             user_input = self.get_user_input()
-            self.spreadsheet_manager.process_and_open(user_input)
+            symbol = user_input["symbol"]
+            if self.runner.busy:
+                self.status_label.config(text=f"Queued {symbol} ({self.runner.pending + 1} waiting)")
+            self.runner.submit(
+                lambda progress: self.spreadsheet_manager.create_excel_file(user_input, progress),
+                on_progress=lambda stage, fraction: self.show_progress(symbol, stage, fraction),
+                on_done=self.report_done,
+                on_error=self.report_error,
+                on_cancelled=lambda: self.status_label.config(text=f"Cancelled {symbol}"),
+            )
         else:
             print("Input validation failed")
 
+    def show_progress(self, symbol, stage, fraction):
+        self.progress_bar["value"] = fraction * 100
+        self.status_label.config(text=f"{symbol}: {stage}")
+
+    def report_done(self, file_name):
+        self.status_label.config(text="Done")
+        self.spreadsheet_manager.open_excel_file(file_name)
+
+    def report_error(self, error):
+        self.progress_bar["value"] = 0
+        self.status_label.config(text="Failed")
+        messagebox.showerror("Error", str(error))
+
+    def poll_worker(self):
+        self.runner.dispatch_events()
+        self.root.after(100, self.poll_worker)
+
     def run(self):
         self.fetch_button = ttk.Button(self.root, text="Fetch and Process Data", command=self.fetch_data)
         self.fetch_button.pack(pady=10)
+        self.progress_bar = ttk.Progressbar(self.root, mode="determinate", maximum=100)
+        self.progress_bar.pack(fill=tk.X, padx=10)
+        self.status_label = ttk.Label(self.root, text="")
+        self.status_label.pack(pady=5)
+        ttk.Button(self.root, text="Cancel", command=self.runner.cancel).pack(pady=5)
+        self.root.after(100, self.poll_worker)
         self.root.mainloop()
+        self.runner.shutdown()
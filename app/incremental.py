@@ -0,0 +1,343 @@
+import abc
+import math
+import os
+import tempfile
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.formatting import FormattingRule
+from app.indicators import Signal, signal_for_rule
+from app.instrumentation import span
+from app.price_series import PriceSeries
+
+class PercentChangeTracker:
+    """Daily percent change of each appended close, matching DataProcessor.daily_percent_change_array."""
+    def __init__(self):
+        self.last_close: Optional[float] = None
+
+    def push(self, close: float) -> float:
+        previous, self.last_close = self.last_close, close
+        if previous is None:
+            return math.nan
+        if previous == 0:
+            return 0.0
+        return ((close - previous) / previous) * 100
+
+class Detector(abc.ABC):
+    """
+    Stateful form of one rule's mask.
+
+    push is called with every new row, in order, and returns the rows (0-based positions in the
+    whole series) that the rule highlights as a result of that row and had not highlighted before.
+    A row can highlight earlier rows, e.g. the day a streak becomes long enough.
+    """
+    # Closes needed before the next row to rebuild the state with prime()
+    history = 1
+
+    def __init__(self):
+        self.index = -1
+
+    def prime(self, closes: Sequence[float], percent_changes: Sequence[float], first_index: int):
+        """Rebuild the state from the tail of a series, discarding what it would highlight."""
+        self.index = first_index - 1
+        for close, percent_change in zip(closes, percent_changes):
+            self.push(close, percent_change)
+
+    @abc.abstractmethod
+    def push(self, close: float, percent_change: float) -> range:
+        """Take the next row and return the rows it newly highlights."""
+
+class ThresholdDetector(Detector):
+    def __init__(self, percent_threshold: float, direction: str):
+        super().__init__()
+        if direction not in ('positive', 'negative'):
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+        self.percent_threshold = percent_threshold
+        self.direction = direction
+
+    def push(self, close: float, percent_change: float) -> range:
+        self.index += 1
+        if self.direction == 'positive':
+            hit = percent_change >= self.percent_threshold
+        else:
+            hit = percent_change <= -self.percent_threshold
+        return range(self.index, self.index + 1) if hit else range(0)
+
+class StreakDetector(Detector):
+    """Keeps the length of the current run of moves, capped once it is long enough to highlight."""
+    def __init__(self, num_days: int, direction: str):
+        super().__init__()
+        if direction not in ('positive', 'negative'):
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+        self.num_days = num_days
+        self.direction = direction
+        self.streak = 0
+        self.history = num_days + 1
+
+    def push(self, close: float, percent_change: float) -> range:
+        self.index += 1
+        moved = percent_change > 0 if self.direction == 'positive' else percent_change < 0
+        if not moved or self.num_days < 1:
+            self.streak = 0
+            return range(0)
+        self.streak = min(self.streak + 1, self.num_days + 1)
+        if self.streak == self.num_days:
+            # The run just became long enough: every day in it is highlighted at once
+            return range(self.index - self.num_days + 1, self.index + 1)
+        if self.streak > self.num_days:
+            return range(self.index, self.index + 1)
+        return range(0)
+
+class CumulativeWindowDetector(Detector):
+    """Keeps the last num_days closes in a ring buffer and the last row already highlighted."""
+    def __init__(self, num_days: int, percent_threshold: float):
+        super().__init__()
+        self.num_days = num_days
+        self.percent_threshold = percent_threshold
+        self.window = deque(maxlen=max(num_days, 1))
+        self.covered_through = -1
+        # Windows ending in the next num_days - 1 rows start this far back
+        self.history = 2 * num_days
+
+    def prime(self, closes: Sequence[float], percent_changes: Sequence[float], first_index: int):
+        self.window.clear()
+        self.covered_through = -1
+        super().prime(closes, percent_changes, first_index)
+
+    def push(self, close: float, percent_change: float) -> range:
+        self.index += 1
+        self.window.append(close)
+        if self.num_days < 1 or len(self.window) < self.num_days:
+            return range(0)
+        start = self.window[0]
+        change = 0.0 if start == 0 else ((close - start) / start) * 100
+        # A missing close gives a NaN change, which never reaches the threshold
+        if not abs(change) >= abs(self.percent_threshold):
+            return range(0)
+        # Rows of this window up to covered_through were highlighted by an earlier window
+        newly = range(max(self.index - self.num_days + 1, self.covered_through + 1), self.index + 1)
+        self.covered_through = self.index
+        return newly
+
+class SignalDetector(Detector):
+    """Highlights each row on which a technical-indicator signal fires; see app.indicators."""
+    def __init__(self, make_signal: Callable[[], Signal]):
+        super().__init__()
+        self.make_signal = make_signal
+        self.signal = make_signal()
+        self.history = self.signal.history
+
+    def prime(self, closes: Sequence[float], percent_changes: Sequence[float], first_index: int):
+        self.signal = self.make_signal()
+        super().prime(closes, percent_changes, first_index)
+
+    def push(self, close: float, percent_change: float) -> range:
+        self.index += 1
+        return range(self.index, self.index + 1) if self.signal.push(close, percent_change) else range(0)
+
+def detector_for_rule(rule: FormattingRule) -> Detector:
+    """
+    Build the incremental detector for a rule made by FormattingRuleFactory or IndicatorRuleFactory.
+
+    Raises:
+        ValueError: If the rule has no incremental form, e.g. a hand-written condition.
+    """
+    params = rule.params
+    if rule.kind == 'threshold_change':
+        return ThresholdDetector(params['percent_threshold'], params['direction'])
+    if rule.kind == 'consecutive_change':
+        return StreakDetector(params['num_days'], params['direction'])
+    if rule.kind == 'cumulative_change':
+        return CumulativeWindowDetector(params['num_days'], params['percent_threshold'])
+    make_signal = signal_for_rule(rule)
+    if make_signal is not None:
+        return SignalDetector(make_signal)
+    raise ValueError(f"Rule kind {rule.kind!r} cannot be evaluated incrementally")
+
+@dataclass
+class IncrementalUpdate:
+    """What appending rows produced: their percent changes and, for each rule, the newly highlighted rows."""
+    percent_changes: np.ndarray
+    highlights: List[np.ndarray]
+
+    def highlighted_rows(self) -> np.ndarray:
+        """Every row newly highlighted by any rule, sorted."""
+        if not self.highlights:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(self.highlights))
+
+class IncrementalEvaluator:
+    """
+    Evaluates formatting rules one appended row at a time.
+
+    Prime it with the tail of the rows already processed, then append new closes. The state is
+    a handful of numbers per rule, so appending N rows costs O(N) however long the series is.
+    """
+    def __init__(self, rules: Sequence[FormattingRule]):
+        self.rules = list(rules)
+        self.detectors = [detector_for_rule(rule) for rule in self.rules]
+        self.percent = PercentChangeTracker()
+        self.length = 0
+
+    @property
+    def history(self) -> int:
+        """How many trailing closes prime() needs."""
+        return max([detector.history for detector in self.detectors] + [1])
+
+    def prime(self, closes: Sequence[float], length: int):
+        """
+        Rebuild the state from the last closes of a series that already has length rows.
+
+        Args:
+            closes (Sequence[float]): The series' last closes, at least history of them when available.
+                None, an empty sheet cell, stands for a missing close (NaN).
+            length (int): Number of rows already processed.
+        """
+        closes = [math.nan if close is None else float(close) for close in closes]
+        self.percent = PercentChangeTracker()
+        percent_changes = [self.percent.push(close) for close in closes]
+        for detector in self.detectors:
+            detector.prime(closes, percent_changes, length - len(closes))
+        self.length = length
+
+    def append(self, closes: Sequence[float]) -> IncrementalUpdate:
+        """
+        Evaluate newly appended closes.
+
+        Returns:
+            IncrementalUpdate: The new rows' percent changes and the rows each rule newly highlights.
+        """
+        with span('incremental.append') as record:
+            percent_changes = np.empty(len(closes))
+            highlights: List[List[int]] = [[] for _ in self.detectors]
+            for i, close in enumerate(np.asarray(closes, dtype=np.float64).tolist()):
+                percent_changes[i] = percent_change = self.percent.push(close)
+                for rows, detector in zip(highlights, self.detectors):
+                    rows.extend(detector.push(close, percent_change))
+            self.length += len(closes)
+            record.add(rows=len(closes))
+        return IncrementalUpdate(percent_changes, [np.array(rows, dtype=np.int64) for rows in highlights])
+
+@dataclass
+class WorkbookUpdate:
+    rows_appended: int = 0
+    highlighted_dates: List[date] = field(default_factory=list)
+
+def cell_style_key(cell):
+    """The (background, font, bold) highlight of a cell, or None if it is not highlighted."""
+    from app.excel_writer import color_map
+
+    if cell.fill is None or cell.fill.fill_type != 'solid':
+        return None
+    colors = {argb: name for name, argb in color_map.items()}
+    background = colors.get(cell.fill.start_color.rgb)
+    font_color = colors.get(cell.font.color.rgb, 'black') if cell.font.color is not None else 'black'
+    return (background, font_color, bool(cell.font.b)) if background is not None else None
+
+def update_workbook(file_name: str, series: PriceSeries, rules: Sequence[FormattingRule],
+                    title: str = 'Stock Data') -> WorkbookUpdate:
+    """
+    Append the days of series that are newer than a report's last row and highlight them in place.
+
+    The rule state is rebuilt from the sheet's last few closes, so only the new rows are evaluated.
+    Rows already in the sheet are restyled only where a new row extends a streak or window into them,
+    and never over a highlight from a later (higher precedence) rule.
+
+    Works on workbooks from the streaming and pandas writers. Conditional-formatting workbooks keep
+    their rules as formulas over a fixed range and must be regenerated instead.
+
+    Args:
+        file_name (str): The workbook to update; it is replaced atomically.
+        series (PriceSeries): Prices covering at least the new days.
+        rules (Sequence[FormattingRule]): The rules the workbook was created with.
+        title (str): The worksheet to update.
+
+    Returns:
+        WorkbookUpdate: The number of rows appended and the dates newly highlighted.
+
+    Raises:
+        ValueError: If the sheet does not look like a report, or a rule has no incremental form.
+    """
+    import openpyxl
+    from app.excel_writer import SHEET_COLUMNS, named_style, style_key
+
+    evaluator = IncrementalEvaluator(rules)
+    with span('incremental.load'):
+        workbook = openpyxl.load_workbook(file_name)
+    worksheet = workbook[title]
+    header = [worksheet.cell(row=1, column=i + 2).value for i in range(len(SHEET_COLUMNS))]
+    if header != SHEET_COLUMNS:
+        raise ValueError(f"Sheet '{title}' of {file_name} is not a price report")
+    if worksheet.conditional_formatting:
+        raise ValueError("Workbooks with conditional formatting must be regenerated")
+
+    last_row = worksheet.max_row
+    while last_row > 1 and worksheet.cell(row=last_row, column=1).value is None:
+        last_row -= 1
+    length = last_row - 1
+
+    if length > 0:
+        last_date = worksheet.cell(row=last_row, column=1).value
+        last_date = last_date.date() if isinstance(last_date, datetime) else last_date
+        first_new = int(np.searchsorted(series.dates, np.datetime64(last_date, 'D'), side='right'))
+    else:
+        first_new = 0
+    new = series[first_new:]
+    if len(new) == 0:
+        return WorkbookUpdate()
+
+    close_column = SHEET_COLUMNS.index('close') + 2
+    tail_rows = range(max(2, last_row - evaluator.history + 1), last_row + 1)
+    evaluator.prime([worksheet.cell(row=row, column=close_column).value for row in tail_rows], length)
+    update = evaluator.append(new.close)
+
+    # Append the new rows
+    values = np.column_stack([new.open, new.high, new.low, new.close, update.percent_changes])
+    for day, row in zip(new.date_list(), np.where(np.isnan(values), None, values).tolist()):
+        worksheet.append([day] + row)
+
+    # Restyle newly highlighted cells; the latest rule wins, as in render_sheet
+    registered = set(workbook.named_styles)
+    owners: Dict[tuple, int] = {}
+
+    def owner(row: int, column: str) -> int:
+        """Index of the rule whose highlight the cell currently shows, or -1."""
+        if (row, column) in owners:
+            return owners[(row, column)]
+        key = cell_style_key(worksheet.cell(row=row + 2, column=SHEET_COLUMNS.index(column) + 2))
+        matches = [i for i, rule in enumerate(rules)
+                   if style_key(rule.format_style) == key and column in rule_columns(rule)]
+        return max(matches, default=-1)
+
+    for i, (rule, rows) in enumerate(zip(rules, update.highlights)):
+        style = named_style(style_key(rule.format_style))
+        if style.name not in registered:
+            workbook.add_named_style(style)
+            registered.add(style.name)
+        for row in rows.tolist():
+            for column in rule_columns(rule):
+                if owner(row, column) <= i:
+                    worksheet.cell(row=row + 2, column=SHEET_COLUMNS.index(column) + 2).style = style.name
+                    owners[(row, column)] = i
+
+    with span('incremental.save'):
+        directory = os.path.dirname(os.path.abspath(file_name))
+        handle, temporary = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+        os.close(handle)
+        try:
+            workbook.save(temporary)
+            os.replace(temporary, file_name)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    highlighted_dates = [worksheet.cell(row=row + 2, column=1).value for row in update.highlighted_rows().tolist()]
+    return WorkbookUpdate(len(new), [day.date() if isinstance(day, datetime) else day for day in highlighted_dates])
+
+def rule_columns(rule: FormattingRule) -> List[str]:
+    columns = rule.format_style.columns
+    return columns if isinstance(columns, list) else [columns]
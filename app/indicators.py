@@ -0,0 +1,482 @@
+"""
+Technical indicators, each in a batch form over whole arrays and an incremental form updated one
+bar at a time.
+
+Batch forms take arrays sorted by date and return arrays aligned with them, NaN where the indicator
+is not yet defined. They run in O(n) whatever the window: blocked running sums for moving averages
+and variance, a blocked closed form for exponential smoothing, and DataProcessor.rolling_max for
+rolling extremes. Values should not contain NaN.
+
+Incremental forms keep O(1) state per bar (O(window) memory for the rolling windows): running sums,
+Welford's variance updated as values enter and leave the window, and monotonic deques for rolling
+extremes. They match the batch forms to rounding.
+
+IndicatorRuleFactory turns the indicators into FormattingRules, and signal_for_rule gives each
+such rule's incremental form for app.incremental and the watchlist monitor.
+"""
+import abc
+import math
+from collections import deque
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.data_processor import DataProcessor
+from app.formatting import FormatStyle, FormattingRule, RuleContext
+
+AVERAGES = ('sma', 'ema')
+
+def check_direction(direction: str):
+    if direction not in ('positive', 'negative'):
+        raise ValueError("Direction must be either 'positive' or 'negative'")
+
+def window_sums(values: np.ndarray, window: int, squares: bool = True) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Running sums of every window of values, centered for accuracy.
+
+    Values are split into blocks of window rows. A window ending in block k lies in blocks k - 1
+    and k, so its sums come from one cumulative sum over those two blocks, taken relative to the
+    first value of block k. The sums then only ever hold deviations across two windows, however
+    far the series drifts, which keeps the variance free of catastrophic cancellation.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]: For each row, the reference value and the
+            sums of (value - reference) and, if squares, of (value - reference) ** 2 over the window
+            ending there. Rows before the first full window hold meaningless numbers.
+    """
+    count = -(-values.size // window)
+    blocks = np.full(count * window, values[-1])
+    blocks[:values.size] = values
+    blocks = blocks.reshape(count, window)
+    reference = blocks[:, :1]
+    previous = np.concatenate((blocks[:1], blocks[:-1]))
+    segments = np.concatenate((previous, blocks), axis=1) - reference
+
+    def totals(terms):
+        # The window ending at column window + j covers columns j + 1 .. window + j
+        cumulative = np.cumsum(terms, axis=1)
+        return (cumulative[:, window:] - cumulative[:, :window]).ravel()[:values.size]
+
+    return (np.repeat(reference[:, 0], window)[:values.size], totals(segments),
+            totals(segments * segments) if squares else None)
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average of the last window values, from running sums."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.size, np.nan)
+    if window < 1 or values.size < window:
+        return result
+    reference, sums, _ = window_sums(values, window, squares=False)
+    result[window - 1:] = (reference + sums / window)[window - 1:]
+    return result
+
+def exponential_smoothing(values: np.ndarray, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    """
+    y[i] = (1 - alpha) * y[i - 1] + alpha * values[i], starting from y[-1] = initial (default values[0]).
+
+    Evaluated in blocks: within a block, y is a scaled cumulative sum of values weighted by powers of
+    1 / (1 - alpha), and each block starts from the last value of the one before. Blocks are short
+    enough that the weights stay well inside float range.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(values.size)
+    if values.size == 0:
+        return result
+    decay = 1.0 - alpha
+    if decay <= 0:
+        result[:] = values
+        return result
+    if initial is None:
+        # Exactly the first value, as the recurrence gives; the closed form can be an ulp off
+        result[0] = carry = values[0]
+        first = 1
+    else:
+        carry = float(initial)
+        first = 0
+    block = int(max(1, min(1024, 100 / -math.log10(decay)))) if decay < 1 else 1024
+    steps = np.arange(block)
+    powers = decay ** steps
+    inverse_powers = decay ** -steps.astype(np.float64)
+    for start in range(first, values.size, block):
+        chunk = values[start:start + block]
+        count = chunk.size
+        result[start:start + count] = powers[:count] * (decay * carry + alpha * np.cumsum(chunk * inverse_powers[:count]))
+        carry = result[start + count - 1]
+    return result
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (span + 1), starting at the first value."""
+    return exponential_smoothing(values, 2.0 / (span + 1))
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Population standard deviation of the last window values, from running sums."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.size, np.nan)
+    if window < 1 or values.size < window:
+        return result
+    _, sums, squares = window_sums(values, window)
+    mean = sums / window
+    result[window - 1:] = np.sqrt(np.maximum(squares / window - mean * mean, 0.0))[window - 1:]
+    return result
+
+def rolling_extreme(values: np.ndarray, window: int, largest: bool = True) -> np.ndarray:
+    """Maximum (or minimum) of the last window values."""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.size, np.nan)
+    if window < 1 or values.size < window:
+        return result
+    if largest:
+        result[window - 1:] = DataProcessor.rolling_max(values, window)
+    else:
+        result[window - 1:] = -DataProcessor.rolling_max(-values, window)
+    return result
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Wilder's relative strength index.
+
+    The average gain and loss start as the means over the first period changes and are then
+    smoothed with alpha = 1 / period. Defined from row period on; 100 when there were no losses,
+    50 when the price did not move at all.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    result = np.full(closes.size, np.nan)
+    if period < 1 or closes.size <= period:
+        return result
+    changes = np.diff(closes)
+    gains = np.maximum(changes, 0.0)
+    losses = np.maximum(-changes, 0.0)
+    alpha = 1.0 / period
+    average_gain = np.concatenate(([gains[:period].mean()],
+                                   exponential_smoothing(gains[period:], alpha, gains[:period].mean())))
+    average_loss = np.concatenate(([losses[:period].mean()],
+                                   exponential_smoothing(losses[period:], alpha, losses[:period].mean())))
+    result[period:] = strength_index(average_gain, average_loss)
+    return result
+
+def strength_index(average_gain, average_loss):
+    """RSI from average gains and losses, scalar or array."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = 100.0 - 100.0 / (1.0 + np.divide(average_gain, average_loss))
+    return np.where(average_loss == 0, np.where(average_gain == 0, 50.0, 100.0), index)
+
+def bollinger_bands(closes: np.ndarray, window: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The middle (SMA), upper and lower bands, width population standard deviations apart."""
+    middle = sma(closes, window)
+    spread = width * rolling_std(closes, window)
+    return middle, middle + spread, middle - spread
+
+def volatility(percent_changes: np.ndarray, window: int) -> np.ndarray:
+    """Standard deviation of the last window daily percent changes; the first row's NaN change is skipped."""
+    percent_changes = np.asarray(percent_changes, dtype=np.float64)
+    result = np.full(percent_changes.size, np.nan)
+    if percent_changes.size > 1:
+        result[1:] = rolling_std(percent_changes[1:], window)
+    return result
+
+def crossovers(fast: np.ndarray, slow: np.ndarray, direction: str) -> np.ndarray:
+    """Rows where fast crosses above (positive) or below (negative) slow, having not been beyond it the row before."""
+    check_direction(direction)
+    difference = np.asarray(fast, dtype=np.float64) - np.asarray(slow, dtype=np.float64)
+    if direction == 'negative':
+        difference = -difference
+    result = np.zeros(difference.size, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        result[1:] = (difference[1:] > 0) & (difference[:-1] <= 0)
+    return result
+
+def breakouts(closes: np.ndarray, num_days: int, direction: str) -> np.ndarray:
+    """Rows whose close is above the highest (positive) or below the lowest (negative) of the previous num_days closes."""
+    check_direction(direction)
+    closes = np.asarray(closes, dtype=np.float64)
+    result = np.zeros(closes.size, dtype=bool)
+    if num_days < 1 or closes.size <= num_days:
+        return result
+    previous = rolling_extreme(closes[:-1], num_days, largest=direction == 'positive')[num_days - 1:]
+    if direction == 'positive':
+        result[num_days:] = closes[num_days:] > previous
+    else:
+        result[num_days:] = closes[num_days:] < previous
+    return result
+
+class RunningMean:
+    """Mean of the last window values, kept as a running sum."""
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, value: float) -> float:
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        return self.total / self.window if len(self.values) == self.window else math.nan
+
+class RunningEMA:
+    """Exponential smoothing of every value pushed, starting at the first."""
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value = math.nan
+
+    def push(self, value: float) -> float:
+        self.value = value if math.isnan(self.value) else self.value + self.alpha * (value - self.value)
+        return self.value
+
+class RunningVariance:
+    """Population variance of the last window values, with Welford's update as values enter and leave."""
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.squares = 0.0
+
+    def push(self, value: float) -> float:
+        self.values.append(value)
+        if len(self.values) <= self.window:
+            delta = value - self.mean
+            self.mean += delta / len(self.values)
+            self.squares += delta * (value - self.mean)
+        else:
+            oldest = self.values.popleft()
+            previous_mean = self.mean
+            self.mean += (value - oldest) / self.window
+            self.squares += (value - oldest) * (value - self.mean + oldest - previous_mean)
+        return max(self.squares, 0.0) / self.window if len(self.values) == self.window else math.nan
+
+    def std(self, value: float) -> float:
+        """Push value and return the standard deviation."""
+        return math.sqrt(self.push(value))
+
+class RunningExtreme:
+    """Maximum (or minimum) of the last window values, from a monotonic deque of candidates."""
+    def __init__(self, window: int, largest: bool = True):
+        self.window = window
+        self.sign = 1.0 if largest else -1.0
+        self.candidates = deque()
+        self.index = -1
+
+    @property
+    def value(self) -> float:
+        """The extreme of the last window values, or NaN before window values were pushed."""
+        if self.index < self.window - 1 or not self.candidates:
+            return math.nan
+        return self.sign * self.candidates[0][1]
+
+    def push(self, value: float) -> float:
+        self.index += 1
+        value = self.sign * value
+        while self.candidates and self.candidates[-1][1] <= value:
+            self.candidates.pop()
+        self.candidates.append((self.index, value))
+        if self.candidates[0][0] <= self.index - self.window:
+            self.candidates.popleft()
+        return self.value
+
+class RunningRSI:
+    """Wilder's RSI of the closes pushed so far, matching rsi()."""
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.last_close = math.nan
+        self.count = 0
+        self.average_gain = 0.0
+        self.average_loss = 0.0
+
+    def push(self, close: float) -> float:
+        previous, self.last_close = self.last_close, close
+        if math.isnan(previous):
+            return math.nan
+        change = close - previous
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self.count += 1
+        if self.count <= self.period:
+            self.average_gain += gain / self.period
+            self.average_loss += loss / self.period
+            if self.count < self.period:
+                return math.nan
+        else:
+            self.average_gain += (gain - self.average_gain) / self.period
+            self.average_loss += (loss - self.average_loss) / self.period
+        return float(strength_index(self.average_gain, self.average_loss))
+
+class Signal(abc.ABC):
+    """
+    Incremental form of an indicator rule: push each bar's close and percent change, in order,
+    and get whether the rule highlights that bar.
+    """
+    # Closes needed to rebuild the state; smoothed indicators converge to the batch values well within it
+    history = 1
+
+    @abc.abstractmethod
+    def push(self, close: float, percent_change: float) -> bool:
+        """Whether the rule highlights the bar just pushed."""
+
+class CrossoverSignal(Signal):
+    def __init__(self, fast: int, slow: int, direction: str, average: str = 'sma'):
+        check_direction(direction)
+        running = {'sma': RunningMean, 'ema': lambda span: RunningEMA(2.0 / (span + 1))}[average]
+        self.fast, self.slow = running(fast), running(slow)
+        self.sign = 1.0 if direction == 'positive' else -1.0
+        self.previous = math.nan
+        self.history = max(fast, slow) + 1 if average == 'sma' else 20 * max(fast, slow)
+
+    def push(self, close: float, percent_change: float) -> bool:
+        difference = self.sign * (self.fast.push(close) - self.slow.push(close))
+        crossed = difference > 0 and self.previous <= 0
+        self.previous = difference
+        return crossed
+
+class VolatilitySignal(Signal):
+    def __init__(self, window: int, percent_threshold: float):
+        self.variance = RunningVariance(window)
+        self.percent_threshold = percent_threshold
+        self.history = window + 1
+
+    def push(self, close: float, percent_change: float) -> bool:
+        if math.isnan(percent_change):
+            return False
+        return math.sqrt(self.variance.push(percent_change)) >= self.percent_threshold
+
+class RSISignal(Signal):
+    def __init__(self, period: int, level: float, direction: str):
+        check_direction(direction)
+        self.rsi = RunningRSI(period)
+        self.level = level
+        self.direction = direction
+        self.history = 20 * period + 1
+
+    def push(self, close: float, percent_change: float) -> bool:
+        value = self.rsi.push(close)
+        return value >= self.level if self.direction == 'positive' else value <= self.level
+
+class BollingerSignal(Signal):
+    def __init__(self, window: int, width: float, direction: str):
+        check_direction(direction)
+        self.mean = RunningMean(window)
+        self.variance = RunningVariance(window)
+        self.width = width
+        self.direction = direction
+        self.history = window
+
+    def push(self, close: float, percent_change: float) -> bool:
+        middle = self.mean.push(close)
+        spread = self.width * math.sqrt(self.variance.push(close))
+        return close > middle + spread if self.direction == 'positive' else close < middle - spread
+
+class BreakoutSignal(Signal):
+    def __init__(self, num_days: int, direction: str):
+        check_direction(direction)
+        self.extreme = RunningExtreme(max(num_days, 1), largest=direction == 'positive')
+        self.num_days = num_days
+        self.direction = direction
+        self.history = num_days
+
+    def push(self, close: float, percent_change: float) -> bool:
+        previous = self.extreme.value
+        self.extreme.push(close)
+        if self.num_days < 1:
+            return False
+        return close > previous if self.direction == 'positive' else close < previous
+
+def moving_average(context: RuleContext, average: str, span: int) -> np.ndarray:
+    """An SMA or EMA of the closes, shared by every rule evaluated against the context."""
+    if average not in AVERAGES:
+        raise ValueError(f"Average must be one of {', '.join(AVERAGES)}")
+    function = sma if average == 'sma' else ema
+    return context.derived((average, span), lambda: function(context.closes, span))
+
+def restyled(format_style: FormatStyle, columns: Union[str, List[str]]) -> FormatStyle:
+    style_dict = format_style.__dict__.copy()
+    style_dict.pop('columns', None)
+    return FormatStyle(columns=columns, **style_dict)
+
+class IndicatorRuleFactory:
+    """
+    Formatting rules on technical indicators, alongside FormattingRuleFactory's.
+
+    Indicator arrays are cached on the RuleContext, so rules sharing an average or band compute it
+    once. Every rule has an incremental form, see signal_for_rule.
+    """
+    @staticmethod
+    def moving_average_crossover_rule(fast: int, slow: int, direction: str, columns: Union[str, List[str]],
+                                      format_style: FormatStyle, average: str = 'sma') -> FormattingRule:
+        """Highlight the days the fast average crosses above (positive) or below (negative) the slow one."""
+        check_direction(direction)
+        if average not in AVERAGES:
+            raise ValueError(f"Average must be one of {', '.join(AVERAGES)}")
+
+        def mask(context):
+            return crossovers(moving_average(context, average, fast), moving_average(context, average, slow), direction)
+
+        return FormattingRule(format_style=restyled(format_style, columns), mask=mask, kind='ma_crossover',
+                              params={'fast': fast, 'slow': slow, 'direction': direction, 'average': average})
+
+    @staticmethod
+    def volatility_rule(window: int, percent_threshold: float, columns: Union[str, List[str]],
+                        format_style: FormatStyle) -> FormattingRule:
+        """Highlight days whose last window daily changes have a standard deviation of at least percent_threshold."""
+        def mask(context):
+            values = context.derived(('volatility', window), lambda: volatility(context.percent_changes, window))
+            with np.errstate(invalid='ignore'):
+                return values >= percent_threshold
+
+        return FormattingRule(format_style=restyled(format_style, columns), mask=mask, kind='volatility',
+                              params={'window': window, 'percent_threshold': percent_threshold})
+
+    @staticmethod
+    def rsi_rule(period: int, level: float, direction: str, columns: Union[str, List[str]],
+                 format_style: FormatStyle) -> FormattingRule:
+        """Highlight days whose RSI is at or above level (positive, e.g. 70) or at or below it (negative, e.g. 30)."""
+        check_direction(direction)
+
+        def mask(context):
+            values = context.derived(('rsi', period), lambda: rsi(context.closes, period))
+            with np.errstate(invalid='ignore'):
+                return values >= level if direction == 'positive' else values <= level
+
+        return FormattingRule(format_style=restyled(format_style, columns), mask=mask, kind='rsi',
+                              params={'period': period, 'level': level, 'direction': direction})
+
+    @staticmethod
+    def bollinger_rule(window: int, width: float, direction: str, columns: Union[str, List[str]],
+                       format_style: FormatStyle) -> FormattingRule:
+        """Highlight days closing above the upper band (positive) or below the lower band (negative)."""
+        check_direction(direction)
+
+        def mask(context):
+            middle = moving_average(context, 'sma', window)
+            spread = width * context.derived(('rolling_std', window), lambda: rolling_std(context.closes, window))
+            with np.errstate(invalid='ignore'):
+                if direction == 'positive':
+                    return context.closes > middle + spread
+                return context.closes < middle - spread
+
+        return FormattingRule(format_style=restyled(format_style, columns), mask=mask, kind='bollinger',
+                              params={'window': window, 'width': width, 'direction': direction})
+
+    @staticmethod
+    def breakout_rule(num_days: int, direction: str, columns: Union[str, List[str]],
+                      format_style: FormatStyle) -> FormattingRule:
+        """Highlight days closing above the previous num_days highs (positive) or below their lows (negative)."""
+        check_direction(direction)
+
+        def mask(context):
+            return breakouts(context.closes, num_days, direction)
+
+        return FormattingRule(format_style=restyled(format_style, columns), mask=mask, kind='breakout',
+                              params={'num_days': num_days, 'direction': direction})
+
+SIGNALS: dict = {
+    'ma_crossover': lambda params: CrossoverSignal(params['fast'], params['slow'], params['direction'], params['average']),
+    'volatility': lambda params: VolatilitySignal(params['window'], params['percent_threshold']),
+    'rsi': lambda params: RSISignal(params['period'], params['level'], params['direction']),
+    'bollinger': lambda params: BollingerSignal(params['window'], params['width'], params['direction']),
+    'breakout': lambda params: BreakoutSignal(params['num_days'], params['direction']),
+}
+
+def signal_for_rule(rule: FormattingRule) -> Optional[Callable[[], Signal]]:
+    """A factory of fresh incremental signals for an IndicatorRuleFactory rule, or None for other rules."""
+    make = SIGNALS.get(rule.kind)
+    if make is None:
+        return None
+    return lambda: make(rule.params)
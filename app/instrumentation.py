@@ -0,0 +1,223 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+# Set to 1 to record spans for every report, or to a file name to also write the summary there as JSON
+PROFILE_ENV = 'HANSEN_STOCK_PROFILE'
+# Set to 1 to also measure peak allocations; tracemalloc slows the openpyxl writers several times over
+MEMORY_ENV = 'HANSEN_STOCK_PROFILE_MEMORY'
+# Set to a file name to write a cProfile dump of every report
+CPROFILE_ENV = 'HANSEN_STOCK_CPROFILE'
+
+@dataclass
+class SpanStats:
+    """Totals for every span recorded under one name."""
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    peak_bytes: int = 0
+
+class SpanRecord:
+    """Handed to the body of a span so it can report the rows and bytes it handled."""
+    __slots__ = ('rows', 'bytes')
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, rows: int = 0, bytes: int = 0):
+        self.rows += rows
+        self.bytes += bytes
+
+class _NullSpan:
+    """What span() yields when nothing is recording; reports are ignored."""
+    def add(self, rows: int = 0, bytes: int = 0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Recorder:
+    """
+    Collects span timings, row and byte counts, and peak allocations.
+
+    Peak allocations come from tracemalloc and are only measured on the thread that created the
+    recorder; spans on other threads, such as the batch fetch pool, record time, rows and bytes.
+    A span's peak is the most memory allocated above what was live when it started, including
+    its nested spans.
+    """
+    def __init__(self, trace_memory: bool = False):
+        self.stats: Dict[str, SpanStats] = {}
+        self.lock = threading.Lock()
+        self.owner = threading.get_ident()
+        self.trace_memory = trace_memory
+        self.started_tracing = False
+        # (traced bytes at start, highest absolute peak seen inside) for each open span on the owner thread
+        self.memory_stack: List[List[int]] = []
+        self.start = time.perf_counter()
+        self.elapsed: Optional[float] = None
+
+    def begin(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def end(self):
+        self.elapsed = time.perf_counter() - self.start
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def _tracks_memory(self) -> bool:
+        return self.trace_memory and tracemalloc.is_tracing() and threading.get_ident() == self.owner
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[SpanRecord]:
+        record = SpanRecord()
+        tracks_memory = self._tracks_memory()
+        if tracks_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.memory_stack:
+                self.memory_stack[-1][1] = max(self.memory_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self.memory_stack.append([current, 0])
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = 0
+            if tracks_memory:
+                started_at, inner_peak = self.memory_stack.pop()
+                peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+                peak_bytes = max(peak - started_at, 0)
+                if self.memory_stack:
+                    self.memory_stack[-1][1] = max(self.memory_stack[-1][1], peak)
+            with self.lock:
+                stats = self.stats.setdefault(name, SpanStats(name))
+                stats.calls += 1
+                stats.seconds += seconds
+                stats.rows += record.rows
+                stats.bytes += record.bytes
+                stats.peak_bytes = max(stats.peak_bytes, peak_bytes)
+
+    def summary(self) -> Dict:
+        """The recorded spans in the order they first ran, as plain data."""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.start
+        with self.lock:
+            spans = [asdict(stats) for stats in self.stats.values()]
+        return {'elapsed_seconds': elapsed, 'spans': spans}
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+    def log_line(self) -> str:
+        """A one-line summary, e.g. 'profile 1.203s fetch.download=0.512s/1.9MB ...'."""
+        summary = self.summary()
+        parts = [f"profile {summary['elapsed_seconds']:.3f}s"]
+        for stats in summary['spans']:
+            part = f"{stats['name']}={stats['seconds']:.3f}s"
+            if stats['calls'] > 1:
+                part += f"x{stats['calls']}"
+            if stats['rows']:
+                part += f"/{stats['rows']}rows"
+            if stats['bytes']:
+                part += f"/{stats['bytes'] / 1e6:.1f}MB"
+            if stats['peak_bytes']:
+                part += f"/peak{stats['peak_bytes'] / 1e6:.1f}MB"
+            parts.append(part)
+        return ' '.join(parts)
+
+_recorder: Optional[Recorder] = None
+
+def active_recorder() -> Optional[Recorder]:
+    return _recorder
+
+def span(name: str):
+    """
+    Time a stage of the pipeline if profiling is on.
+
+    Usage:
+        with span("fetch.download") as record:
+            ...
+            record.add(bytes=len(body))
+
+    When nothing is recording this returns a shared no-op context, so spans can stay in hot paths.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return NULL_SPAN
+    return recorder.span(name)
+
+@contextmanager
+def profiling(trace_memory: bool = False, cprofile_path: Optional[str] = None) -> Iterator[Recorder]:
+    """
+    Record spans, and optionally a cProfile dump, for the duration of the block.
+
+    Args:
+        trace_memory (bool): Measure peak allocations with tracemalloc. This slows allocation-heavy code,
+            openpyxl's cell writing in particular, so timings from the same run read high.
+        cprofile_path (Optional[str]): Where to write a cProfile dump, readable with pstats or snakeviz.
+
+    Yields:
+        Recorder: The recorder; its summary is complete once the block exits.
+    """
+    global _recorder
+    previous = _recorder
+    recorder = Recorder(trace_memory)
+    profiler = cProfile.Profile() if cprofile_path else None
+    _recorder = recorder
+    recorder.begin()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield recorder
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        recorder.end()
+        _recorder = previous
+
+@contextmanager
+def profiling_from_env(environ=os.environ) -> Iterator[Optional[Recorder]]:
+    """
+    Profile the block if PROFILE_ENV or CPROFILE_ENV is set; otherwise do nothing. MEMORY_ENV adds
+    peak allocations.
+
+    On exit the log line is printed to stderr, and the JSON summary is written to the file named
+    by PROFILE_ENV if its value is not just a flag.
+    """
+    setting = environ.get(PROFILE_ENV, '')
+    enabled = setting.lower() not in ('', '0', 'false', 'no')
+    cprofile_path = environ.get(CPROFILE_ENV) or None
+    # Already inside a profiled block, e.g. the CLI's --profile
+    if _recorder is not None or not (enabled or cprofile_path):
+        yield None
+        return
+
+    trace_memory = environ.get(MEMORY_ENV, '').lower() not in ('', '0', 'false', 'no')
+    with profiling(trace_memory, cprofile_path) as recorder:
+        yield recorder
+    report(recorder, setting if enabled and setting.lower() not in ('1', 'true', 'yes') else None)
+
+def report(recorder: Recorder, json_path: Optional[str] = None):
+    """Print the recorder's log line to stderr and optionally write its JSON summary."""
+    print(recorder.log_line(), file=sys.stderr)
+    if json_path:
+        with open(json_path, 'w') as f:
+            f.write(recorder.to_json())
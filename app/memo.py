@@ -0,0 +1,186 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+# Default bound of the in-process tier
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_MAX_ENTRIES = 4096
+# Default bound of the on-disk tier
+DEFAULT_DISK_BYTES = 1024 * 2**20
+
+def fingerprint(*arrays: np.ndarray) -> str:
+    """
+    A digest of the arrays' contents, dtypes and shapes.
+
+    Values derived from the arrays are cached under it, so they are looked up again only for
+    identical data: a series that gains, loses or revises a row gets a new fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.view(np.uint8).reshape(-1))
+    return digest.hexdigest()
+
+def key_digest(key: Hashable) -> str:
+    """File name stem for a key in the on-disk tier; keys are tuples of strings and numbers."""
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+def value_size(value: Any) -> int:
+    """Bytes counted against the in-process bound: the array data of arrays, else a nominal 64."""
+    return int(getattr(value, 'nbytes', 64))
+
+@dataclass
+class MemoStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+class MemoCache:
+    """
+    A bounded LRU of derived values, optionally backed by a directory of .npy files.
+
+    Entries are evicted, least recently used first, once the cache holds more than max_entries
+    values or max_bytes of array data. With disk_dir, arrays are also written there and a miss in
+    memory is looked up on disk before being recomputed, so later processes can reuse them; the
+    oldest files are removed once the directory passes disk_bytes. Only numeric and boolean
+    arrays are written to disk; other values live in memory only.
+
+    Keys should start with a fingerprint of the data the value was derived from, so changed data
+    never finds a stale value. Arrays are cached as read-only views, as every caller shares them;
+    the array passed in keeps its flags, but changing it afterwards changes the cached value too.
+    The cache is safe to use from several threads.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 disk_dir: Optional[str] = None, disk_bytes: int = DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.stats = MemoStats()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._bytes = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of array data held in memory."""
+        return self._bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The value cached under key, from memory or disk, or default."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return self._entries[key]
+        value = self._load(key)
+        if value is None:
+            with self._lock:
+                self.stats.misses += 1
+            return default
+        with self._lock:
+            self.stats.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """Cache value under key in memory, and on disk if there is a disk tier; returns the cached value."""
+        if isinstance(value, np.ndarray):
+            value = value.view()
+            value.flags.writeable = False
+        with self._lock:
+            self._remember(key, value)
+        self._store(key, value)
+        return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """The value cached under key, computing and caching it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        """Empty the in-process tier; files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key: Hashable, value: Any):
+        if key in self._entries:
+            self._bytes -= value_size(self._entries.pop(key))
+        self._entries[key] = value
+        self._bytes += value_size(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= value_size(evicted)
+            self.stats.evictions += 1
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self.disk_dir, f"{key_digest(key)}.npy")
+
+    def _load(self, key: Hashable) -> Optional[np.ndarray]:
+        if self.disk_dir is None:
+            return None
+        try:
+            value = np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        value.flags.writeable = False
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        if self.disk_dir is None or not isinstance(value, np.ndarray) or value.dtype.kind not in 'biufcmM':
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._path(key)
+        handle, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.save(file, value, allow_pickle=False)
+            # Sizes on disk, .npy header included; a file being overwritten no longer counts
+            written = os.path.getsize(temp_path)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(entry.stat().st_size for entry in os.scandir(self.disk_dir)
+                                      if entry.name.endswith('.npy'))
+            else:
+                self._disk_used += written - replaced
+            if self._disk_used > self.disk_bytes:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove the least recently written files until the directory is back under 90% of disk_bytes."""
+        files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                       for entry in os.scandir(self.disk_dir) if entry.name.endswith('.npy'))
+        used = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if used <= self.disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+        self._disk_used = used
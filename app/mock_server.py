@@ -0,0 +1,355 @@
+"""
+A local stand-in for the Alpha Vantage TIME_SERIES_DAILY endpoint, for offline and load testing.
+
+Every symbol is answered with a reproducible synthetic history ending on the latest weekday, or
+with a response recorded from the real API. Latency, throttling notices and server errors can be
+injected to see how the fetcher, the batch fetcher and the cache behave under load.
+
+    python -m app.mock_server serve --port 8765 --latency 0.05 --throttle-rate 0.02
+    ALPHAVANTAGE_BASE_URL=http://127.0.0.1:8765/query python -m app run --symbols IBM ...
+
+Record real responses once, then replay them without a network:
+
+    python -m app.mock_server record --symbols IBM MSFT --out recorded --api-key KEY
+    python -m app.mock_server serve --replay recorded
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from app.synthetic import synthetic_series
+
+THROTTLE_NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+                 "and 25 calls per day.")
+COMPACT_ROWS = 100
+CSV_HEADER = 'timestamp,open,high,low,close,volume'
+
+# (HTTP status, content type, body)
+Response = Tuple[int, str, bytes]
+
+@dataclass
+class MockSettings:
+    """
+    How the mock server answers.
+
+    Attributes:
+        rows (int): Trading days in each synthetic full history.
+        latency (float): Seconds to wait before answering.
+        jitter (float): Extra random wait, up to this many seconds.
+        throttle_rate (float): Fraction of requests answered with a rate-limit Note.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): The HTTP status of injected errors.
+        per_minute (Optional[int]): Answer with a Note once this many requests arrived in the last minute.
+        replay_dir (Optional[str]): Serve <SYMBOL>.json files recorded from the real API instead of
+            synthetic data; other symbols get an "Error Message" like an unknown ticker.
+        seed (int): Seed for the synthetic prices and the injected faults.
+        cached_bodies (int): Response bodies kept in memory, least recently served evicted first. A
+            full JSON history is about 0.6 MB, so large universes are rebuilt rather than all kept.
+    """
+    rows: int = 5000
+    latency: float = 0.0
+    jitter: float = 0.0
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    per_minute: Optional[int] = None
+    replay_dir: Optional[str] = None
+    seed: int = 0
+    cached_bodies: int = 64
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    served: int = 0
+    throttled: int = 0
+    errors: int = 0
+    bytes: int = 0
+
+def json_response(payload: Dict[str, Any], status: int = 200) -> Response:
+    return status, 'application/json', json.dumps(payload).encode()
+
+def synthetic_payload(symbol: str, rows: int, seed: int = 0, today: Optional[date] = None) -> Dict[str, Any]:
+    """A TIME_SERIES_DAILY JSON payload of rows synthetic days ending on the last weekday up to today."""
+    last = np.busday_offset(np.datetime64(today or date.today(), 'D'), 0, roll='backward')
+    start = np.busday_offset(last, -(rows - 1))
+    symbol_seed = zlib.crc32(symbol.encode()) ^ seed
+    series = synthetic_series(rows, symbol=symbol, seed=symbol_seed, start=start)
+    volumes = np.random.default_rng(symbol_seed).integers(100_000, 10_000_000, rows)
+    days = series.dates.astype(str).tolist()
+    columns = [np.char.mod('%.4f', values).tolist() for values in (series.open, series.high, series.low, series.close)]
+    time_series = {}
+    for i in range(rows - 1, -1, -1):
+        time_series[days[i]] = {'1. open': columns[0][i], '2. high': columns[1][i], '3. low': columns[2][i],
+                                '4. close': columns[3][i], '5. volume': str(volumes[i])}
+    return {
+        'Meta Data': {
+            '1. Information': 'Daily Prices (open, high, low, close) and Volumes',
+            '2. Symbol': symbol,
+            '3. Last Refreshed': days[-1] if days else '',
+            '4. Output Size': 'Full size',
+            '5. Time Zone': 'US/Eastern',
+        },
+        'Time Series (Daily)': time_series,
+    }
+
+def compact(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The latest COMPACT_ROWS days of a full payload, as outputsize=compact returns them."""
+    days = list(payload['Time Series (Daily)'].items())[:COMPACT_ROWS]
+    meta = dict(payload['Meta Data'], **{'4. Output Size': 'Compact'})
+    return {'Meta Data': meta, 'Time Series (Daily)': dict(days)}
+
+def to_csv(payload: Dict[str, Any]) -> bytes:
+    """Render a JSON payload the way datatype=csv returns it, newest first."""
+    lines = [CSV_HEADER]
+    for day, fields in payload['Time Series (Daily)'].items():
+        lines.append(','.join([day, fields['1. open'], fields['2. high'], fields['3. low'], fields['4. close'],
+                               fields.get('5. volume', '0')]))
+    return ('\r\n'.join(lines) + '\r\n').encode()
+
+class MockAlphaVantage:
+    """
+    Answers query strings the way Alpha Vantage would, without the HTTP layer.
+
+    Bodies are built once per symbol, output size and data type and the most recently served are
+    kept in memory, so a load test over a few symbols measures the client rather than the mock.
+    """
+    def __init__(self, settings: Optional[MockSettings] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.settings = settings or MockSettings()
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = MockStats()
+        self.lock = threading.Lock()
+        self.random = random.Random(self.settings.seed)
+        self.recent: deque = deque()
+        self.bodies: "OrderedDict[Tuple[str, str, str], Response]" = OrderedDict()
+
+    def load(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """The full payload for a symbol, or None if it is unknown."""
+        if self.settings.replay_dir is None:
+            return synthetic_payload(symbol, self.settings.rows, self.settings.seed)
+        path = os.path.join(self.settings.replay_dir, f"{symbol}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def body(self, symbol: str, outputsize: str, datatype: str) -> Response:
+        key = (symbol, outputsize, datatype)
+        with self.lock:
+            cached = self.bodies.get(key)
+            if cached is not None:
+                self.bodies.move_to_end(key)
+                return cached
+        payload = self.load(symbol)
+        if payload is None or 'Time Series (Daily)' not in payload:
+            response = json_response({'Error Message': 'Invalid API call. Please retry or visit the documentation '
+                                                       'for TIME_SERIES_DAILY.'})
+        else:
+            if outputsize == 'compact':
+                payload = compact(payload)
+            if datatype == 'csv':
+                # Like the real API, without a charset
+                response = (200, 'application/x-download', to_csv(payload))
+            else:
+                response = json_response(payload)
+        with self.lock:
+            self.bodies[key] = response
+            while len(self.bodies) > self.settings.cached_bodies:
+                self.bodies.popitem(last=False)
+        return response
+
+    def fault(self) -> Optional[Response]:
+        """An injected throttle notice or error for this request, if it gets one."""
+        settings = self.settings
+        with self.lock:
+            self.stats.requests += 1
+            now = self.clock()
+            while self.recent and now - self.recent[0] >= 60.0:
+                self.recent.popleft()
+            over_limit = settings.per_minute is not None and len(self.recent) >= settings.per_minute
+            self.recent.append(now)
+            roll = self.random.random()
+            if over_limit or roll < settings.throttle_rate:
+                self.stats.throttled += 1
+                return json_response({'Note': THROTTLE_NOTE})
+            if roll < settings.throttle_rate + settings.error_rate:
+                self.stats.errors += 1
+                return settings.error_status, 'text/plain', b'Service Unavailable'
+            delay = settings.latency + self.random.random() * settings.jitter
+        if delay > 0:
+            self.sleep(delay)
+        return None
+
+    def respond(self, query: Dict[str, str]) -> Response:
+        """
+        Answer one request.
+
+        Args:
+            query (Dict[str, str]): The request's query parameters.
+
+        Returns:
+            Response: The HTTP status, content type and body.
+        """
+        response = self.fault()
+        if response is None:
+            if query.get('function') != 'TIME_SERIES_DAILY' or not query.get('symbol'):
+                response = json_response({'Error Message': 'This mock only serves TIME_SERIES_DAILY.'})
+            else:
+                response = self.body(query['symbol'], query.get('outputsize', 'compact'), query.get('datatype', 'json'))
+            with self.lock:
+                self.stats.served += 1
+        with self.lock:
+            self.stats.bytes += len(response[2])
+        return response
+
+class MockServer:
+    """
+    Runs a MockAlphaVantage over HTTP on a background thread.
+
+    Usage:
+        with MockServer(MockSettings(latency=0.05)) as server:
+            fetcher = StockDataFetcher("key", base_url=server.url)
+    """
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = '127.0.0.1', port: int = 0):
+        self.api = MockAlphaVantage(settings)
+        api = self.api
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+                status, content_type, body = api.respond(query)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/query"
+
+    @property
+    def stats(self) -> MockStats:
+        return self.api.stats
+
+    def start(self) -> "MockServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+def record(symbols: Sequence[str], directory: str, api_key: str, base_url: Optional[str] = None,
+           sleep: Callable[[float], None] = time.sleep) -> List[str]:
+    """
+    Save the real API's full TIME_SERIES_DAILY responses as <SYMBOL>.json files for replay.
+
+    Requests are spaced to stay inside the free tier's per-minute quota. Throttled or failed
+    symbols are skipped.
+
+    Returns:
+        List[str]: The symbols recorded.
+    """
+    from app.batch_fetcher import REQUESTS_PER_MINUTE
+    from app.stock_data_fetcher import StockDataFetcher
+
+    fetcher = StockDataFetcher(api_key, base_url=base_url)
+    os.makedirs(directory, exist_ok=True)
+    recorded = []
+    for i, symbol in enumerate(symbols):
+        if i:
+            sleep(60.0 / REQUESTS_PER_MINUTE)
+        response = fetcher.session.get(fetcher.base_url, params={
+            'function': 'TIME_SERIES_DAILY', 'symbol': symbol, 'outputsize': 'full', 'apikey': api_key})
+        if response.status_code != 200 or 'Time Series (Daily)' not in response.json():
+            continue
+        with open(os.path.join(directory, f"{symbol}.json"), 'wb') as f:
+            f.write(response.content)
+        recorded.append(symbol)
+    fetcher.close()
+    return recorded
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.mock_server", description="Local Alpha Vantage stand-in")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="answer TIME_SERIES_DAILY requests until interrupted")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--rows", type=int, default=5000, help="trading days in each synthetic history")
+    serve.add_argument("--latency", type=float, default=0.0, help="seconds before each answer")
+    serve.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    serve.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with a Note")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    serve.add_argument("--error-status", type=int, default=503)
+    serve.add_argument("--per-minute", type=int, default=None, help="throttle past this many requests a minute")
+    serve.add_argument("--replay", metavar="DIR", default=None, help="serve recorded <SYMBOL>.json files")
+    serve.add_argument("--seed", type=int, default=0)
+
+    rec = commands.add_parser("record", help="save real API responses for --replay")
+    rec.add_argument("--symbols", nargs="+", required=True)
+    rec.add_argument("--out", required=True, help="directory to write <SYMBOL>.json files into")
+    rec.add_argument("--api-key", default=None, help="Alpha Vantage key; defaults to the app's usual lookup")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "record":
+        from app.config import resolve_api_key
+
+        api_key = resolve_api_key(args.api_key)
+        if not api_key:
+            print("No API key to record with", file=sys.stderr)
+            return 2
+        for symbol in record(args.symbols, args.out, api_key):
+            print(symbol)
+        return 0
+
+    settings = MockSettings(args.rows, args.latency, args.jitter, args.throttle_rate, args.error_rate,
+                            args.error_status, args.per_minute, args.replay, args.seed)
+    server = MockServer(settings, args.host, args.port)
+    print(f"Serving on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"{server.stats.requests} requests, {server.stats.throttled} throttled, {server.stats.errors} errors")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import abc
+import asyncio
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.batch_fetcher import RateLimiter
+from app.formatting import FormattingRule
+from app.incremental import IncrementalEvaluator
+from app.price_series import PriceSeries
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError, with_rate_limiter
+
+# Trading days Alpha Vantage returns for outputsize=compact
+COMPACT_BARS = 100
+
+@dataclass
+class Alert:
+    """A rule highlighting one of a symbol's new bars."""
+    symbol: str
+    day: date
+    kind: str
+    params: Dict[str, Any]
+    close: float
+    percent_change: float
+    detected_at: datetime
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'day': self.day.isoformat(),
+            'kind': self.kind,
+            'params': self.params,
+            'close': self.close,
+            'percent_change': None if np.isnan(self.percent_change) else self.percent_change,
+            'detected_at': self.detected_at.isoformat(),
+        }
+
+class QuoteSource(abc.ABC):
+    """Where the monitor gets each symbol's recent daily bars."""
+    @abc.abstractmethod
+    async def recent_bars(self, symbol: str, bars: int = COMPACT_BARS) -> Optional[PriceSeries]:
+        """
+        The symbol's latest daily bars, oldest first, or None if they could not be fetched.
+
+        At least bars of them are returned where the symbol's history is that long.
+        """
+
+class FetcherQuoteSource(QuoteSource):
+    """
+    Polls Alpha Vantage's compact output, the latest 100 trading days, for each symbol, or the full
+    history when more bars are needed to prime the rules (an RSI or a long cumulative window).
+
+    Requests wait for the rate limiter without blocking the event loop, and the download itself
+    runs on a worker thread.
+    """
+    def __init__(self, fetcher: StockDataFetcher, rate_limiter: Optional[RateLimiter] = None,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.sleep = sleep
+        # The limiter is applied here, before the request is handed to a thread, so the copy used
+        # for requests has none; the caller's fetcher keeps its own
+        self.fetcher = with_rate_limiter(fetcher, None)
+
+    async def recent_bars(self, symbol: str, bars: int = COMPACT_BARS) -> Optional[PriceSeries]:
+        while True:
+            wait = self.rate_limiter.try_acquire()
+            if wait == 0:
+                break
+            await self.sleep(wait)
+        try:
+            outputsize = 'compact' if bars <= COMPACT_BARS else 'full'
+            return await asyncio.to_thread(self.fetcher.request_time_series, symbol, outputsize)
+        except ThrottledError:
+            self.rate_limiter.penalize()
+            raise
+
+class SymbolWatch:
+    """
+    One symbol's rule state between polls: the incremental detectors and the last date seen.
+
+    Only a few numbers per rule are kept, not the bars themselves.
+    """
+    __slots__ = ('symbol', 'rules', 'evaluator', 'last_date')
+
+    def __init__(self, symbol: str, rules: Sequence[FormattingRule]):
+        self.symbol = symbol
+        self.rules = rules
+        self.evaluator = IncrementalEvaluator(rules)
+        self.last_date: Optional[np.datetime64] = None
+
+    @property
+    def bars_needed(self) -> int:
+        """
+        Bars the next poll should fetch: the rules' history plus the newest bar to prime the state,
+        then only what arrived since. A poll after a gap longer than the compact output rebuilds the
+        state from the bars it got.
+        """
+        return self.evaluator.history + 1 if self.last_date is None else 1
+
+    def update(self, bars: PriceSeries, detected_at: datetime) -> List[Alert]:
+        """
+        Evaluate the bars newer than the last poll and return an alert for each rule that highlights one.
+
+        On the first poll, or when the bars no longer reach back to the last date seen, the state is
+        rebuilt from all but the newest bar, so only the newest bar can raise alerts.
+        """
+        if len(bars) == 0:
+            return []
+        if self.last_date is None or bars.dates[0] > self.last_date:
+            history = bars[:-1]
+            self.evaluator.prime(history.close[-self.evaluator.history:], len(history))
+            new = bars[-1:]
+        else:
+            new = bars[int(np.searchsorted(bars.dates, self.last_date, side='right')):]
+        if len(new) == 0:
+            return []
+
+        update = self.evaluator.append(new.close)
+        self.last_date = new.dates[-1]
+        first = self.evaluator.length - len(new)
+        days = new.date_list()
+        alerts = []
+        for rule, rows in zip(self.rules, update.highlights):
+            for row in rows[rows >= first].tolist():
+                alerts.append(Alert(self.symbol, days[row - first], rule.kind, dict(rule.params),
+                                    float(new.close[row - first]), float(update.percent_changes[row - first]),
+                                    detected_at))
+        return alerts
+
+class AlertSink(abc.ABC):
+    """Receives the alerts of each poll."""
+    @abc.abstractmethod
+    def emit(self, alerts: Sequence[Alert]):
+        """Handle one poll's alerts."""
+
+    def close(self):
+        pass
+
+class JsonLogSink(AlertSink):
+    """Appends one JSON object per alert to a file."""
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, alerts: Sequence[Alert]):
+        with open(self.path, 'a') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert.to_dict()) + '\n')
+
+class SQLiteSink(AlertSink):
+    """
+    Records alerts in an SQLite table, once per symbol, day and rule.
+
+    A restarted monitor re-alerting on the same bar does not add a row.
+    """
+    def __init__(self, path: str):
+        # Sinks are called from a worker thread, one call at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS alerts ("
+            "symbol TEXT NOT NULL, day TEXT NOT NULL, kind TEXT NOT NULL, params TEXT NOT NULL, "
+            "close REAL, percent_change REAL, detected_at TEXT, "
+            "PRIMARY KEY (symbol, day, kind, params))"
+        )
+        self.connection.commit()
+
+    def emit(self, alerts: Sequence[Alert]):
+        rows = []
+        for alert in alerts:
+            values = alert.to_dict()
+            rows.append((values['symbol'], values['day'], values['kind'], json.dumps(values['params'], sort_keys=True),
+                         values['close'], values['percent_change'], values['detected_at']))
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO alerts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.connection.close()
+
+class WebhookSink(AlertSink):
+    """
+    Posts each poll's alerts as {"alerts": [...]} JSON to a URL.
+
+    post is called with the URL and the payload; by default it is a requests.post with a timeout.
+    """
+    def __init__(self, url: str, post: Optional[Callable[[str, Dict[str, Any]], Any]] = None, timeout: float = 10.0):
+        self.url = url
+        self.post = post if post is not None else self.post_json
+        self.timeout = timeout
+
+    def post_json(self, url: str, payload: Dict[str, Any]):
+        import requests
+
+        requests.post(url, json=payload, timeout=self.timeout).raise_for_status()
+
+    def emit(self, alerts: Sequence[Alert]):
+        if alerts:
+            self.post(self.url, {'alerts': [alert.to_dict() for alert in alerts]})
+
+@dataclass
+class MonitorCycle:
+    """What one poll of the watchlist produced: the alerts, and the symbols or sinks that failed."""
+    alerts: List[Alert] = field(default_factory=list)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+class WatchlistMonitor:
+    """
+    Polls a watchlist for new daily bars and alerts when a report rule highlights one.
+
+    Each symbol keeps only its incremental rule state, so hundreds of symbols fit in one process.
+    A poll fetches the symbols concurrently, up to max_concurrency at a time, with the quote source
+    keeping to the API's quota.
+    """
+    def __init__(self, symbols: Iterable[str], rules: Sequence[FormattingRule], source: QuoteSource,
+                 sinks: Sequence[AlertSink] = (), interval: float = 900.0, max_concurrency: int = 4,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.watches = [SymbolWatch(symbol, rules) for symbol in dict.fromkeys(symbols)]
+        self.source = source
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.clock = clock
+
+    async def poll_once(self) -> MonitorCycle:
+        """Poll every symbol once and hand the alerts to the sinks."""
+        cycle = MonitorCycle()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def poll(watch: SymbolWatch):
+            # A failed fetch or update is recorded for its symbol without ending the others
+            try:
+                async with semaphore:
+                    bars = await self.source.recent_bars(watch.symbol, watch.bars_needed)
+                if bars is None:
+                    raise ValueError(f"Failed to fetch stock data for {watch.symbol}")
+                cycle.alerts.extend(watch.update(bars, self.clock()))
+            except Exception as e:
+                cycle.errors[watch.symbol] = e
+
+        await asyncio.gather(*(poll(watch) for watch in self.watches))
+        if cycle.alerts:
+            for sink in self.sinks:
+                try:
+                    await asyncio.to_thread(sink.emit, cycle.alerts)
+                except Exception as e:
+                    cycle.errors[f"sink:{type(sink).__name__}"] = e
+        return cycle
+
+    async def run(self, cycles: Optional[int] = None, stop: Optional[asyncio.Event] = None,
+                  on_cycle: Optional[Callable[[MonitorCycle], None]] = None):
+        """
+        Poll every interval seconds until cycles polls have run or stop is set.
+
+        Args:
+            cycles (Optional[int]): Number of polls; runs until stopped if None.
+            stop (Optional[asyncio.Event]): Set it to end the loop after the current poll.
+            on_cycle (Optional[Callable[[MonitorCycle], None]]): Called with the result of every poll.
+        """
+        stop = stop if stop is not None else asyncio.Event()
+        completed = 0
+        try:
+            while not stop.is_set() and (cycles is None or completed < cycles):
+                started = time.monotonic()
+                cycle = await self.poll_once()
+                completed += 1
+                if on_cycle is not None:
+                    on_cycle(cycle)
+                if cycles is not None and completed >= cycles:
+                    break
+                try:
+                    await asyncio.wait_for(stop.wait(), max(0.0, self.interval - (time.monotonic() - started)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for sink in self.sinks:
+                sink.close()
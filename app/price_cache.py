@@ -0,0 +1,194 @@
+import os
+import re
+import tempfile
+import numpy as np
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from app.price_series import PriceSeries, PRICE_COLUMNS
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'hansen_stock_app')
+
+# Alpha Vantage's compact output holds the latest 100 trading days
+COMPACT_OUTPUT_DAYS = 100
+
+@dataclass
+class CacheEntry:
+    series: PriceSeries
+    fetched_on: date
+
+    @property
+    def nbytes(self) -> int:
+        return self.series.nbytes
+
+    def is_fresh(self, date_end: date, today: date) -> bool:
+        """
+        Check whether the cached prices can answer a request ending on date_end.
+
+        The entry is fresh if it already reaches date_end or was downloaded today.
+        """
+        if self.fetched_on >= today:
+            return True
+        return len(self.series) > 0 and self.series.dates[-1] >= np.datetime64(date_end, 'D')
+
+    def refresh_outputsize(self, today: date) -> str:
+        """Pick the smallest Alpha Vantage outputsize that covers the days missing from the cache."""
+        if len(self.series) == 0:
+            return 'full'
+        gap = (today - self.series.dates[-1].astype(object)).days
+        return 'compact' if gap < COMPACT_OUTPUT_DAYS else 'full'
+
+class PriceCache:
+    """
+    Stores each symbol's full daily history as an NPZ file in cache_dir.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path_for(self, symbol: str) -> str:
+        file_name = re.sub(r'[^A-Z0-9._-]', '_', symbol.upper())
+        return os.path.join(self.cache_dir, f"{file_name}.npz")
+
+    def load(self, symbol: str) -> Optional[CacheEntry]:
+        """
+        Read a symbol's cached prices.
+
+        Args:
+            symbol (str): The ticker symbol.
+
+        Returns:
+            Optional[CacheEntry]: The cached prices, or None if the symbol is not cached or the file is unreadable.
+        """
+        path = self.path_for(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                series = PriceSeries(
+                    archive['dates'],
+                    symbol=str(archive['symbol']),
+                    **{column: archive[column] for column in PRICE_COLUMNS}
+                )
+                fetched_on = archive['fetched_on'].astype('datetime64[D]').item()
+        except (OSError, KeyError, ValueError):
+            return None
+        return CacheEntry(series, fetched_on)
+
+    def save(self, symbol: str, series: PriceSeries, fetched_on: date) -> CacheEntry:
+        """
+        Write a symbol's prices, replacing any previous file atomically.
+
+        Args:
+            symbol (str): The ticker symbol.
+            series (PriceSeries): The full price history to store.
+            fetched_on (date): The day the prices were downloaded.
+
+        Returns:
+            CacheEntry: The stored entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(symbol)
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(
+                    file,
+                    dates=series.dates,
+                    symbol=np.str_(series.symbol or symbol),
+                    fetched_on=np.datetime64(fetched_on, 'D'),
+                    **{column: getattr(series, column) for column in PRICE_COLUMNS}
+                )
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return CacheEntry(series, fetched_on)
+
+class MemmapPriceCache(PriceCache):
+    """
+    Stores each symbol's history as one fixed-width binary file that is memory-mapped on load.
+
+    The file is a 64-byte header followed by the dates and the open, high, low and close columns,
+    each a contiguous little-endian block of 8-byte values. load() maps the file instead of
+    reading it, so the columns are views into the page cache: slicing a date range is a binary
+    search over the dates plus a zero-copy view, and only the pages of the rows actually used are
+    read from disk. Many long histories can be open at once without holding them in memory.
+
+    Files are replaced atomically on save. Series loaded before a save keep seeing the old
+    file's data; on Windows a file cannot be replaced while it is mapped.
+    """
+    MAGIC = b'HSPS'
+    VERSION = 1
+    HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('rows', '<u8'), ('fetched_on', '<i8'),
+                       ('symbol', 'S40')])
+    BLOCKS = 1 + len(PRICE_COLUMNS)
+
+    def path_for(self, symbol: str) -> str:
+        return os.path.splitext(super().path_for(symbol))[0] + '.prices'
+
+    def load(self, symbol: str) -> Optional[CacheEntry]:
+        """
+        Map a symbol's cached prices.
+
+        Args:
+            symbol (str): The ticker symbol.
+
+        Returns:
+            Optional[CacheEntry]: The cached prices backed by the file, or None if the symbol is not
+                cached or the file is truncated or not in this format.
+        """
+        path = self.path_for(symbol)
+        try:
+            header = np.fromfile(path, dtype=self.HEADER, count=1)
+            if header.size != 1 or header['magic'][0] != self.MAGIC or header['version'][0] != self.VERSION:
+                return None
+            rows = int(header['rows'][0])
+            if os.path.getsize(path) != self.HEADER.itemsize + rows * 8 * self.BLOCKS:
+                return None
+            name = header['symbol'][0].decode('utf-8') or symbol
+            fetched_on = np.datetime64(int(header['fetched_on'][0]), 'D').item()
+            if rows == 0:
+                return CacheEntry(PriceSeries.empty(name), fetched_on)
+            blocks = np.memmap(path, dtype='<f8', mode='r', offset=self.HEADER.itemsize, shape=(self.BLOCKS, rows))
+        except (OSError, ValueError):
+            return None
+        series = PriceSeries(blocks[0].view('<M8[D]'), symbol=name,
+                             **{column: blocks[i + 1] for i, column in enumerate(PRICE_COLUMNS)})
+        return CacheEntry(series, fetched_on)
+
+    def save(self, symbol: str, series: PriceSeries, fetched_on: date) -> CacheEntry:
+        """
+        Write a symbol's prices, replacing any previous file atomically.
+
+        Args:
+            symbol (str): The ticker symbol.
+            series (PriceSeries): The full price history to store.
+            fetched_on (date): The day the prices were downloaded.
+
+        Returns:
+            CacheEntry: The stored entry, mapped from the new file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(symbol)
+        header = np.zeros(1, dtype=self.HEADER)
+        header['magic'] = self.MAGIC
+        header['version'] = self.VERSION
+        header['rows'] = len(series)
+        header['fetched_on'] = np.datetime64(fetched_on, 'D').astype(np.int64)
+        header['symbol'] = (series.symbol or symbol).encode('utf-8')[:self.HEADER['symbol'].itemsize]
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                header.tofile(file)
+                np.ascontiguousarray(series.dates, dtype='<M8[D]').tofile(file)
+                for column in PRICE_COLUMNS:
+                    np.ascontiguousarray(getattr(series, column), dtype='<f8').tofile(file)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        entry = self.load(symbol)
+        return entry if entry is not None else CacheEntry(series, fetched_on)
+
+CACHE_FORMATS = {'npz': PriceCache, 'memmap': MemmapPriceCache}
@@ -0,0 +1,218 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Union
+from datetime import date, datetime
+
+if TYPE_CHECKING:
+    import pandas
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+DateLike = Union[date, datetime, str, np.datetime64]
+
+
+def to_datetime64(value: DateLike) -> np.datetime64:
+    """
+    Convert a date-like value to a day-resolution numpy datetime64.
+
+    Args:
+        value (DateLike): A date, datetime, ISO 'YYYY-MM-DD' string or datetime64.
+
+    Returns:
+        np.datetime64: The value truncated to day resolution.
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+@dataclass(eq=False)
+class PriceSeries:
+    """
+    Daily OHLC prices for a single symbol stored as sorted, contiguous NumPy columns.
+
+    The series also answers the read-only parts of the legacy
+    ``{date: {"open": ..., "close": ...}}`` mapping (``keys``, ``items``,
+    ``data[date]`` and ``data["stock_symbol"]``) so existing callers keep working.
+    """
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    symbol: Optional[str] = None
+
+    def __post_init__(self):
+        self.dates = np.asarray(self.dates, dtype='datetime64[D]')
+        for column in PRICE_COLUMNS:
+            values = np.ascontiguousarray(getattr(self, column), dtype=np.float64)
+            if values.shape != self.dates.shape:
+                raise ValueError(f"Column '{column}' has {values.size} values for {self.dates.size} dates")
+            setattr(self, column, values)
+
+        if self.dates.size > 1 and not np.all(self.dates[1:] > self.dates[:-1]):
+            order = np.argsort(self.dates, kind='stable')
+            self.dates = self.dates[order]
+            for column in PRICE_COLUMNS:
+                setattr(self, column, getattr(self, column)[order])
+
+    @classmethod
+    def empty(cls, symbol: Optional[str] = None) -> "PriceSeries":
+        """Create a series with no rows."""
+        no_values = np.empty(0, dtype=np.float64)
+        return cls(np.empty(0, dtype='datetime64[D]'), no_values, no_values, no_values, no_values, symbol)
+
+    @classmethod
+    def from_dict(cls, data: Dict[Any, Any]) -> "PriceSeries":
+        """
+        Build a series from the legacy dict-of-dicts stock data.
+
+        Args:
+            data (Dict[Any, Any]): Dictionary of dates and their stock data, optionally
+                containing a 'stock_symbol' entry. Missing price fields become NaN.
+
+        Returns:
+            PriceSeries: The equivalent columnar series.
+        """
+        symbol = data.get('stock_symbol')
+        keys = [key for key in data.keys() if key != 'stock_symbol']
+        dates = np.array([to_datetime64(key) for key in keys], dtype='datetime64[D]')
+        columns = {
+            column: np.array([data[key].get(column, np.nan) for key in keys], dtype=np.float64)
+            for column in PRICE_COLUMNS
+        }
+        return cls(dates, symbol=symbol, **columns)
+
+    @classmethod
+    def from_data(cls, data: Union["PriceSeries", Dict[Any, Any]]) -> "PriceSeries":
+        """Return data unchanged if it is already a series, otherwise convert it from the dict form."""
+        if isinstance(data, PriceSeries):
+            return data
+        return cls.from_dict(data)
+
+    def to_dict(self) -> Dict[Any, Any]:
+        """
+        Convert the series back to the legacy dict-of-dicts form.
+
+        Returns:
+            Dict[Any, Any]: Dictionary with a 'stock_symbol' entry and one entry per date.
+        """
+        stock_data: Dict[Any, Any] = {"stock_symbol": self.symbol}
+        for index, day in enumerate(self.date_list()):
+            stock_data[day] = self.row(index)
+        return stock_data
+
+    def to_frame(self, **extra_columns: np.ndarray) -> "pandas.DataFrame":
+        """
+        Convert the series to a pandas DataFrame indexed by date.
+
+        pandas is optional and only imported here; the report writers work from the columns directly.
+
+        Args:
+            **extra_columns (np.ndarray): Row-aligned columns to add after the prices, e.g. percent_change.
+
+        Returns:
+            pandas.DataFrame: One column per price column and extra column, one row per date.
+        """
+        import pandas as pd
+
+        columns = {column: getattr(self, column) for column in PRICE_COLUMNS}
+        columns.update(extra_columns)
+        return pd.DataFrame(columns, index=self.date_list())
+
+    def date_list(self) -> List[date]:
+        """Return the dates as a list of datetime.date objects."""
+        return self.dates.astype(object).tolist()
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the array for one of the OHLC columns."""
+        if name not in PRICE_COLUMNS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def row(self, index: int) -> Dict[str, float]:
+        """Return the OHLC values at a row position as a plain dict."""
+        return {column: float(getattr(self, column)[index]) for column in PRICE_COLUMNS}
+
+    def index_of(self, day: DateLike) -> int:
+        """
+        Find the row position of a date.
+
+        Raises:
+            KeyError: If the date is not in the series.
+        """
+        target = to_datetime64(day)
+        index = int(np.searchsorted(self.dates, target))
+        if index >= self.dates.size or self.dates[index] != target:
+            raise KeyError(day)
+        return index
+
+    def between(self, date_start: DateLike, date_end: DateLike) -> "PriceSeries":
+        """
+        Return the rows with date_start <= date <= date_end.
+
+        The returned series shares memory with this one.
+        """
+        lo = int(np.searchsorted(self.dates, to_datetime64(date_start), side='left'))
+        hi = int(np.searchsorted(self.dates, to_datetime64(date_end), side='right'))
+        return self[lo:hi]
+
+    def merged_with(self, newer: "PriceSeries") -> "PriceSeries":
+        """
+        Combine this series with a more recent one.
+
+        Rows from newer replace rows of this series from newer's first date onwards.
+
+        Args:
+            newer (PriceSeries): The more recent prices.
+
+        Returns:
+            PriceSeries: The combined series, keeping newer's symbol when it has one.
+        """
+        if len(newer) == 0:
+            return self
+        keep = int(np.searchsorted(self.dates, newer.dates[0], side='left'))
+        columns = {
+            column: np.concatenate((getattr(self, column)[:keep], getattr(newer, column)))
+            for column in PRICE_COLUMNS
+        }
+        return PriceSeries(np.concatenate((self.dates[:keep], newer.dates)),
+                           symbol=newer.symbol or self.symbol, **columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the date and price columns."""
+        return self.dates.nbytes + sum(getattr(self, column).nbytes for column in PRICE_COLUMNS)
+
+    def __len__(self) -> int:
+        return int(self.dates.size)
+
+    def __iter__(self) -> Iterator[date]:
+        return iter(self.date_list())
+
+    def __contains__(self, key: Any) -> bool:
+        if isinstance(key, str) and key == 'stock_symbol':
+            return True
+        try:
+            self.index_of(key)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return PriceSeries(self.dates[key], self.open[key], self.high[key],
+                               self.low[key], self.close[key], self.symbol)
+        if isinstance(key, str) and key == 'stock_symbol':
+            return self.symbol
+        return self.row(self.index_of(key))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def keys(self) -> List[date]:
+        return self.date_list()
+
+    def items(self) -> Iterator:
+        for index, day in enumerate(self.date_list()):
+            yield day, self.row(index)
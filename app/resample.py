@@ -0,0 +1,80 @@
+import re
+from typing import Union
+
+import numpy as np
+
+from app.instrumentation import span
+from app.price_series import PriceSeries
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+def parse_frequency(value: Union[str, int]) -> str:
+    """
+    Normalize a bar frequency: 'daily', 'weekly', 'monthly', or N trading days as 'Nd' (or just N).
+
+    Raises:
+        ValueError: If the frequency is not one of those.
+    """
+    text = str(value).strip().lower()
+    if text in FREQUENCIES:
+        return text
+    match = re.fullmatch(r'(\d+)d?', text)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(f"Unknown bar frequency '{value}': use daily, weekly, monthly or a number of days like 3d")
+    days = int(match.group(1))
+    return 'daily' if days == 1 else f"{days}d"
+
+def bar_starts(dates: np.ndarray, frequency: str) -> np.ndarray:
+    """
+    Index of the first row of every bar.
+
+    Weeks run Monday to Sunday and months are calendar months, so the dates only need comparing
+    with their neighbours. N-day bars group every N rows, i.e. N trading days, from the first row.
+    """
+    frequency = parse_frequency(frequency)
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if frequency == 'daily':
+        return np.arange(dates.size)
+    if frequency.endswith('d'):
+        return np.arange(0, dates.size, int(frequency[:-1]))
+    periods = period_numbers(dates, frequency)
+    return np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1]))) if dates.size else np.zeros(0, dtype=np.int64)
+
+def period_numbers(dates: np.ndarray, frequency: str) -> np.ndarray:
+    """Consecutive integers numbering the week or month of each date."""
+    if frequency == 'weekly':
+        # Day 0, 1970-01-01, was a Thursday; shifting by 3 puts week boundaries on Mondays
+        return (dates.astype(np.int64) + 3) // 7
+    return dates.astype('datetime64[M]').astype(np.int64)
+
+def resample(series: PriceSeries, frequency: str) -> PriceSeries:
+    """
+    Aggregate daily bars into weekly, monthly or N-day bars.
+
+    Each bar takes the first open, highest high, lowest low and last close of its days, using
+    segment reductions over the sorted columns. Weekly bars are dated by their Monday and monthly
+    bars by the first of the month, so bars of different symbols line up even when a symbol did not
+    trade on the first day; N-day bars are dated by their first day. The last bar may be partial.
+
+    Args:
+        series (PriceSeries): Daily prices.
+        frequency (str): 'daily', 'weekly', 'monthly', or 'Nd' for N trading days.
+
+    Returns:
+        PriceSeries: The coarser bars; the series itself for daily.
+    """
+    frequency = parse_frequency(frequency)
+    if frequency == 'daily' or len(series) == 0:
+        return series
+    with span('resample') as record:
+        record.add(rows=len(series))
+        starts = bar_starts(series.dates, frequency)
+        ends = np.append(starts[1:], len(series)) - 1
+        if frequency.endswith('d'):
+            dates = series.dates[starts]
+        elif frequency == 'weekly':
+            dates = (period_numbers(series.dates[starts], frequency) * 7 - 3).astype('datetime64[D]')
+        else:
+            dates = series.dates[starts].astype('datetime64[M]').astype('datetime64[D]')
+        return PriceSeries(dates, series.open[starts], np.maximum.reduceat(series.high, starts),
+                           np.minimum.reduceat(series.low, starts), series.close[ends], series.symbol)
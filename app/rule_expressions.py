@@ -0,0 +1,279 @@
+import abc
+import re
+from typing import Iterator, List, Tuple, Union
+
+import numpy as np
+
+from app.data_processor import DataProcessor
+from app.formatting import FormatStyle, FormattingRule, RuleContext
+
+DIRECTIONS = {'up': 'positive', 'positive': 'positive', 'down': 'negative', 'negative': 'negative'}
+
+class Condition(abc.ABC):
+    """
+    A boolean condition over a series' rows, combinable with &, | and ~.
+
+    Conditions are evaluated against a RuleContext. Every intermediate (streak lengths, window
+    scores, the mask of each sub-condition) is cached on the context under a structural key, so
+    conditions sharing parts, within one rule or across several, compute each part once.
+    """
+    @abc.abstractmethod
+    def key(self) -> Tuple:
+        """Identifies the condition by structure; equal keys give equal masks."""
+
+    @abc.abstractmethod
+    def compute(self, context: RuleContext) -> np.ndarray:
+        """Boolean mask of the rows where the condition holds, uncached."""
+
+    def evaluate(self, context: RuleContext) -> np.ndarray:
+        """Boolean mask of the rows where the condition holds, cached on the context."""
+        return context.derived(('condition',) + self.key(), lambda: self.compute(context))
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return And(self, other)
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return Or(self, other)
+
+    def __invert__(self) -> "Condition":
+        return Not(self)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Condition) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def __repr__(self) -> str:
+        return f"parse_condition({str(self)!r})"
+
+def direction_name(direction: str) -> str:
+    if direction not in DIRECTIONS:
+        raise ValueError("Direction must be one of 'up', 'down', 'positive' or 'negative'")
+    return DIRECTIONS[direction]
+
+class Streak(Condition):
+    """Rows in a run of at least num_days daily moves in one direction, as consecutive_change_rule."""
+    def __init__(self, num_days: int, direction: str):
+        self.num_days = int(num_days)
+        self.direction = direction_name(direction)
+
+    def key(self) -> Tuple:
+        return ('streak', self.num_days, self.direction)
+
+    def compute(self, context: RuleContext) -> np.ndarray:
+        if self.num_days < 1:
+            return np.zeros(len(context), dtype=bool)
+        return context.streak_lengths(self.direction) >= self.num_days
+
+    def __str__(self) -> str:
+        return f"streak({self.num_days}, {'up' if self.direction == 'positive' else 'down'})"
+
+class DailyChange(Condition):
+    """Rows whose daily change is at least percent in one direction, as threshold_change_rule."""
+    def __init__(self, percent: float, direction: str):
+        self.percent = float(percent)
+        self.direction = direction_name(direction)
+
+    def key(self) -> Tuple:
+        return ('daily', self.percent, self.direction)
+
+    def compute(self, context: RuleContext) -> np.ndarray:
+        return DataProcessor.threshold_change_mask(context.percent_changes, self.percent, self.direction)
+
+    def __str__(self) -> str:
+        return f"daily({self.percent:g}, {'up' if self.direction == 'positive' else 'down'})"
+
+class CumulativeChange(Condition):
+    """Rows inside a num_days window whose change reaches percent either way, as cumulative_change_rule."""
+    def __init__(self, num_days: int, percent: float):
+        self.num_days = int(num_days)
+        self.percent = abs(float(percent))
+
+    def key(self) -> Tuple:
+        return ('cumulative', self.num_days, self.percent)
+
+    def compute(self, context: RuleContext) -> np.ndarray:
+        return context.window_change_scores(self.num_days) >= self.percent
+
+    def __str__(self) -> str:
+        return f"cumulative({self.num_days}, {self.percent:g})"
+
+class Combination(Condition):
+    """And or Or over two or more conditions; nested combinations of the same kind are flattened."""
+    name = ''
+    reduce = None
+
+    def __init__(self, *conditions: Condition):
+        children = []
+        for condition in conditions:
+            children.extend(condition.children if type(condition) is type(self) else [condition])
+        if len(children) < 2:
+            raise ValueError(f"'{self.name}' needs at least two conditions")
+        self.children = children
+
+    def key(self) -> Tuple:
+        # Operand order does not change the mask
+        return (self.name,) + tuple(sorted((child.key() for child in self.children), key=repr))
+
+    def compute(self, context: RuleContext) -> np.ndarray:
+        return type(self).reduce([child.evaluate(context) for child in self.children])
+
+    def __str__(self) -> str:
+        return f" {self.name} ".join(operand_text(child, self) for child in self.children)
+
+class And(Combination):
+    name = 'and'
+    reduce = np.logical_and.reduce
+
+class Or(Combination):
+    name = 'or'
+    reduce = np.logical_or.reduce
+
+class Not(Condition):
+    def __init__(self, condition: Condition):
+        self.condition = condition
+
+    def key(self) -> Tuple:
+        return ('not', self.condition.key())
+
+    def compute(self, context: RuleContext) -> np.ndarray:
+        return ~self.condition.evaluate(context)
+
+    def __str__(self) -> str:
+        return f"not {operand_text(self.condition, self)}"
+
+def operand_text(condition: Condition, parent: Condition) -> str:
+    """The condition's text, parenthesized where the parent binds tighter."""
+    tighter = isinstance(condition, Combination) and (isinstance(parent, Not) or
+                                                      (isinstance(condition, Or) and isinstance(parent, And)))
+    return f"({condition})" if tighter else str(condition)
+
+TOKEN = re.compile(r"\s*(?:(?P<number>-?\d+(?:\.\d*)?|-?\.\d+)|(?P<word>[A-Za-z_]+)|(?P<symbol>[(),&|~]))")
+
+LEAVES = {
+    'streak': (Streak, (int, str)),
+    'daily': (DailyChange, (float, str)),
+    'cumulative': (CumulativeChange, (int, float)),
+}
+
+class ConditionParser:
+    """
+    Parses condition text such as "streak(3, up) and daily(2, up) or cumulative(10, 8)".
+
+    Leaves are streak(num_days, up|down), daily(percent, up|down) and cumulative(num_days, percent).
+    Operators are not (~), and (&) and or (|), binding in that order; parentheses group.
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = list(self.tokenize(text))
+        self.position = 0
+
+    def tokenize(self, text: str) -> Iterator[Tuple[str, str]]:
+        index = 0
+        text = text.rstrip()
+        while index < len(text):
+            match = TOKEN.match(text, index)
+            if match is None:
+                raise ValueError(f"Unexpected {text[index:].strip()[:1]!r} in condition {self.text!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'word':
+                value = value.lower()
+                symbol = {'and': '&', 'or': '|', 'not': '~'}.get(value)
+                if symbol is not None:
+                    kind, value = 'symbol', symbol
+            yield kind, value
+            index = match.end()
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ('end', '')
+
+    def take(self, expected: str = None) -> Tuple[str, str]:
+        token = self.peek()
+        if expected is not None and token[1] != expected:
+            found = token[1] or 'the end'
+            raise ValueError(f"Expected {expected!r} but found {found!r} in condition {self.text!r}")
+        self.position += 1
+        return token
+
+    def parse(self) -> Condition:
+        condition = self.either()
+        if self.peek()[0] != 'end':
+            raise ValueError(f"Unexpected {self.peek()[1]!r} in condition {self.text!r}")
+        return condition
+
+    def either(self) -> Condition:
+        conditions = [self.both()]
+        while self.peek() == ('symbol', '|'):
+            self.take()
+            conditions.append(self.both())
+        return conditions[0] if len(conditions) == 1 else Or(*conditions)
+
+    def both(self) -> Condition:
+        conditions = [self.negation()]
+        while self.peek() == ('symbol', '&'):
+            self.take()
+            conditions.append(self.negation())
+        return conditions[0] if len(conditions) == 1 else And(*conditions)
+
+    def negation(self) -> Condition:
+        if self.peek() == ('symbol', '~'):
+            self.take()
+            return Not(self.negation())
+        if self.peek() == ('symbol', '('):
+            self.take()
+            condition = self.either()
+            self.take(')')
+            return condition
+        return self.leaf()
+
+    def leaf(self) -> Condition:
+        kind, name = self.take()
+        if kind != 'word' or name not in LEAVES:
+            raise ValueError(f"Unknown condition {name or 'at the end'!r} in {self.text!r}; "
+                             f"expected one of {', '.join(LEAVES)}")
+        cls, types = LEAVES[name]
+        self.take('(')
+        args = []
+        for i, convert in enumerate(types):
+            if i:
+                self.take(',')
+            token_kind, value = self.take()
+            if (convert is str) != (token_kind == 'word'):
+                raise ValueError(f"Bad argument {value!r} to {name}() in condition {self.text!r}")
+            args.append(convert(value) if convert is str else convert(float(value)))
+        self.take(')')
+        return cls(*args)
+
+def parse_condition(text: str) -> Condition:
+    """
+    Parse condition text into a Condition.
+
+    Raises:
+        ValueError: If the text is not a valid condition.
+    """
+    return ConditionParser(text).parse()
+
+def expression_rule(condition: Union[str, Condition], columns: Union[str, List[str]],
+                    format_style: FormatStyle) -> FormattingRule:
+    """
+    Build a formatting rule that applies format_style to columns wherever condition holds.
+
+    Args:
+        condition (Union[str, Condition]): A Condition, or text for parse_condition.
+        columns (Union[str, List[str]]): Sheet columns to style.
+        format_style (FormatStyle): The style; its columns are replaced by columns.
+
+    Returns:
+        FormattingRule: A rule of kind 'expression' whose params hold the condition's text and its
+            structural key. The text rounds thresholds for display, so the key, which keeps them
+            exactly, is what tells two rules' cached masks apart.
+    """
+    if isinstance(condition, str):
+        condition = parse_condition(condition)
+    style_dict = format_style.__dict__.copy()
+    style_dict.pop('columns', None)
+    style = FormatStyle(columns=columns, **style_dict)
+    return FormattingRule(format_style=style, mask=condition.evaluate, kind='expression',
+                          params={'expression': str(condition), 'condition': condition.key()})
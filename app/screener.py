@@ -0,0 +1,205 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.instrumentation import span
+from app.price_series import PriceSeries
+
+# In the order of SpreadSheetManager.build_formatting_rules
+SIGNALS = ('cumulative', 'consecutive_up', 'consecutive_down', 'threshold_up', 'threshold_down')
+
+@dataclass
+class PriceMatrix:
+    """
+    Closing prices of many symbols aligned on one date axis.
+
+    closes has one row per date and one column per symbol; a symbol with no price on a date
+    (not yet listed, suspended, or missing from its download) has NaN there.
+    """
+    dates: np.ndarray
+    symbols: List[str]
+    closes: np.ndarray
+
+    @classmethod
+    def from_series(cls, series: Iterable[PriceSeries], lookback: Optional[int] = None,
+                    symbols: Optional[Sequence[str]] = None) -> "PriceMatrix":
+        """
+        Stack series on the union of their dates.
+
+        Args:
+            series (Iterable[PriceSeries]): One series per symbol.
+            lookback (Optional[int]): Keep only the last lookback dates.
+            symbols (Optional[Sequence[str]]): Column names; defaults to each series' symbol.
+
+        Returns:
+            PriceMatrix: The aligned closes.
+        """
+        series = list(series)
+        dates = np.unique(np.concatenate([s.dates for s in series])) if series else np.zeros(0, 'datetime64[D]')
+        if lookback is not None:
+            dates = dates[-lookback:]
+        closes = np.full((dates.size, len(series)), np.nan)
+        for column, s in enumerate(series):
+            s = s.between(dates[0], dates[-1]) if dates.size else s
+            closes[np.searchsorted(dates, s.dates), column] = s.close
+        if symbols is None:
+            symbols = [s.symbol or str(i) for i, s in enumerate(series)]
+        return cls(dates, list(symbols), closes)
+
+@dataclass
+class ScreenResult:
+    """
+    Signal values for every symbol as of the matrix's last date, with the matches ranked.
+
+    Arrays are aligned with symbols. streak is signed: +3 means three up days in a row ending
+    on the last date, -2 two down days; it counts only the days in the matrix, so a screen over
+    a trailing window caps it at that window. matches has one boolean column per entry of SIGNALS.
+    """
+    as_of: date
+    symbols: List[str]
+    close: np.ndarray
+    percent_change: np.ndarray
+    streak: np.ndarray
+    cumulative_change: np.ndarray
+    matches: np.ndarray
+    ranking: np.ndarray
+
+    def table(self) -> List[Dict[str, Any]]:
+        """The matching symbols, best first, as rows of plain values."""
+        rows = []
+        for i in self.ranking.tolist():
+            rows.append({
+                'symbol': self.symbols[i],
+                'close': float(self.close[i]),
+                'percent_change': float(self.percent_change[i]),
+                'streak': int(self.streak[i]),
+                'cumulative_change': float(self.cumulative_change[i]),
+                'signals': [signal for signal, hit in zip(SIGNALS, self.matches[i].tolist()) if hit],
+            })
+        return rows
+
+def last_valid_before(valid: np.ndarray) -> np.ndarray:
+    """For each cell, the row of the previous valid cell in its column, or -1."""
+    previous = np.full(valid.shape, -1, dtype=np.int64)
+    np.copyto(previous[1:], np.arange(valid.shape[0] - 1)[:, None], where=valid[:-1])
+    return np.maximum.accumulate(previous, axis=0, out=previous)
+
+def screen_lookback(user_input: Dict[str, Any]) -> int:
+    """
+    Trading days of history each symbol needs for screen to judge its last date.
+
+    The period change needs period_change days of closes and a streak of consecutive_change days
+    needs one more close before it, so a row beyond the longer of the two is enough.
+    """
+    return max(user_input["period_change"]["days"], user_input["consecutive_change"]["days"]) + 1
+
+def screen(matrix: PriceMatrix, user_input: Dict[str, Any]) -> ScreenResult:
+    """
+    Evaluate the report's three signal types for every symbol at once, as of the last date.
+
+    A symbol matches a signal when the report's rule would highlight its last row: the last day
+    ends a streak of at least consecutive_change days, its daily change passes daily_threshold, or
+    the change over its last period_change days reaches the period threshold. Each symbol is
+    judged on its own trading days, so a missing day neither breaks a streak nor counts toward
+    one. Symbols without a close on the last date do not match. Only each symbol's last
+    screen_lookback(user_input) trading days decide its matches, so the matrix may hold just those.
+
+    Args:
+        matrix (PriceMatrix): The aligned closes.
+        user_input (Dict[str, Any]): consecutive_change, daily_threshold and period_change settings, as for a report.
+
+    Returns:
+        ScreenResult: Every symbol's signal values and the ranked matches.
+    """
+    with span('screen') as record:
+        closes = matrix.closes
+        rows, columns = closes.shape
+        record.add(rows=closes.size)
+        valid = ~np.isnan(closes)
+        last = rows - 1
+
+        # Percent change against each symbol's previous trading day, computed in place
+        previous_row = last_valid_before(valid)
+        previous = np.take_along_axis(closes, np.maximum(previous_row, 0), axis=0)
+        previous[previous_row < 0] = np.nan
+        del previous_row
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_changes = np.subtract(closes, previous)
+            percent_changes /= previous
+            percent_changes *= 100
+        percent_changes[previous == 0] = 0.0
+        del previous
+        percent_changes[~valid] = np.nan
+
+        # Trailing streaks, counted over each symbol's valid rows only
+        valid_count = np.cumsum(valid, axis=0, dtype=np.int32)
+        streak = np.zeros(columns, dtype=np.int64)
+        if rows:
+            for sign, compare in ((1, np.greater), (-1, np.less)):
+                breaks = compare(percent_changes, 0)
+                np.logical_not(breaks, out=breaks)
+                breaks &= valid
+                # argmax over the reversed rows finds each column's last break without a row-index matrix
+                last_break = np.where(breaks.any(axis=0), last - np.argmax(breaks[::-1], axis=0), -1)
+                del breaks
+                counted_before = np.where(last_break >= 0,
+                                          valid_count[np.maximum(last_break, 0), np.arange(columns)], 0)
+                length = valid_count[last] - counted_before
+                streak = np.where(length > 0, sign * length, streak)
+
+        # Change over the last period_change days: the last close against the one num_days - 1 trading days back
+        num_days = user_input["period_change"]["days"]
+        cumulative = np.full(columns, np.nan)
+        if rows and num_days >= 1:
+            target = valid_count[last] - (num_days - 1)
+            window_start = valid_count == target
+            window_start &= valid
+            start_rows = np.argmax(window_start, axis=0)
+            del window_start
+            has_window = target >= 1
+            start = closes[start_rows, np.arange(columns)]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change = np.where(start == 0, 0.0, ((closes[last] - start) / start) * 100)
+            cumulative = np.where(has_window, change, np.nan)
+        del valid_count
+
+        today = closes[last] if rows else np.zeros(columns)
+        last_change = percent_changes[last] if rows else np.full(columns, np.nan)
+        traded = ~np.isnan(today)
+        consecutive_days = user_input["consecutive_change"]["days"]
+        daily_threshold = user_input["daily_threshold"]["percent"]
+        with np.errstate(invalid='ignore'):
+            matches = np.column_stack([
+                traded & (np.abs(cumulative) >= abs(user_input["period_change"]["percent"])),
+                traded & (consecutive_days >= 1) & (streak >= consecutive_days),
+                traded & (consecutive_days >= 1) & (-streak >= consecutive_days),
+                traded & (last_change >= daily_threshold),
+                traded & (last_change <= -daily_threshold),
+            ])
+
+        # Most signals first, then the largest moves
+        hits = matches.sum(axis=1)
+        order = np.lexsort((-np.nan_to_num(np.abs(last_change)), -np.nan_to_num(np.abs(cumulative)), -hits))
+        ranking = order[hits[order] > 0]
+
+    as_of = matrix.dates[last].astype(object) if rows else None
+    return ScreenResult(as_of, matrix.symbols, today, last_change, streak, cumulative, matches, ranking)
+
+def write_screen_workbook(file_name: str, result: ScreenResult, title: str = 'Screen') -> str:
+    """Write the ranked matches as a sheet, one symbol per row."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title)
+    for column, width in zip('ABCDEF', (10, 12, 16, 8, 20, 48)):
+        worksheet.column_dimensions[column].width = width
+    worksheet.append([f"Signals as of {result.as_of}"])
+    worksheet.append(['symbol', 'close', 'percent_change', 'streak', 'cumulative_change', 'signals'])
+    for row in result.table():
+        values = [row['symbol'], row['close'], row['percent_change'], row['streak'],
+                  row['cumulative_change'], ', '.join(row['signals'])]
+        worksheet.append([None if isinstance(value, float) and np.isnan(value) else value for value in values])
+    workbook.save(file_name)
+    return file_name
@@ -1,56 +1,77 @@
-import pandas as pd
-import openpyxl
-from openpyxl.styles import PatternFill, Font
-from openpyxl.utils import get_column_letter
+import numpy as np
+import re
 import subprocess
 import os
-from typing import Dict, Any
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Sequence
 from datetime import datetime
 
+from app.batch_fetcher import BatchFetcher, RateLimiter
 from app.data_processor import DataProcessor
-from app.formatting import FormattingRuleFactory, FormatStyle
+from app.formatting import FormattingRule, FormattingRuleFactory, FormatStyle, RuleContext
+from app.instrumentation import profiling_from_env, span
+from app.memo import MemoCache
+from app.price_series import PriceSeries
+from app.price_cache import CACHE_FORMATS, DEFAULT_CACHE_DIR
+from app.resample import parse_frequency, resample
+from app.rule_expressions import expression_rule
 from app.stock_data_fetcher import StockDataFetcher
+from app.task_runner import ProgressCallback
 
-color_map = {
-    "red": "FFFF0000",
-    "green": "FF00FF00",
-    "orange": "FFFFA500",
-    "black": "FF000000",
-    "lightblue": "FFADD8E6",
-    "yellow": "FFFFFF00"
-}
+# openpyxl and pandas are slow to import, so the writers are imported when a workbook is written
+if TYPE_CHECKING:
+    from app.excel_writer import RenderedSheet
+    from app.incremental import WorkbookUpdate
 
-class SpreadSheetManager:
-    def __init__(self, api_key: str):
-        self.data_processor = DataProcessor()
-        self.stock_data_fetcher = StockDataFetcher(api_key)
+RULE_PARAMETERS = ("consecutive_change", "daily_threshold", "period_change", "custom_rules")
 
-    def create_excel_file(self, user_input: Dict[str, Any]) -> str:
-        # Fetch stock data
-        stock_data = self.stock_data_fetcher.fetch_daily_stock_data(
-            user_input["symbol"],
-            user_input["start_date"],
-            user_input["end_date"]
-        )
-        
-        if stock_data is None:
-            raise ValueError("Failed to fetch stock data")
+def sheet_title(symbol: str) -> str:
+    """Make a symbol safe to use as an Excel sheet title."""
+    return re.sub(r'[\[\]:*?/\\]', '_', symbol)[:31]
 
-        # Process data
-        percent_changes = self.data_processor.calculate_daily_percent_changes(stock_data)
-        
-        # Add percent changes to stock data
-        for date, change in percent_changes.items():
-            stock_data[date]['percent_change'] = change
+def render_symbol_sheet(series: PriceSeries, rule_parameters: Dict[str, Any]) -> "RenderedSheet":
+    """
+    Evaluate the report rules for one symbol and lay out its sheet.
 
-        # Remove 'stock_symbol' key from stock_data
-        stock_data_filtered = {k: v for k, v in stock_data.items() if k != 'stock_symbol'}
+    Runs in a worker process, so it takes plain parameters and builds the rules itself.
+    """
+    from app.excel_writer import render_sheet
 
-        # Create DataFrame
-        df = pd.DataFrame.from_dict(stock_data_filtered, orient='index')
-        df = df.sort_index()
+    rules = SpreadSheetManager.build_formatting_rules(rule_parameters)
+    return render_sheet(series, rules, title=sheet_title(series.symbol or 'Stock Data'))
 
-        # Apply formatting rules
+@dataclass
+class BatchReport:
+    files: List[str] = field(default_factory=list)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+class SpreadSheetManager:
+    def __init__(self, api_key: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, cache_format: str = 'npz',
+                 memo: Optional[MemoCache] = None):
+        self.data_processor = DataProcessor()
+        # Loaded prices, percent changes, streaks, window scores and rule masks, kept between reports
+        # so rerunning with one parameter changed recomputes only what that parameter affects
+        self.memo = memo if memo is not None else MemoCache()
+        # 'memmap' maps long histories from disk instead of reading them into memory
+        cache = CACHE_FORMATS[cache_format](cache_dir) if cache_dir else None
+        self.stock_data_fetcher = StockDataFetcher(api_key, cache, memo=self.memo)
+
+    @staticmethod
+    def build_formatting_rules(user_input: Dict[str, Any]) -> List[FormattingRule]:
+        """
+        Build the report's formatting rules from the user's parameters.
+
+        Args:
+            user_input (Dict[str, Any]): The GUI input with consecutive_change, daily_threshold and period_change settings,
+                and optionally custom_rules: dicts with an expression (see app.rule_expressions), columns,
+                background_color, and optional font_color and bold.
+
+        Returns:
+            List[FormattingRule]: The rules in the order they are applied; later rules take precedence.
+                Custom rules come last, in the order given.
+        """
         consecutive_rule_positive = FormattingRuleFactory().consecutive_change_rule(
             user_input["consecutive_change"]["days"],
             "positive",
@@ -87,40 +108,300 @@ class SpreadSheetManager:
             FormatStyle(["open", "high", "low"], "yellow", bold=True)
         )
 
-        # Create Excel file
+        custom_rules = [
+            expression_rule(spec["expression"], spec["columns"],
+                            FormatStyle(spec["columns"], spec["background_color"], spec.get("font_color", "black"),
+                                        spec.get("bold", True)))
+            for spec in user_input.get("custom_rules", ())
+        ]
+
+        return [cumulative_rule, consecutive_rule_positive, consecutive_rule_negative, threshold_rule_positive, threshold_rule_negative] + custom_rules
+
+    def create_excel_file(self, user_input: Dict[str, Any], progress: Optional[ProgressCallback] = None) -> str:
+        """
+        Fetch a symbol's prices and write the highlighted workbook.
+
+        Args:
+            user_input (Dict[str, Any]): The symbol, dates, rule parameters, file_path, and optional writer mode
+                and bar frequency ('daily', 'weekly', 'monthly' or 'Nd', see app.resample). Rules count bars,
+                so with weekly bars a 3-day streak is three weeks.
+            progress (Optional[ProgressCallback]): Receives (stage, fraction) for the fetch, process and write
+                stages. It may raise ReportCancelled to stop the run before the workbook is saved.
+
+        Returns:
+            str: The file name.
+        """
+        # Set HANSEN_STOCK_PROFILE or HANSEN_STOCK_CPROFILE to time each stage; see app.instrumentation
+        with profiling_from_env(), span('report'):
+            return self._create_excel_file(user_input, progress)
+
+    def _create_excel_file(self, user_input: Dict[str, Any], progress: Optional[ProgressCallback]) -> str:
+        report = progress if progress is not None else (lambda stage, fraction: None)
+
+        # Fetch stock data
+        report("fetch", 0.0)
+        with span('fetch') as record:
+            stock_data = self.stock_data_fetcher.fetch_daily_price_series(
+                user_input["symbol"],
+                user_input["start_date"],
+                user_input["end_date"]
+            )
+            record.add(rows=len(stock_data) if stock_data is not None else 0)
+        
+        if stock_data is None:
+            raise ValueError("Failed to fetch stock data")
+        stock_data = resample(stock_data, user_input.get("frequency", "daily"))
+
+        # Process data once; every formatting rule shares these derived values
+        report("process", 0.3)
+        context = RuleContext(stock_data, memo=self.memo)
+        rules = self.build_formatting_rules(user_input)
         file_name = user_input["file_path"]
-        with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Stock Data')
-            workbook = writer.book
+
+        writer = user_input.get("writer", "streaming")
+        if writer == "pandas":
+            report("write", 0.5)
+            file_name = self.write_with_pandas(file_name, stock_data, context, rules)
+        elif writer == "conditional":
+            from app.conditional_formatting import write_conditional_workbook
+
+            report("write", 0.5)
+            file_name = write_conditional_workbook(file_name, stock_data, rules)
+        else:
+            from app.excel_writer import render_sheet, write_workbook
+
+            sheet = render_sheet(stock_data, rules, context=context)
+            report("write", 0.5)
+            file_name = write_workbook(file_name, [sheet], progress=lambda fraction: report("write", 0.5 + 0.5 * fraction))
+        report("done", 1.0)
+        return file_name
+
+    def update_excel_file(self, user_input: Dict[str, Any]) -> "WorkbookUpdate":
+        """
+        Bring an existing report up to date by appending the days since its last row.
+
+        Only the new days are evaluated and written; the rest of the workbook is left as it is.
+        The fetch goes through the price cache, so a nightly update downloads the compact series.
+
+        Reports with custom_rules cannot be updated: expressions have no incremental form, so
+        they are regenerated instead.
+
+        Args:
+            user_input (Dict[str, Any]): The same input the report was created with; file_path is the report.
+
+        Returns:
+            WorkbookUpdate: The rows appended and the dates newly highlighted.
+
+        Raises:
+            ValueError: If the report is not daily or has custom rules, or the prices cannot be fetched.
+        """
+        from app.incremental import update_workbook
+
+        if parse_frequency(user_input.get("frequency", "daily")) != "daily":
+            raise ValueError("Only daily reports can be updated; the last weekly or monthly bar changes until it closes")
+        if user_input.get("custom_rules"):
+            raise ValueError("Reports with custom rules cannot be updated in place; regenerate them instead")
+        with profiling_from_env(), span('report'):
+            stock_data = self.stock_data_fetcher.fetch_daily_price_series(
+                user_input["symbol"],
+                user_input["start_date"],
+                user_input["end_date"]
+            )
+            if stock_data is None:
+                raise ValueError("Failed to fetch stock data")
+            return update_workbook(user_input["file_path"], stock_data, self.build_formatting_rules(user_input))
+
+    def create_sweep_file(self, user_input: Dict[str, Any]) -> str:
+        """
+        Fetch a symbol's prices once and write hit counts for grids of rule parameters.
+
+        Args:
+            user_input (Dict[str, Any]): The symbol, dates and file_path, plus a "sweep" entry with
+                num_days, thresholds and optionally period_thresholds lists.
+
+        Returns:
+            str: The file name.
+        """
+        from app.sweep import sweep_report, write_sweep_workbook
+
+        with profiling_from_env(), span('report'):
+            stock_data = self.stock_data_fetcher.fetch_daily_price_series(
+                user_input["symbol"],
+                user_input["start_date"],
+                user_input["end_date"]
+            )
+            if stock_data is None:
+                raise ValueError("Failed to fetch stock data")
+            stock_data = resample(stock_data, user_input.get("frequency", "daily"))
+            grid = user_input["sweep"]
+            results = sweep_report(RuleContext(stock_data, memo=self.memo), grid["num_days"], grid["thresholds"], grid.get("period_thresholds"))
+            return write_sweep_workbook(user_input["file_path"], results)
+
+    def write_with_pandas(self, file_name: str, stock_data: PriceSeries, context: RuleContext, rules: List[FormattingRule]) -> str:
+        """
+        Write the report through a pandas DataFrame and ExcelWriter.
+
+        pandas is an optional dependency used only by this writer; the streaming writer produces
+        the same sheet from the columns directly with less time and memory per row.
+
+        Raises:
+            ValueError: If pandas is not installed.
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ValueError("The pandas writer needs pandas installed; use the streaming writer instead") from None
+        from openpyxl.styles import PatternFill, Font
+        from openpyxl.utils import get_column_letter
+        from app.excel_writer import SHEET_COLUMNS, color_map
+
+        # Create DataFrame straight from the sorted price columns
+        with span('write.dataframe') as record:
+            df = stock_data.to_frame(percent_change=context.percent_changes)
+            record.add(rows=len(df))
+
+        # Create Excel file
+        writer = pd.ExcelWriter(file_name, engine='openpyxl')
+        try:
+            with span('write.rows') as record:
+                df.to_excel(writer, sheet_name='Stock Data')
+                record.add(rows=len(df))
             worksheet = writer.sheets['Stock Data']
 
-            # Apply formatting
-            for rule in [cumulative_rule, consecutive_rule_positive, consecutive_rule_negative, threshold_rule_positive, threshold_rule_negative]:
-                formatting = rule.apply(stock_data_filtered)
-                for date, style in formatting.items():
-                    if style:
-                        row = df.index.get_loc(date) + 2  # +2 because Excel is 1-indexed and we have a header row
-                        cols = [df.columns.get_loc(col) + 2 for col in style.columns] if isinstance(style.columns, list) else [df.columns.get_loc(style.columns) + 2]
+            # Apply formatting; masks are aligned with the sheet's rows, which follow the header
+            with span('write.styling') as record:
+                for rule in rules:
+                    style = rule.format_style
+                    columns = style.columns if isinstance(style.columns, list) else [style.columns]
+                    cols = [SHEET_COLUMNS.index(col) + 2 for col in columns]
+                    fill = PatternFill(start_color=color_map[style.background_color], end_color=color_map[style.background_color], fill_type="solid")
+                    font = Font(color=color_map[style.font_color], bold=style.bold)
+                    for index in np.flatnonzero(rule.evaluate(context)).tolist():
+                        row = index + 2  # +2 because Excel is 1-indexed and we have a header row
                         for col in cols:
                             cell = worksheet.cell(row=row, column=col)
-                            cell.fill = PatternFill(start_color=color_map[style.background_color], end_color=color_map[style.background_color], fill_type="solid")
-                            cell.font = Font(color=color_map[style.font_color], bold=style.bold)
-
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = max(max_length + 2, 12)  # Ensure minimum width of 12
-                worksheet.column_dimensions[get_column_letter(column[0].column)].width = adjusted_width
+                            cell.fill = fill
+                            cell.font = font
+                        record.add(rows=1)
+
+            # Size columns to their headers, at least 12 wide; dates and numbers fit in that
+            with span('write.autosize'):
+                for column, name in enumerate([None] + SHEET_COLUMNS, start=1):
+                    width = max(len(name) + 2 if name else 0, 12)
+                    worksheet.column_dimensions[get_column_letter(column)].width = width
+        finally:
+            with span('write.save'):
+                writer.close()
 
         return file_name
 
+    def create_batch_report(self, symbols: Sequence[str], user_input: Dict[str, Any],
+                            one_workbook_per_symbol: bool = False, max_workers: Optional[int] = None,
+                            batch_fetcher: Optional[BatchFetcher] = None,
+                            rate_limiter: Optional[RateLimiter] = None) -> BatchReport:
+        """
+        Build reports for many symbols, rendering sheets on a process pool.
+
+        Symbols are fetched concurrently and each one is handed to a worker process as soon as it
+        arrives. Rule evaluation and sheet layout run in the workers; the workbook writes happen
+        one at a time in this process.
+
+        Args:
+            symbols (Sequence[str]): The ticker symbols to report on.
+            user_input (Dict[str, Any]): Dates and rule parameters as for create_excel_file. file_path is the
+                workbook to create, or the directory to write into when one_workbook_per_symbol is set.
+            one_workbook_per_symbol (bool): Write <symbol>.xlsx files instead of one sheet per symbol.
+            max_workers (Optional[int]): Number of worker processes; defaults to the number of cores.
+            batch_fetcher (Optional[BatchFetcher]): Fetcher to use instead of one wrapping this manager's fetcher.
+            rate_limiter (Optional[RateLimiter]): Quotas for that wrapping fetcher; defaults to the free tier's.
+
+        Returns:
+            BatchReport: The files written and the symbols that failed.
+        """
+        from app.excel_writer import write_workbook
+
+        symbols = list(dict.fromkeys(symbols))
+        rule_parameters = {key: user_input[key] for key in RULE_PARAMETERS if key in user_input}
+        frequency = user_input.get("frequency", "daily")
+        batch_fetcher = batch_fetcher if batch_fetcher is not None else BatchFetcher(self.stock_data_fetcher, rate_limiter)
+        output = user_input["file_path"]
+        report = BatchReport()
+        sheets: Dict[str, "RenderedSheet"] = {}
+
+        def collect(future: Future, symbol: str):
+            try:
+                sheet = future.result()
+            except Exception as e:
+                report.errors[symbol] = e
+                return
+            if one_workbook_per_symbol:
+                try:
+                    report.files.append(write_workbook(os.path.join(output, f"{sheet.title}.xlsx"), [sheet]))
+                except Exception as e:
+                    report.errors[symbol] = e
+            else:
+                sheets[symbol] = sheet
+
+        if one_workbook_per_symbol:
+            os.makedirs(output, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending: Dict[Future, str] = {}
+            for result in batch_fetcher.fetch_many(symbols, user_input["start_date"], user_input["end_date"]):
+                if not result.ok:
+                    report.errors[result.symbol] = result.error
+                    continue
+                series = resample(result.series, frequency)
+                pending[executor.submit(render_symbol_sheet, series, rule_parameters)] = result.symbol
+                for future in [future for future in pending if future.done()]:
+                    collect(future, pending.pop(future))
+            for future in as_completed(pending):
+                collect(future, pending[future])
+
+        if sheets:
+            report.files.append(write_workbook(output, [sheets[symbol] for symbol in symbols if symbol in sheets]))
+        return report
+
+    def create_screen_file(self, symbols: Sequence[str], user_input: Dict[str, Any],
+                           batch_fetcher: Optional[BatchFetcher] = None,
+                           rate_limiter: Optional[RateLimiter] = None) -> BatchReport:
+        """
+        Screen a universe of symbols for the report's signals on the last date and write the ranked matches.
+
+        Every symbol is fetched once, the closes are stacked into one matrix and all signals are
+        evaluated together, instead of writing a report per symbol. Only the trailing days the
+        signals need are stacked, so the matrix does not grow with the fetched history.
+
+        Args:
+            symbols (Sequence[str]): The ticker symbols to screen.
+            user_input (Dict[str, Any]): Dates, rule parameters and file_path as for create_excel_file.
+            batch_fetcher (Optional[BatchFetcher]): Fetcher to use instead of one wrapping this manager's fetcher.
+            rate_limiter (Optional[RateLimiter]): Quotas for that wrapping fetcher; defaults to the free tier's.
+
+        Returns:
+            BatchReport: The screen workbook and the symbols that failed.
+        """
+        from app.screener import PriceMatrix, screen, screen_lookback, write_screen_workbook
+
+        symbols = list(dict.fromkeys(symbols))
+        batch_fetcher = batch_fetcher if batch_fetcher is not None else BatchFetcher(self.stock_data_fetcher, rate_limiter)
+        report = BatchReport()
+        fetched: Dict[str, PriceSeries] = {}
+        with profiling_from_env(), span('report'):
+            for result in batch_fetcher.fetch_many(symbols, user_input["start_date"], user_input["end_date"]):
+                if result.ok:
+                    fetched[result.symbol] = resample(result.series, user_input.get("frequency", "daily"))
+                else:
+                    report.errors[result.symbol] = result.error
+            if fetched:
+                names = [symbol for symbol in symbols if symbol in fetched]
+                # Trimmed per symbol rather than on the shared date axis, so days missing from one
+                # symbol do not cut into its window
+                lookback = screen_lookback(user_input)
+                matrix = PriceMatrix.from_series([fetched[symbol][-lookback:] for symbol in names], symbols=names)
+                result = screen(matrix, user_input)
+                report.files.append(write_screen_workbook(user_input["file_path"], result))
+        return report
+
     def open_excel_file(self, file_name: str):
         if os.name == 'nt':  # For Windows
             os.startfile(file_name)
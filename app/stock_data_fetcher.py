@@ -1,34 +1,252 @@
-from datetime import datetime
-import requests
+import copy
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+
+from app.config import BASE_URL_ENV
+from app.instrumentation import span
+from app.memo import MemoCache
+from app.price_cache import PriceCache
+from app.price_series import PriceSeries, PRICE_COLUMNS
+
+ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query'
+
+class ThrottledError(Exception):
+    """Raised when Alpha Vantage answers with a rate-limit notice instead of data."""
+
+JSON_PRICE_FIELDS = ('1. open', '2. high', '3. low', '4. close')
+
+def build_price_series(days: List[str], values: List[str], symbol: Optional[str]) -> PriceSeries:
+    """
+    Convert ISO date strings and a flat open/high/low/close list of number strings into a series.
+
+    Both conversions run as single NumPy casts instead of one parse per value.
+    """
+    prices = np.array(values, dtype=np.float64).reshape(-1, len(PRICE_COLUMNS))
+    return PriceSeries(
+        np.array(days, dtype='datetime64[D]'),
+        symbol=symbol,
+        **{column: prices[:, i] for i, column in enumerate(PRICE_COLUMNS)}
+    )
 
 class StockDataFetcher:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[PriceCache] = None, base_url: Optional[str] = None,
+                 datatype: str = 'json', pool_size: int = 10, memo: Optional[MemoCache] = None):
         self.api_key = api_key
+        self.cache = cache
+        # Keeps loaded cache entries in memory, so a repeat request skips reading the file
+        self.memo = memo
+        self.base_url = base_url or os.environ.get(BASE_URL_ENV) or ALPHA_VANTAGE_URL
+        self.datatype = datatype
+        self.rate_limiter = None
+        self.pool_size = pool_size
+        self._session = None
 
-    def fetch_daily_stock_data(self, stock_symbol: str, date_start: datetime, date_end: datetime):
-        function = 'TIME_SERIES_DAILY'
-        url = f'https://www.alphavantage.co/query?function={function}&symbol={stock_symbol}&outputsize=full&apikey={self.api_key}'
-        # url = f'https://www.alphavantage.co/query?function={function}&symbol={stock_symbol}&apikey=demo'
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if 'Time Series (Daily)' in data:
-                time_series = data['Time Series (Daily)']
-                stock_data = {
-                    "stock_symbol": data['Meta Data']['2. Symbol']
-                }
-                for date, values in time_series.items():
-                    date = datetime.strptime(date, '%Y-%m-%d')
-                    date = datetime.date(date)
-                    if date_start <= date <= date_end:
-                        stock_data[date] = {
-                            "open": float(values['1. open']),
-                            "high": float(values['2. high']),
-                            "low": float(values['3. low']),
-                            "close": float(values['4. close']),
-                        }
-                return stock_data
-            else:
+    @property
+    def session(self):
+        """The pooled HTTP session, created on first use so requests is only imported when fetching."""
+        if self._session is None:
+            import requests
+            import requests.adapters
+
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+    @staticmethod
+    def parse_json_time_series(data: Dict[str, Any], date_start: Optional[datetime] = None) -> PriceSeries:
+        """
+        Parse a TIME_SERIES_DAILY JSON payload.
+
+        Args:
+            data (Dict[str, Any]): The decoded response.
+            date_start (Optional[datetime]): If given, stop at the first date before it. Alpha Vantage
+                lists dates newest first, so every later entry is older as well.
+
+        Returns:
+            PriceSeries: The parsed rows.
+        """
+        start = date_start.isoformat()[:10] if date_start is not None else ''
+        days = []
+        values = []
+        for day, fields in data['Time Series (Daily)'].items():
+            if day < start:
+                break
+            days.append(day)
+            values.extend(fields[field] for field in JSON_PRICE_FIELDS)
+        return build_price_series(days, values, data['Meta Data']['2. Symbol'])
+
+    @staticmethod
+    def parse_csv_time_series(lines: Iterable[str], symbol: str, date_start: Optional[datetime] = None) -> PriceSeries:
+        """
+        Parse a TIME_SERIES_DAILY CSV payload (timestamp,open,high,low,close,volume), newest first.
+
+        Args:
+            lines (Iterable[str]): The data lines, without the header.
+            symbol (str): The requested symbol; the CSV form does not repeat it.
+            date_start (Optional[datetime]): If given, stop reading at the first date before it.
+
+        Returns:
+            PriceSeries: The parsed rows.
+        """
+        start = date_start.isoformat()[:10] if date_start is not None else ''
+        days = []
+        values = []
+        for line in lines:
+            if not line:
+                continue
+            fields = line.split(',')
+            if fields[0] < start:
+                break
+            days.append(fields[0])
+            values.extend(fields[1:5])
+        return build_price_series(days, values, symbol)
+
+    def request_time_series(self, stock_symbol: str, outputsize: str = 'full',
+                            date_start: Optional[datetime] = None) -> Optional[PriceSeries]:
+        """
+        Download a symbol's daily prices from Alpha Vantage.
+
+        Args:
+            stock_symbol (str): The ticker symbol to fetch.
+            outputsize (str): 'full' for the whole history or 'compact' for the latest 100 trading days.
+            date_start (Optional[datetime]): If given, rows before this date are not parsed.
+
+        Returns:
+            Optional[PriceSeries]: The rows in the response, or None if the request failed.
+
+        Raises:
+            ThrottledError: If the API rejected the call because of its rate limit.
+        """
+        params = {
+            'function': 'TIME_SERIES_DAILY',
+            'symbol': stock_symbol,
+            'outputsize': outputsize,
+            'apikey': self.api_key,
+        }
+        if self.datatype == 'csv':
+            params['datatype'] = 'csv'
+        if self.rate_limiter is not None:
+            with span('fetch.rate_limit'):
+                self.rate_limiter.acquire()
+        # A CSV body is streamed, so its download is timed together with parsing
+        with span('fetch.download') as download:
+            response = self.session.get(self.base_url, params=params, stream=self.datatype == 'csv')
+        with response:
+            if response.status_code == 429:
+                raise ThrottledError(f"Rate limited while fetching {stock_symbol}")
+            if response.status_code != 200:
                 return None
+            if self.datatype == 'csv':
+                # Alpha Vantage sends CSV without a charset, and requests then yields bytes lines
+                response.encoding = response.encoding or 'utf-8'
+                with span('fetch.parse') as record:
+                    lines = self.counted_lines(response.iter_lines(decode_unicode=True), record)
+                    header = next(lines, '')
+                    if header.startswith('timestamp'):
+                        series = self.parse_csv_time_series(lines, stock_symbol, date_start)
+                        record.add(rows=len(series))
+                        return series
+                    # Errors and throttling notices come back as JSON even when CSV was requested
+                    data = json.loads(header + ''.join(lines))
+            else:
+                body = response.content
+                download.add(bytes=len(body))
+                with span('fetch.decode'):
+                    data = json.loads(body)
+
+        notice = data.get('Note') or data.get('Information')
+        if notice and 'Time Series (Daily)' not in data:
+            raise ThrottledError(notice)
+        if 'Time Series (Daily)' in data:
+            with span('fetch.parse') as record:
+                series = self.parse_json_time_series(data, date_start)
+                record.add(rows=len(series))
+            return series
         else:
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def counted_lines(lines: Iterable[str], record) -> Iterable[str]:
+        """Pass lines through, adding their size (plus the newline) to a span's byte count."""
+        for line in lines:
+            record.add(bytes=len(line) + 1)
+            yield line
+
+    def fetch_daily_price_series(self, stock_symbol: str, date_start: datetime, date_end: datetime) -> Optional[PriceSeries]:
+        """
+        Fetch daily prices for a symbol between two dates as a columnar series.
+
+        With a cache, a repeat request is answered from disk and a stale entry is
+        topped up with only the missing recent days. If that refresh fails, is throttled or
+        cannot connect, the cached prices are returned as they are. With a memo as well,
+        entries already loaded by this process are answered from memory.
+
+        Args:
+            stock_symbol (str): The ticker symbol to fetch.
+            date_start (datetime): First date to include.
+            date_end (datetime): Last date to include.
+
+        Returns:
+            Optional[PriceSeries]: The prices, or None if the request failed.
+        """
+        if self.cache is None:
+            series = self.request_time_series(stock_symbol, 'full', date_start)
+            return series.between(date_start, date_end) if series is not None else None
+
+        today = date.today()
+        memo_key = ('price_entry', type(self.cache).__name__, self.cache.cache_dir, stock_symbol)
+        entry = self.memo.get(memo_key) if self.memo is not None else None
+        if entry is None:
+            with span('cache.load') as record:
+                entry = self.cache.load(stock_symbol)
+                record.add(rows=len(entry.series) if entry is not None else 0)
+        if entry is None:
+            series = self.request_time_series(stock_symbol, 'full')
+            if series is None:
+                return None
+            with span('cache.save'):
+                entry = self.cache.save(stock_symbol, series, today)
+        elif not entry.is_fresh(date_end, today):
+            import requests
+
+            try:
+                series = self.request_time_series(stock_symbol, entry.refresh_outputsize(today))
+            except (ThrottledError, requests.RequestException):
+                # The cached history still answers the request, only without the latest days
+                series = None
+            if series is not None:
+                with span('cache.save'):
+                    entry = self.cache.save(stock_symbol, entry.series.merged_with(series), today)
+
+        if self.memo is not None:
+            self.memo.put(memo_key, entry)
+        return entry.series.between(date_start, date_end)
+
+    def fetch_daily_stock_data(self, stock_symbol: str, date_start: datetime, date_end: datetime):
+        series = self.fetch_daily_price_series(stock_symbol, date_start, date_end)
+        if series is None:
+            return None
+        return series.to_dict()
+
+def with_rate_limiter(fetcher: StockDataFetcher, rate_limiter) -> StockDataFetcher:
+    """
+    A shallow copy of fetcher whose requests are paced by rate_limiter (None for no pacing).
+
+    The copy shares the fetcher's HTTP session, cache and memo, while the fetcher itself keeps
+    its own limiter for the requests made through it later.
+    """
+    if isinstance(fetcher, StockDataFetcher):
+        # Open the pool first, or the copy would open a second one
+        fetcher.session
+    paced = copy.copy(fetcher)
+    paced.rate_limiter = rate_limiter
+    return paced
@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.data_processor import DataProcessor, StockData
+from app.formatting import RuleContext
+from app.instrumentation import span
+
+@dataclass
+class SweepResult:
+    """
+    Hit counts for every parameter combination of one rule kind.
+
+    Combination (i, j) uses num_days[i] and thresholds[j]. Each row of the series gets one score
+    per num_days value, and the combination highlights the rows whose score reaches levels[i, j].
+    That keeps every hit mask available from a (num_days, rows) array instead of storing one per
+    combination.
+    """
+    kind: str
+    direction: Optional[str]
+    num_days: np.ndarray
+    thresholds: np.ndarray
+    hits: np.ndarray
+    scores: np.ndarray
+    levels: np.ndarray
+
+    @property
+    def rows(self) -> int:
+        return self.scores.shape[1]
+
+    @property
+    def hit_rates(self) -> np.ndarray:
+        """Fraction of rows highlighted by each combination."""
+        return self.hits / max(self.rows, 1)
+
+    def mask(self, i: int, j: int) -> np.ndarray:
+        """The rows highlighted by combination (i, j), exactly as the report's rule would highlight them."""
+        return self.scores[i] >= self.levels[i, j]
+
+    def masks(self) -> np.ndarray:
+        """Every combination's hit mask, shaped (num_days, thresholds, rows)."""
+        with np.errstate(invalid='ignore'):
+            return self.scores[:, None, :] >= self.levels[:, :, None]
+
+def count_at_least(scores: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """How many scores reach each level, using one sort instead of one comparison pass per level."""
+    ordered = np.sort(scores[~np.isnan(scores)])
+    return ordered.size - np.searchsorted(ordered, levels, side='left')
+
+class ParameterSweep:
+    """
+    Evaluates grids of rule parameters against one series.
+
+    Percent changes are computed once and shared by every sweep, and each grid is evaluated with
+    array operations over whole rows at a time. Results match the report's rules cell for cell.
+    """
+    def __init__(self, data: Union[StockData, RuleContext]):
+        self.context = data if isinstance(data, RuleContext) else RuleContext(data)
+
+    def threshold(self, thresholds: Sequence[float], direction: str) -> SweepResult:
+        """Sweep FormattingRuleFactory.threshold_change_rule over percent thresholds."""
+        if direction not in ('positive', 'negative'):
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        with span('sweep.threshold') as record:
+            percent_changes = self.context.percent_changes
+            scores = (percent_changes if direction == 'positive' else -percent_changes)[None, :]
+            levels = thresholds[None, :]
+            hits = count_at_least(scores[0], thresholds)[None, :]
+            record.add(rows=scores.shape[1] * thresholds.size)
+        return SweepResult('threshold_change', direction, np.ones(1, dtype=np.int64), thresholds,
+                           hits, scores, levels)
+
+    def consecutive(self, num_days: Sequence[int], direction: str) -> SweepResult:
+        """
+        Sweep FormattingRuleFactory.consecutive_change_rule over streak lengths.
+
+        A row's score is the length of the streak it belongs to, so one run-length encoding serves
+        every num_days value. The single threshold column stands for "any move".
+        """
+        if direction == 'positive':
+            moves = self.context.percent_changes > 0
+        elif direction == 'negative':
+            moves = self.context.percent_changes < 0
+        else:
+            raise ValueError("Direction must be either 'positive' or 'negative'")
+        num_days = np.asarray(num_days, dtype=np.int64)
+        with span('sweep.consecutive') as record:
+            streaks = DataProcessor.streak_lengths(moves)
+            # A streak of length L highlights its L rows for every num_days <= L
+            levels = np.where(num_days >= 1, num_days, np.inf).astype(np.float64)[:, None]
+            hits = count_at_least(streaks, levels[:, 0])[:, None]
+            scores = np.broadcast_to(streaks, (num_days.size, moves.size))
+            record.add(rows=moves.size * num_days.size)
+        return SweepResult('consecutive_change', direction, num_days, np.zeros(1), hits, scores, levels)
+
+    def cumulative(self, num_days: Sequence[int], thresholds: Sequence[float]) -> SweepResult:
+        """
+        Sweep FormattingRuleFactory.cumulative_change_rule over window lengths and thresholds.
+
+        For each window length, a row's score is the largest absolute change of any window that
+        contains it, so every threshold for that length is a single comparison.
+        """
+        closes = self.context.closes
+        num_days = np.asarray(num_days, dtype=np.int64)
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        scores = np.full((num_days.size, closes.size), -np.inf)
+        with span('sweep.cumulative') as record:
+            for i, days in enumerate(num_days.tolist()):
+                scores[i] = DataProcessor.window_change_scores(closes, days)
+            levels = np.broadcast_to(np.abs(thresholds), (num_days.size, thresholds.size))
+            hits = np.stack([count_at_least(scores[i], levels[i]) for i in range(num_days.size)]) \
+                if num_days.size else np.zeros((0, thresholds.size), dtype=np.int64)
+            record.add(rows=closes.size * num_days.size)
+        return SweepResult('cumulative_change', None, num_days, thresholds, hits, scores, levels)
+
+def sweep_report(data: Union[StockData, RuleContext], num_days: Sequence[int],
+                 thresholds: Sequence[float], period_thresholds: Optional[Sequence[float]] = None) -> List[SweepResult]:
+    """
+    Sweep all five report rules: streaks up and down, daily thresholds up and down, and cumulative windows.
+
+    Args:
+        data (Union[StockData, RuleContext]): The series to evaluate.
+        num_days (Sequence[int]): Streak and window lengths to try.
+        thresholds (Sequence[float]): Daily percent thresholds to try.
+        period_thresholds (Optional[Sequence[float]]): Cumulative percent thresholds; defaults to thresholds.
+
+    Returns:
+        List[SweepResult]: One result per rule.
+    """
+    sweep = ParameterSweep(data)
+    return [
+        sweep.consecutive(num_days, 'positive'),
+        sweep.consecutive(num_days, 'negative'),
+        sweep.threshold(thresholds, 'positive'),
+        sweep.threshold(thresholds, 'negative'),
+        sweep.cumulative(num_days, thresholds if period_thresholds is None else period_thresholds),
+    ]
+
+def write_sweep_workbook(file_name: str, results: Sequence[SweepResult], title: str = 'Sweep') -> str:
+    """
+    Write a summary sheet with one hit-count table per sweep, shaded from fewest to most hits.
+
+    Each table lists num_days down the side and thresholds across the top; cells hold the number
+    of rows the combination highlights.
+
+    Args:
+        file_name (str): Path of the workbook to create.
+        results (Sequence[SweepResult]): The sweeps to summarize.
+        title (str): The worksheet title.
+
+    Returns:
+        str: The file name.
+    """
+    from openpyxl import Workbook
+    from openpyxl.formatting.rule import ColorScaleRule
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title)
+    worksheet.column_dimensions['A'].width = 28
+    row = 1
+    with span('sweep.write'):
+        for result in results:
+            name = result.kind if result.direction is None else f"{result.kind} ({result.direction})"
+            worksheet.append([f"{name}: rows highlighted of {result.rows}"])
+            if result.kind == 'consecutive_change':
+                worksheet.append(["num_days", "any move"])
+            else:
+                worksheet.append(["num_days \\ threshold %"] + result.thresholds.tolist())
+            for days, counts in zip(result.num_days.tolist(), result.hits.tolist()):
+                worksheet.append([days] + counts)
+            first, last = row + 2, row + 1 + len(result.num_days)
+            if len(result.num_days):
+                cells = f"B{first}:{get_column_letter(1 + result.hits.shape[1])}{last}"
+                worksheet.conditional_formatting.add(cells, ColorScaleRule(
+                    start_type='min', start_color='FFFFFFFF', end_type='max', end_color='FFFFA500'))
+            worksheet.append([])
+            row = last + 2
+        workbook.save(file_name)
+    return file_name
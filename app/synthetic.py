@@ -0,0 +1,32 @@
+import numpy as np
+
+from app.price_series import PriceSeries, DateLike, to_datetime64
+
+def synthetic_series(rows: int, symbol: str = "SYN", seed: int = 0, start: DateLike = "1900-01-01",
+                     start_price: float = 100.0, volatility: float = 0.02) -> PriceSeries:
+    """
+    Generate a reproducible daily OHLC series for benchmarks and offline testing.
+
+    Closes follow a geometric random walk over consecutive business days. Each day opens at a
+    small gap from the previous close, and the high and low bracket the open and close.
+
+    Args:
+        rows (int): Number of trading days.
+        symbol (str): Symbol recorded on the series.
+        seed (int): Random seed; the same arguments always give the same series.
+        start (DateLike): First trading day, rolled forward to a weekday.
+        start_price (float): Open of the first day.
+        volatility (float): Standard deviation of the daily log return.
+
+    Returns:
+        PriceSeries: The generated prices.
+    """
+    generator = np.random.default_rng(seed)
+    dates = np.busday_offset(to_datetime64(start), np.arange(rows), roll='forward')
+    close = start_price * np.exp(np.cumsum(generator.normal(0.0, volatility, rows)))
+    previous_close = np.concatenate(([start_price], close[:-1]))
+    open_ = previous_close * np.exp(generator.normal(0.0, volatility / 4, rows))
+    spread = np.abs(generator.normal(0.0, volatility / 2, (2, rows)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+    return PriceSeries(dates, open_, high, low, close, symbol)
@@ -0,0 +1,106 @@
+import queue
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Optional
+
+# progress(stage, fraction) reports overall completion between 0 and 1. Long-running work calls it
+# between steps, and it raises ReportCancelled once cancellation has been requested.
+ProgressCallback = Callable[[str, float], None]
+
+class ReportCancelled(Exception):
+    """Raised from a progress callback to stop a job that the user cancelled."""
+
+@dataclass
+class Job:
+    work: Callable[[ProgressCallback], Any]
+    on_progress: Optional[Callable[[str, float], None]] = None
+    on_done: Optional[Callable[[Any], None]] = None
+    on_error: Optional[Callable[[Exception], None]] = None
+    on_cancelled: Optional[Callable[[], None]] = None
+
+class BackgroundRunner:
+    """
+    Runs jobs one at a time on a worker thread.
+
+    Jobs submitted while another is running wait in a queue. Callbacks never run on the worker
+    thread: they are queued as events and run by dispatch_events, which the GUI calls from its
+    main loop (e.g. via root.after), so Tk is only ever touched from the main thread.
+    """
+    def __init__(self):
+        self.jobs: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self.events: "queue.Queue[Callable[[], None]]" = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._work, name="report-worker", daemon=True)
+        self.thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting behind the running one."""
+        return self.jobs.qsize()
+
+    @property
+    def busy(self) -> bool:
+        """True while a job is running or queued."""
+        return self.jobs.unfinished_tasks > 0
+
+    def submit(self, work: Callable[[ProgressCallback], Any], on_progress=None, on_done=None,
+               on_error=None, on_cancelled=None):
+        """
+        Queue a job.
+
+        Args:
+            work (Callable[[ProgressCallback], Any]): The job; it receives a progress callback to report through.
+            on_progress: Called with (stage, fraction) as the job reports progress.
+            on_done: Called with the job's return value.
+            on_error: Called with the exception if the job fails.
+            on_cancelled: Called if the job was cancelled.
+        """
+        self.jobs.put(Job(work, on_progress, on_done, on_error, on_cancelled))
+
+    def cancel(self):
+        """Ask the running job to stop at its next progress report. Queued jobs still run."""
+        self.cancel_event.set()
+
+    def dispatch_events(self):
+        """Run the callbacks posted by the worker. Call this from the GUI thread."""
+        while True:
+            try:
+                callback = self.events.get_nowait()
+            except queue.Empty:
+                return
+            callback()
+
+    def shutdown(self, wait: bool = False):
+        self.cancel()
+        self.jobs.put(None)
+        if wait:
+            self.thread.join()
+
+    def _post(self, callback: Optional[Callable], *args):
+        if callback is not None:
+            self.events.put(partial(callback, *args))
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            self.cancel_event.clear()
+
+            def progress(stage: str, fraction: float, job=job):
+                if self.cancel_event.is_set():
+                    raise ReportCancelled()
+                self._post(job.on_progress, stage, fraction)
+
+            try:
+                result = job.work(progress)
+            except ReportCancelled:
+                self._post(job.on_cancelled)
+            except Exception as e:
+                self._post(job.on_error, e)
+            else:
+                self._post(job.on_done, result)
+            finally:
+                self.jobs.task_done()
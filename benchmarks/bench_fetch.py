@@ -0,0 +1,105 @@
+"""
+Offline load test of the fetch path against app.mock_server.
+
+Starts a mock Alpha Vantage server in this process (or targets one given with --url) and fetches
+--symbols synthetic symbols through BatchFetcher three ways:
+
+* cold: every symbol downloaded into an empty price cache
+* warm: the same symbols again, answered from the cache
+* report: create_batch_report over the first --report-symbols symbols, end to end
+
+The mock can add latency and inject throttling notices and server errors, so retries and backoff
+show up in the numbers. The rate limiter is opened up to --per-minute so the client, not the
+free-tier quota, is what gets measured.
+
+    python benchmarks/bench_fetch.py --symbols 500 --workers 16 --latency 0.05 --throttle-rate 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.batch_fetcher import BatchFetcher, RateLimiter
+from app.mock_server import MockServer, MockSettings
+from app.spreadsheet_manager import SpreadSheetManager
+
+REPORT_PARAMETERS = {
+    "consecutive_change": {"days": 5},
+    "daily_threshold": {"percent": 2.5},
+    "period_change": {"percent": 5, "days": 5},
+}
+
+def fetch_all(batch: BatchFetcher, symbols: List[str], start: date, end: date) -> dict:
+    began = time.perf_counter()
+    results = list(batch.fetch_many(symbols, start, end))
+    seconds = time.perf_counter() - began
+    rows = sum(len(result.series) for result in results if result.ok)
+    return {"seconds": seconds, "ok": sum(result.ok for result in results), "failed": sum(not result.ok for result in results),
+            "rows": rows}
+
+def print_pass(name: str, result: dict, symbols: int):
+    print(f"{name:>7} {result['seconds']:8.2f} s  {symbols / result['seconds']:8.1f} symbols/s  "
+          f"{result['rows'] / result['seconds'] / 1e6:6.2f} M rows/s  {result['ok']} ok  {result['failed']} failed",
+          flush=True)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="an already running mock server; default starts one here")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=5000, help="trading days per symbol")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent fetches")
+    parser.add_argument("--per-minute", type=int, default=1_000_000, help="client rate limit")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--datatype", choices=["json", "csv"], default="json")
+    parser.add_argument("--cache-format", choices=["npz", "memmap"], default="npz")
+    parser.add_argument("--report-symbols", type=int, default=10, help="symbols in the end-to-end report; 0 skips it")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = MockServer(MockSettings(rows=args.rows, latency=args.latency, jitter=args.jitter,
+                                         throttle_rate=args.throttle_rate, error_rate=args.error_rate)).start()
+        url = server.url
+    symbols = [f"SYM{i:05d}" for i in range(args.symbols)]
+    start, end = date(1900, 1, 1), date(2100, 1, 1)
+    limiter = RateLimiter(per_minute=args.per_minute, per_day=args.per_minute * 1440)
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            manager = SpreadSheetManager("benchmark", cache_dir=cache_dir, cache_format=args.cache_format)
+            fetcher = manager.stock_data_fetcher
+            fetcher.base_url = url
+            fetcher.datatype = args.datatype
+            fetcher.pool_size = max(args.workers, fetcher.pool_size)
+            batch = BatchFetcher(fetcher, limiter, max_workers=args.workers, sleep=lambda seconds: None)
+
+            print_pass("cold", fetch_all(batch, symbols, start, end), len(symbols))
+            print_pass("warm", fetch_all(batch, symbols, start, end), len(symbols))
+
+            if args.report_symbols:
+                user_input = dict(REPORT_PARAMETERS, start_date=start, end_date=end,
+                                  file_path=os.path.join(cache_dir, "report.xlsx"))
+                began = time.perf_counter()
+                report = manager.create_batch_report(symbols[:args.report_symbols], user_input, batch_fetcher=batch)
+                print(f" report {time.perf_counter() - began:8.2f} s  {args.report_symbols} symbols  "
+                      f"{len(report.errors)} failed")
+            fetcher.close()
+    finally:
+        if server is not None:
+            stats = server.stats
+            print(f"server: {stats.requests} requests, {stats.throttled} throttled, {stats.errors} errors, "
+                  f"{stats.bytes / 1e6:.1f} MB sent")
+            server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
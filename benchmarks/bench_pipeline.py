@@ -0,0 +1,184 @@
+"""
+Scaling benchmarks for the processing pipeline, from 1k to 1M rows of synthetic prices.
+
+Each stage is timed on its own (best of --repeat runs with time.perf_counter), then run once
+more under tracemalloc for its peak allocation. Stages:
+
+* percent_changes: DataProcessor.calculate_daily_percent_changes
+* consecutive_changes: DataProcessor.check_consecutive_changes on the percent-change dict
+* cumulative_change: DataProcessor.check_cumulative_change
+* rule_apply: FormattingRule.apply for the five report rules, sharing one RuleContext
+* render_sheet: rule evaluation and sheet layout for the streaming writer
+* write_workbook: streaming the rendered sheet to disk
+* create_excel_file: the whole report, end to end, from an in-memory fetcher
+
+The writer stages only run up to --max-write-rows (default 10k): openpyxl needs about 15 s per
+100k rows to serialize the sheet, so pass --max-write-rows 100000 for a full run.
+
+Results can be saved as a baseline and later runs compared against it. Any stage that is slower or
+uses more memory than the baseline allows fails the run with exit status 1:
+
+    python benchmarks/bench_pipeline.py --save-baseline
+    python benchmarks/bench_pipeline.py --compare
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data_processor import DataProcessor
+from app.excel_writer import render_sheet, write_workbook
+from app.formatting import RuleContext
+from app.memo import MemoCache
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DIFFERENCE = 0.005
+MIN_MEMORY_DIFFERENCE = 1 << 20
+
+REPORT_PARAMETERS = {
+    "consecutive_change": {"days": 5},
+    "daily_threshold": {"percent": 2.5},
+    "period_change": {"percent": 5, "days": 5},
+}
+
+class SeriesFetcher:
+    """Stands in for StockDataFetcher, answering every request with the same series."""
+    rate_limiter = None
+
+    def __init__(self, series):
+        self.series = series
+
+    def fetch_daily_price_series(self, stock_symbol, date_start, date_end):
+        return self.series
+
+def build_stages(rows: int, output_dir: str, include_writes: bool) -> Dict[str, Callable[[], Any]]:
+    series = synthetic_series(rows)
+    percent_changes = DataProcessor.calculate_daily_percent_changes(series)
+    rules = SpreadSheetManager.build_formatting_rules(REPORT_PARAMETERS)
+    # A memo that keeps nothing, so every repeat evaluates the rules again as the baseline did
+    manager = SpreadSheetManager("benchmark", cache_dir=None, memo=MemoCache(max_entries=0))
+    manager.stock_data_fetcher = SeriesFetcher(series)
+    file_name = os.path.join(output_dir, f"bench_{rows}.xlsx")
+    user_input = dict(REPORT_PARAMETERS, symbol="SYN", start_date=date.min, end_date=date.max, file_path=file_name)
+
+    def rule_apply():
+        context = RuleContext(series)
+        return [rule.apply(series, context) for rule in rules]
+
+    stages = {
+        "percent_changes": lambda: DataProcessor.calculate_daily_percent_changes(series),
+        "consecutive_changes": lambda: DataProcessor.check_consecutive_changes(percent_changes, 5, "positive"),
+        "cumulative_change": lambda: DataProcessor.check_cumulative_change(series, 5, 5),
+        "rule_apply": rule_apply,
+    }
+    if include_writes:
+        sheet = render_sheet(series, rules)
+        stages["render_sheet"] = lambda: render_sheet(series, rules)
+        stages["write_workbook"] = lambda: write_workbook(file_name, [sheet])
+        stages["create_excel_file"] = lambda: manager.create_excel_file(user_input)
+    return stages
+
+def measure(stage: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+def run_benchmarks(sizes: List[int], repeat: int, max_write_rows: int,
+                   only: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for rows in sizes:
+            for name, stage in build_stages(rows, output_dir, rows <= max_write_rows).items():
+                if only and name not in only:
+                    continue
+                result = measure(stage, repeat)
+                results[f"{name}@{rows}"] = result
+                print(f"{name:>20} {rows:>9,} rows  {result['seconds'] * 1000:10.1f} ms  "
+                      f"{result['peak_bytes'] / (1 << 20):8.1f} MiB peak", flush=True)
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            time_tolerance: float, memory_tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Returns:
+        List[str]: A description of every regression; empty if there are none.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        if (result["seconds"] > before["seconds"] * time_tolerance
+                and result["seconds"] - before["seconds"] > MIN_TIME_DIFFERENCE):
+            regressions.append(f"{key}: {result['seconds'] * 1000:.1f} ms, baseline {before['seconds'] * 1000:.1f} ms")
+        if (result["peak_bytes"] > before["peak_bytes"] * memory_tolerance
+                and result["peak_bytes"] - before["peak_bytes"] > MIN_MEMORY_DIFFERENCE):
+            regressions.append(f"{key}: {result['peak_bytes'] / (1 << 20):.1f} MiB peak, "
+                               f"baseline {before['peak_bytes'] / (1 << 20):.1f} MiB")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-write-rows", type=int, default=10_000)
+    parser.add_argument("--only", nargs="+", help="run only these stages")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if any stage regressed against the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--memory-tolerance", type=float, default=1.25, help="allowed peak memory growth factor")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat, args.max_write_rows, args.only)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\nPERFORMANCE REGRESSION against {args.baseline}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Cold-start benchmark for the app package.
+
+Each measurement runs in a fresh interpreter under ``-X importtime``:
+
+* cli-ready: importing app.cli and building its argument parser, i.e. everything
+  ``python -m app run ...`` does before it starts fetching.
+* first-window: importing app.gui and mapping a Tk window. Skipped when Tk finds no display;
+  any other failure, of this case or another, fails the check.
+
+The script prints the wall time, the slowest imports by cumulative time, and whether any
+module that should load lazily was imported. It exits with status 1 if a case failed, a heavy module was
+imported or a time exceeds its budget.
+
+    python benchmarks/startup.py [--repeat 5] [--cli-budget-ms 400] [--window-budget-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported before the user asks for a fetch or a workbook
+LAZY_MODULES = ("pandas", "openpyxl", "requests")
+
+CLI_READY = """
+import time
+start = time.perf_counter()
+from app.cli import build_parser
+build_parser()
+elapsed = time.perf_counter() - start
+"""
+
+FIRST_WINDOW = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import app.gui
+root = tk.Tk()
+root.update()
+elapsed = time.perf_counter() - start
+root.destroy()
+"""
+
+REPORT = """
+import sys
+print("elapsed", elapsed)
+print("modules", ",".join(sorted(sys.modules)))
+"""
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int]]:
+    """(module, cumulative microseconds) pairs from -X importtime output; nesting is kept as indentation."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imports.append((name.rstrip(), int(cumulative)))
+    return imports
+
+def measure(script: str) -> Dict:
+    """
+    Run script in a fresh interpreter.
+
+    Raises:
+        RuntimeError: If the script failed, with the last line of its error output.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script + REPORT],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(errors[-1] if errors else f"exit status {result.returncode}")
+    values = dict(line.split(" ", 1) for line in result.stdout.splitlines() if " " in line)
+    imports = parse_importtime(result.stderr)
+    # Cumulative time per top-level package, however deep it was first imported
+    packages: Dict[str, int] = {}
+    for name, cumulative in imports:
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    return {
+        "elapsed_ms": float(values["elapsed"]) * 1000,
+        "modules": values["modules"].split(","),
+        "slowest": sorted(packages.items(), key=lambda item: item[1], reverse=True)[:8],
+    }
+
+def display_missing(error: str) -> bool:
+    """Whether a script failed only because Tk could not open a display."""
+    return "TclError" in error and ("display" in error.lower() or not os.environ.get("DISPLAY"))
+
+def run_case(name: str, script: str, repeat: int, budget_ms: float, needs_display: bool = False) -> bool:
+    """Measure one case; a failed script fails the case unless it needs a display and none was found."""
+    try:
+        runs = [measure(script) for _ in range(repeat)]
+    except RuntimeError as e:
+        if needs_display and display_missing(str(e)):
+            print(f"{name}: skipped ({e})")
+            return True
+        print(f"{name}: failed ({e})")
+        return False
+
+    best = min(runs, key=lambda run: run["elapsed_ms"])
+    loaded = [module for module in LAZY_MODULES if module in best["modules"]]
+    print(f"{name}: best {best['elapsed_ms']:.0f} ms of {repeat} (budget {budget_ms:.0f} ms)")
+    for module, cumulative in best["slowest"]:
+        print(f"    {cumulative / 1000:8.1f} ms  {module}")
+    if loaded:
+        print(f"    imported eagerly: {', '.join(loaded)}")
+    return not loaded and best["elapsed_ms"] <= budget_ms
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cli-budget-ms", type=float, default=400)
+    parser.add_argument("--window-budget-ms", type=float, default=1500)
+    args = parser.parse_args(argv)
+
+    ok = run_case("cli-ready", CLI_READY, args.repeat, args.cli_budget_ms)
+    ok = run_case("first-window", FIRST_WINDOW, args.repeat, args.window_budget_ms, needs_display=True) and ok
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
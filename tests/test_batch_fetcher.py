@@ -0,0 +1,126 @@
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from app.batch_fetcher import BatchFetcher, RateLimiter, QuotaExhaustedError
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError
+
+def time_series_payload(symbol):
+    return {
+        "Meta Data": {"2. Symbol": symbol},
+        "Time Series (Daily)": {
+            "2023-01-04": {"1. open": "103", "2. high": "104", "3. low": "102", "4. close": "103.5"},
+            "2023-01-03": {"1. open": "101", "2. high": "103", "3. low": "100", "4. close": "102.5"},
+        },
+    }
+
+@pytest.fixture
+def fake_server():
+    state = {"requests": [], "throttle": set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            symbol = parse_qs(urlparse(self.path).query)["symbol"][0]
+            state["requests"].append(symbol)
+            if symbol in state["throttle"]:
+                state["throttle"].discard(symbol)
+                payload = {"Note": "Our standard API call frequency is 5 calls per minute."}
+            elif symbol == "MISSING":
+                payload = {"Error Message": "Invalid API call."}
+            else:
+                payload = time_series_payload(symbol)
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/query"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_rate_limiter_spaces_requests_after_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=5, per_day=100, clock=clock, sleep=clock.sleep)
+
+    for _ in range(7):
+        limiter.acquire()
+
+    assert clock.sleeps == [pytest.approx(12.0), pytest.approx(12.0)]
+
+def test_rate_limiter_respects_daily_quota():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=5, per_day=3, max_wait=3600, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        limiter.acquire()
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
+
+def test_fetcher_raises_on_throttle_notice(fake_server):
+    fake_server["throttle"].add("IBM")
+    fetcher = StockDataFetcher("key", base_url=fake_server["url"])
+
+    with pytest.raises(ThrottledError):
+        fetcher.fetch_daily_price_series("IBM", date(2023, 1, 1), date(2023, 1, 31))
+
+def test_fetch_many_streams_results_and_retries(fake_server):
+    fake_server["throttle"].add("MSFT")
+    fetcher = StockDataFetcher("key", base_url=fake_server["url"])
+    limiter = RateLimiter(per_minute=1000, per_day=1000)
+    sleeps = []
+    batch = BatchFetcher(fetcher, limiter, max_workers=3, backoff=0.5, sleep=sleeps.append)
+
+    results = {result.symbol: result for result in batch.fetch_many(["IBM", "MSFT", "AAPL", "MISSING"], date(2023, 1, 1), date(2023, 1, 31))}
+
+    assert set(results) == {"IBM", "MSFT", "AAPL", "MISSING"}
+    assert results["MSFT"].ok
+    assert results["MSFT"].series.close.tolist() == [102.5, 103.5]
+    assert not results["MISSING"].ok
+    assert fake_server["requests"].count("MSFT") == 2
+    assert sleeps == [0.5]
+
+def test_fetch_one_gives_up_after_max_retries(fake_server):
+    fetcher = StockDataFetcher("key", base_url=fake_server["url"])
+    batch = BatchFetcher(fetcher, RateLimiter(per_minute=1000, per_day=1000), max_retries=2, sleep=lambda seconds: fake_server["throttle"].add("IBM"))
+    fake_server["throttle"].add("IBM")
+
+    result = batch.fetch_one("IBM", date(2023, 1, 1), date(2023, 1, 31))
+
+    assert isinstance(result.error, ThrottledError)
+    assert fake_server["requests"].count("IBM") == 3
+
+def test_batch_does_not_change_the_callers_limiter(fake_server):
+    fetcher = StockDataFetcher("key", base_url=fake_server["url"])
+    limiter = RateLimiter(per_minute=1000, per_day=1000)
+    batch = BatchFetcher(fetcher, limiter)
+
+    results = list(batch.fetch_many(["IBM"], date(2023, 1, 1), date(2023, 1, 31)))
+
+    assert results[0].ok
+    assert fetcher.rate_limiter is None
+    assert batch.fetcher.rate_limiter is limiter
+    assert batch.fetcher.session is fetcher.session
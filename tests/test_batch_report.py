@@ -0,0 +1,83 @@
+import os
+import pytest
+import numpy as np
+import openpyxl
+from datetime import date
+from app.batch_fetcher import BatchFetcher, RateLimiter
+from app.price_series import PriceSeries
+from app.spreadsheet_manager import SpreadSheetManager, sheet_title
+
+class FakeFetcher:
+    rate_limiter = None
+
+    def fetch_daily_price_series(self, stock_symbol, date_start, date_end):
+        if stock_symbol == "MISSING":
+            return None
+        closes = 100 + np.cumsum(np.sin(np.arange(40) + len(stock_symbol)))
+        dates = np.datetime64('2023-01-02') + np.arange(closes.size)
+        return PriceSeries(dates, closes, closes + 1, closes - 1, closes, stock_symbol)
+
+@pytest.fixture
+def manager():
+    manager = SpreadSheetManager("key", cache_dir=None)
+    manager.stock_data_fetcher = FakeFetcher()
+    return manager
+
+def batch_input(file_path):
+    return {
+        "start_date": date(2023, 1, 1),
+        "end_date": date(2023, 3, 1),
+        "consecutive_change": {"days": 3},
+        "daily_threshold": {"percent": 0.5},
+        "period_change": {"percent": 1, "days": 4},
+        "file_path": file_path,
+    }
+
+def batch_fetcher(manager):
+    return BatchFetcher(manager.stock_data_fetcher, RateLimiter(per_minute=1000, per_day=1000))
+
+def test_one_sheet_per_symbol(tmp_path, manager):
+    file_name = str(tmp_path / "report.xlsx")
+
+    report = manager.create_batch_report(["IBM", "MSFT", "MISSING", "IBM"], batch_input(file_name),
+                                         max_workers=2, batch_fetcher=batch_fetcher(manager))
+
+    assert report.files == [file_name]
+    assert set(report.errors) == {"MISSING"}
+    workbook = openpyxl.load_workbook(file_name)
+    assert workbook.sheetnames == ["IBM", "MSFT"]
+    assert workbook["MSFT"].max_row == 41
+
+def test_one_workbook_per_symbol(tmp_path, manager):
+    report = manager.create_batch_report(["IBM", "MSFT"], batch_input(str(tmp_path)), one_workbook_per_symbol=True,
+                                         max_workers=2, batch_fetcher=batch_fetcher(manager))
+
+    assert sorted(report.files) == [str(tmp_path / "IBM.xlsx"), str(tmp_path / "MSFT.xlsx")]
+    assert report.errors == {}
+    assert os.path.exists(tmp_path / "IBM.xlsx")
+
+def test_one_workbook_per_symbol_creates_the_directory_and_reports_write_errors(tmp_path, manager):
+    output = tmp_path / "reports" / "daily"
+    # A directory where MSFT's workbook should go makes that one write fail
+    os.makedirs(output / "MSFT.xlsx")
+
+    report = manager.create_batch_report(["IBM", "MSFT"], batch_input(str(output)), one_workbook_per_symbol=True,
+                                         max_workers=2, batch_fetcher=batch_fetcher(manager))
+
+    assert report.files == [str(output / "IBM.xlsx")]
+    assert set(report.errors) == {"MSFT"}
+
+def test_sheet_title():
+    assert sheet_title("BRK/B") == "BRK_B"
+    assert len(sheet_title("X" * 40)) == 31
+
+def test_screen_file_ranks_fetched_symbols(tmp_path, manager):
+    file_name = str(tmp_path / "screen.xlsx")
+
+    report = manager.create_screen_file(["IBM", "MISSING", "MSFT", "A"], batch_input(file_name),
+                                        batch_fetcher=batch_fetcher(manager))
+
+    assert report.files == [file_name]
+    assert set(report.errors) == {"MISSING"}
+    screened = [row[0] for row in openpyxl.load_workbook(file_name)["Screen"].iter_rows(min_row=3, values_only=True)]
+    assert set(screened) <= {"IBM", "MSFT", "A"}
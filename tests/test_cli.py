@@ -0,0 +1,190 @@
+import subprocess
+import sys
+import pytest
+from datetime import date
+from app import cli
+from app.spreadsheet_manager import BatchReport
+
+class FakeManager:
+    instances = []
+
+    def __init__(self, api_key, cache_dir=None, cache_format="npz", memo=None):
+        self.api_key = api_key
+        self.cache_dir = cache_dir
+        self.cache_format = cache_format
+        self.memo = memo
+        self.calls = []
+        FakeManager.instances.append(self)
+
+    def create_excel_file(self, user_input):
+        self.calls.append(("single", user_input))
+        return user_input["file_path"]
+
+    def create_batch_report(self, symbols, user_input, one_workbook_per_symbol=False, max_workers=None,
+                            rate_limiter=None):
+        self.calls.append(("batch", symbols, one_workbook_per_symbol, max_workers))
+        self.rate_limiter = rate_limiter
+        return BatchReport(files=["out/IBM.xlsx"], errors={"BAD": ValueError("no data")})
+
+    def create_screen_file(self, symbols, user_input, rate_limiter=None):
+        self.calls.append(("screen", symbols, user_input))
+        self.rate_limiter = rate_limiter
+        return BatchReport(files=[user_input["file_path"]])
+
+@pytest.fixture
+def fake_manager(monkeypatch):
+    FakeManager.instances = []
+    monkeypatch.setattr(cli, "SpreadSheetManager", FakeManager)
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    return FakeManager
+
+def test_single_symbol_run(fake_manager, capsys):
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key", "--daily-threshold", "1.5", "--no-cache"])
+
+    manager = fake_manager.instances[0]
+    kind, user_input = manager.calls[0]
+    assert code == 0
+    assert manager.cache_dir is None
+    assert kind == "single"
+    assert user_input["start_date"] == date(2023, 1, 1)
+    assert user_input["daily_threshold"] == {"percent": 1.5}
+    assert capsys.readouterr().out.strip() == "report.xlsx"
+
+def test_multi_symbol_run_reports_errors(fake_manager, monkeypatch, capsys):
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "env-key")
+
+    code = cli.main(["run", "--symbols", "IBM", "BAD", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "out", "--workbook-per-symbol", "--workers", "2"])
+
+    manager = fake_manager.instances[0]
+    output = capsys.readouterr()
+    assert code == 1
+    assert manager.api_key == "env-key"
+    assert manager.calls == [("batch", ["IBM", "BAD"], True, 2)]
+    assert "out/IBM.xlsx" in output.out
+    assert "BAD: no data" in output.err
+
+def test_quota_flags_reach_the_batch_limiter(fake_manager, capsys):
+    cli.main(["run", "--symbols", "IBM", "BAD", "MSFT", "--start", "2023-01-01", "--end", "2023-02-01",
+              "--out", "out", "--api-key", "key", "--per-minute", "75", "--per-day", "2"])
+
+    limiter = fake_manager.instances[0].rate_limiter
+    assert [bucket.capacity for bucket in limiter.buckets] == [75, 2]
+    assert limiter.max_wait == cli.QUOTA_MAX_WAIT
+    assert "3 symbols but only 2 requests allowed per day" in capsys.readouterr().err
+
+    cli.main(["screen", "--symbols", "IBM", "MSFT", "--start", "2023-01-01", "--end", "2023-02-01",
+              "--out", "screen.xlsx", "--api-key", "key", "--per-day", "500"])
+
+    limiter = fake_manager.instances[1].rate_limiter
+    assert [bucket.capacity for bucket in limiter.buckets] == [5, 500]
+    assert "warning" not in capsys.readouterr().err
+
+def test_custom_rules(fake_manager, capsys):
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key",
+                     "--rule", "streak(3, up) and daily(2, up)", "close,percent_change", "green"])
+
+    kind, user_input = fake_manager.instances[0].calls[0]
+    assert code == 0
+    assert user_input["custom_rules"] == [{"expression": "streak(3, up) and daily(2, up)",
+                                           "columns": ["close", "percent_change"], "background_color": "green"}]
+
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key", "--rule", "streak(3, up", "volume", "teal"])
+
+    errors = capsys.readouterr().err
+    assert code == 2
+    assert "')'" in errors and "volume" in errors and "teal" in errors
+    assert len(fake_manager.instances[-1].calls) == 0
+
+def test_memo_dir_adds_a_disk_tier(fake_manager, tmp_path):
+    cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+              "--out", "report.xlsx", "--api-key", "key", "--memo-dir", str(tmp_path)])
+
+    assert fake_manager.instances[0].memo.disk_dir == str(tmp_path)
+
+def test_frequency_is_validated_and_passed_on(fake_manager, capsys):
+    cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+              "--out", "report.xlsx", "--api-key", "key", "--frequency", "Weekly"])
+
+    assert fake_manager.instances[0].calls[0][1]["frequency"] == "weekly"
+    with pytest.raises(SystemExit):
+        cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                  "--out", "report.xlsx", "--frequency", "hourly"])
+    assert "hourly" in capsys.readouterr().err
+
+def test_rejects_reversed_dates(fake_manager):
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-02-01", "--end", "2023-01-01",
+                     "--out", "report.xlsx", "--api-key", "key"])
+
+    assert code == 2
+    assert fake_manager.instances == []
+
+def test_cli_never_imports_gui_modules():
+    script = "import sys, app.cli; print(any(name in sys.modules for name in ('tkinter', 'tkcalendar', 'app.gui')))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
+
+def test_startup_defers_heavy_imports():
+    script = ("import sys, app.cli; from app.spreadsheet_manager import SpreadSheetManager; SpreadSheetManager('key');"
+              "print(sorted(name for name in ('pandas', 'openpyxl', 'requests') if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+def test_profile_flag_prints_stage_summary(fake_manager, tmp_path, capsys):
+    summary_path = tmp_path / "profile.json"
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key", "--profile", "--profile-json", str(summary_path)])
+
+    assert code == 0
+    assert capsys.readouterr().err.startswith("profile ")
+    assert summary_path.exists()
+
+def test_update_needs_a_single_symbol(fake_manager, capsys):
+    code = cli.main(["run", "--symbols", "IBM", "MSFT", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key", "--update"])
+
+    assert code == 2
+    assert "--update" in capsys.readouterr().err
+
+def test_update_rejects_custom_rules(fake_manager, capsys):
+    code = cli.main(["run", "--symbols", "IBM", "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "report.xlsx", "--api-key", "key", "--update",
+                     "--rule", "streak(3, up)", "close", "green"])
+
+    assert code == 2
+    assert "--rule" in capsys.readouterr().err
+    assert fake_manager.instances[0].calls == []
+
+def test_screen_reads_symbols_file(fake_manager, tmp_path, capsys):
+    symbols_file = tmp_path / "universe.txt"
+    symbols_file.write_text("IBM\n# comment\n\nMSFT\n")
+
+    code = cli.main(["screen", "--symbols-file", str(symbols_file), "--start", "2023-01-01", "--end", "2023-02-01",
+                     "--out", "screen.xlsx", "--api-key", "key", "--period-days", "3"])
+
+    kind, symbols, user_input = fake_manager.instances[0].calls[0]
+    assert code == 0
+    assert (kind, symbols) == ("screen", ["IBM", "MSFT"])
+    assert user_input["period_change"] == {"percent": 5.0, "days": 3}
+    assert capsys.readouterr().out.strip() == "screen.xlsx"
+
+def test_monitor_polls_once_against_a_local_server(tmp_path, monkeypatch, capsys):
+    from app.mock_server import MockServer, MockSettings
+
+    log = tmp_path / "alerts.jsonl"
+    with MockServer(MockSettings(rows=150)) as server:
+        monkeypatch.setenv("ALPHAVANTAGE_BASE_URL", server.url)
+        code = cli.main(["monitor", "--symbols", "IBM", "MSFT", "--cycles", "1", "--api-key", "key",
+                         "--daily-threshold", "0", "--json-log", str(log)])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert code == 0
+    assert server.stats.requests == 2
+    # A zero threshold flags every day's move in one direction or the other
+    assert {line.split()[1] for line in lines} == {"IBM", "MSFT"}
+    assert len(log.read_text().splitlines()) == len(lines)
@@ -0,0 +1,81 @@
+import os
+import pytest
+import numpy as np
+import openpyxl
+from app import conditional_formatting
+from app.conditional_formatting import (consecutive_formula, cumulative_formula, threshold_formula,
+                                        translate_rule, write_conditional_workbook)
+from app.formatting import FormatStyle, FormattingRule, FormattingRuleFactory
+from app.price_series import PriceSeries
+
+@pytest.fixture
+def series():
+    closes = np.array([100, 102, 105, 103, 106, 110, 113], dtype=float)
+    dates = np.datetime64('2023-01-02') + np.arange(closes.size)
+    return PriceSeries(dates, closes, closes, closes, closes, "IBM")
+
+def test_threshold_formula():
+    assert threshold_formula("$I$2", "positive") == "AND(ISNUMBER($F2),$F2>=$I$2)"
+    assert threshold_formula("$I$3", "negative") == "AND(ISNUMBER($F2),$F2<=-$I$3)"
+
+def test_consecutive_formula_checks_every_window_containing_the_row():
+    formula = consecutive_formula(2, "positive")
+
+    assert formula == ('OR(SUMPRODUCT(ISNUMBER(INDEX($F:$F,ROW()):INDEX($F:$F,ROW()+1))'
+                       '*(INDEX($F:$F,ROW()):INDEX($F:$F,ROW()+1)>0))=2,'
+                       'IF(ROW()-1<2,FALSE,SUMPRODUCT(ISNUMBER(INDEX($F:$F,ROW()-1):INDEX($F:$F,ROW()))'
+                       '*(INDEX($F:$F,ROW()-1):INDEX($F:$F,ROW())>0))=2))')
+
+def test_cumulative_formula_guards_windows_outside_the_data():
+    formula = cumulative_formula(1, "$I$2", 8)
+
+    assert formula == ("IF(OR(ROW()<2,ROW()>8),FALSE,"
+                       "IF(OR(NOT(ISNUMBER(INDEX($E:$E,ROW()))),"
+                       "AND(INDEX($E:$E,ROW())<>0,NOT(ISNUMBER(INDEX($E:$E,ROW()))))),FALSE,"
+                       "ABS(IF(INDEX($E:$E,ROW())=0,0,(INDEX($E:$E,ROW())-INDEX($E:$E,ROW()))/INDEX($E:$E,ROW())*100))>=ABS($I$2)))")
+
+def test_unknown_or_oversized_rules_are_not_translated():
+    style = FormatStyle("close", "green")
+    custom = FormattingRule(lambda data, date: True, style)
+    huge = FormattingRuleFactory.consecutive_change_rule(200, "positive", "close", style)
+
+    assert translate_rule(custom, 10, "$I$2") is None
+    assert translate_rule(huge, 10, "$I$2") is None
+
+def test_write_conditional_workbook(tmp_path, series):
+    file_name = str(tmp_path / "report.xlsx")
+    rules = [
+        FormattingRuleFactory.cumulative_change_rule(3, 5, ["open", "high"], FormatStyle(["open", "high"], "yellow", bold=True)),
+        FormattingRuleFactory.threshold_change_rule(2.5, "positive", "percent_change", FormatStyle("percent_change", "green")),
+        FormattingRule(lambda data, date: data[date]["close"] > 110, FormatStyle("close", "red")),
+    ]
+
+    write_conditional_workbook(file_name, series, rules)
+
+    worksheet = openpyxl.load_workbook(file_name)["Stock Data"]
+    conditional = {str(entry.sqref): entry.rules[0] for entry in worksheet.conditional_formatting}
+    assert set(conditional) == {"B2:B8 C2:C8", "F2:F8"}
+    assert conditional["F2:F8"].formula == ["AND(ISNUMBER($F2),$F2>=$I$3)"]
+    assert conditional["F2:F8"].priority < conditional["B2:B8 C2:C8"].priority
+    assert [[cell.value for cell in row] for row in worksheet["H1:I3"]] == [
+        ["Parameter", "Value"],
+        ["3-day cumulative change % (yellow)", 5],
+        ["Daily positive change % (green)", 2.5],
+    ]
+    assert worksheet["E8"].fill.fgColor.rgb == "FFFF0000"
+    assert worksheet["E7"].fill.fill_type is None
+    assert worksheet["F2"].fill.fill_type is None
+
+def test_failed_write_discards_the_streamed_sheet(tmp_path, series, monkeypatch):
+    discarded = []
+    discard_workbook = conditional_formatting.discard_workbook
+    monkeypatch.setattr(conditional_formatting, "discard_workbook",
+                        lambda workbook: discarded.append(workbook) or discard_workbook(workbook))
+    monkeypatch.setattr(openpyxl.Workbook, "save", lambda self, file_name: 1 / 0)
+    rules = [FormattingRuleFactory.threshold_change_rule(0, "positive", "close", FormatStyle("close", "green"))]
+
+    with pytest.raises(ZeroDivisionError):
+        write_conditional_workbook(str(tmp_path / "report.xlsx"), series, rules)
+
+    [worksheet] = discarded[0].worksheets
+    assert worksheet.closed and not os.path.exists(worksheet._writer.out)
@@ -1,5 +1,6 @@
 import pytest
 from datetime import datetime
+import numpy as np
 from app.data_processor import DataProcessor
 
 @pytest.fixture
@@ -70,4 +71,50 @@ def test_check_cumulative_change(sample_data):
         datetime(2023, 1, 6): True,
         datetime(2023, 1, 7): True
     }
-    assert result == expected
\ No newline at end of file
+    assert result == expected
+
+def reference_consecutive_changes(changes, num_days, direction):
+    result = [False] * len(changes)
+    for i in range(len(changes) - num_days + 1):
+        window = changes[i:i + num_days]
+        if all(change > 0 for change in window) if direction == 'positive' else all(change < 0 for change in window):
+            result[i:i + num_days] = [True] * num_days
+    return result
+
+def reference_cumulative_change(closes, num_days, percent_threshold):
+    result = [False] * len(closes)
+    for i in range(len(closes) - num_days + 1):
+        change = DataProcessor.calculate_percent_change(closes[i + num_days - 1], closes[i])
+        if abs(change) >= abs(percent_threshold):
+            result[i:i + num_days] = [True] * num_days
+    return result
+
+@pytest.mark.parametrize("num_days", [1, 2, 3, 5, 8])
+@pytest.mark.parametrize("direction", ['positive', 'negative'])
+def test_consecutive_change_mask_matches_reference(num_days, direction):
+    rng = np.random.default_rng(num_days)
+    changes = np.round(rng.normal(0.2, 1, 500), 1)
+
+    result = DataProcessor.consecutive_change_mask(changes, num_days, direction)
+
+    assert result.tolist() == reference_consecutive_changes(changes.tolist(), num_days, direction)
+
+@pytest.mark.parametrize("num_days", [1, 2, 5, 20])
+@pytest.mark.parametrize("percent_threshold", [0, 3, -6])
+def test_cumulative_change_mask_matches_reference(num_days, percent_threshold):
+    rng = np.random.default_rng(num_days)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.02, 500))
+    closes[10] = 0
+
+    result = DataProcessor.cumulative_change_mask(closes, num_days, percent_threshold)
+
+    assert result.tolist() == reference_cumulative_change(closes.tolist(), num_days, percent_threshold)
+
+def test_masks_handle_short_series():
+    assert DataProcessor.consecutive_change_mask(np.array([1.0, 2.0]), 3, 'positive').tolist() == [False, False]
+    assert DataProcessor.cumulative_change_mask(np.array([100.0, 110.0]), 3, 5).tolist() == [False, False]
+    assert DataProcessor.consecutive_change_mask(np.array([]), 2, 'negative').tolist() == []
+
+def test_consecutive_change_mask_rejects_unknown_direction():
+    with pytest.raises(ValueError):
+        DataProcessor.consecutive_change_mask(np.array([1.0]), 1, 'sideways')
@@ -0,0 +1,116 @@
+import pytest
+import numpy as np
+import openpyxl
+from datetime import date
+from app import excel_writer
+from app.excel_writer import display_width, render_sheet, write_workbook
+from app.formatting import FormatStyle, FormattingRuleFactory
+from app.price_series import PriceSeries
+
+@pytest.fixture
+def series():
+    closes = np.array([100, 102, 105, 103, 106, 110, 113], dtype=float)
+    dates = np.datetime64('2023-01-02') + np.arange(closes.size)
+    return PriceSeries(dates, closes - 1, closes + 1, closes - 2, closes, "IBM")
+
+@pytest.fixture
+def rules():
+    return [
+        FormattingRuleFactory.cumulative_change_rule(3, 5, ["open", "close"], FormatStyle(["open", "close"], "yellow", bold=True)),
+        FormattingRuleFactory.consecutive_change_rule(2, "positive", "close", FormatStyle("close", "lightblue", bold=True)),
+        FormattingRuleFactory.threshold_change_rule(2.9, "positive", "percent_change", FormatStyle("percent_change", "green")),
+    ]
+
+def test_render_sheet_applies_later_rules_last(series, rules):
+    sheet = render_sheet(series, rules)
+
+    assert sheet.styles == [("yellow", "black", True), ("lightblue", "black", True), ("green", "black", False)]
+    assert sheet.cell_styles[:, 0].tolist() == [0] * 7
+    assert sheet.cell_styles[:, 3].tolist() == [0, 1, 1, 0, 1, 1, 1]
+    assert sheet.cell_styles[:, 4].tolist() == [-1, -1, 2, -1, 2, 2, -1]
+    assert sheet.cell_styles[:, 1].tolist() == [-1] * 7
+
+def test_write_workbook_streams_values_and_styles(tmp_path, series, rules):
+    file_name = str(tmp_path / "report.xlsx")
+
+    write_workbook(file_name, [render_sheet(series, rules)])
+
+    workbook = openpyxl.load_workbook(file_name)
+    worksheet = workbook["Stock Data"]
+    assert [cell.value for cell in worksheet[1]] == [None, "open", "high", "low", "close", "percent_change"]
+    assert worksheet["A2"].value.date() == date(2023, 1, 2)
+    assert worksheet["E3"].value == 102
+    assert worksheet["F2"].value is None
+    assert worksheet["F4"].value == pytest.approx(2.941, rel=1e-3)
+    assert worksheet["E3"].fill.fgColor.rgb == "FFADD8E6"
+    assert worksheet["E3"].font.b
+    assert worksheet["F4"].fill.fgColor.rgb == "FF00FF00"
+    assert worksheet["C2"].fill.fill_type is None
+    assert len(workbook.named_styles) == 4
+
+def test_rows_are_written_in_chunks(tmp_path, series, rules, monkeypatch):
+    whole, chunked = str(tmp_path / "whole.xlsx"), str(tmp_path / "chunked.xlsx")
+    write_workbook(whole, [render_sheet(series, rules)])
+    monkeypatch.setattr(excel_writer, "PROGRESS_ROWS", 3)
+    fractions = []
+
+    write_workbook(chunked, [render_sheet(series, rules)], progress=fractions.append)
+
+    def cells(file_name):
+        return [[(cell.value, cell.fill.fgColor.rgb) for cell in row]
+                for row in openpyxl.load_workbook(file_name)["Stock Data"].iter_rows()]
+    assert cells(chunked) == cells(whole)
+    assert fractions == [0, 3 / 7, 6 / 7, 1]
+
+def test_column_widths_come_from_values(series, rules):
+    sheet = render_sheet(series, rules)
+
+    assert sheet.column_widths() == [12, 12, 12, 12, 12, 16]
+
+def test_display_width():
+    assert display_width(np.array([1.0, 250.0, np.nan])) == 3
+    assert display_width(np.array([-12.0, 3.0])) == 3
+    assert display_width(np.array([1.5])) == 11
+    assert display_width(np.array([np.nan])) == 0
+
+REPORT_PARAMETERS = {
+    "consecutive_change": {"days": 3},
+    "daily_threshold": {"percent": 1.5},
+    "period_change": {"percent": 4, "days": 5},
+}
+
+def highlighted_cells(file_name):
+    worksheet = openpyxl.load_workbook(file_name)["Stock Data"]
+    return [[(cell.value, cell.fill.fill_type and cell.fill.start_color.rgb, cell.font.b) for cell in row]
+            for row in worksheet.iter_rows(max_col=6)]
+
+def test_pandas_writer_matches_streaming_writer(tmp_path):
+    pytest.importorskip("pandas")
+    from app.formatting import RuleContext
+    from app.spreadsheet_manager import SpreadSheetManager
+    from app.synthetic import synthetic_series
+
+    series = synthetic_series(300, seed=8)
+    manager = SpreadSheetManager("key", cache_dir=None)
+    rules = manager.build_formatting_rules(REPORT_PARAMETERS)
+    streamed, framed = str(tmp_path / "streamed.xlsx"), str(tmp_path / "framed.xlsx")
+
+    write_workbook(streamed, [render_sheet(series, rules)])
+    manager.write_with_pandas(framed, series, RuleContext(series), rules)
+
+    assert highlighted_cells(framed) == highlighted_cells(streamed)
+
+def test_reports_do_not_need_pandas(tmp_path, monkeypatch):
+    import sys
+    from app.formatting import RuleContext
+    from app.spreadsheet_manager import SpreadSheetManager
+    from app.synthetic import synthetic_series
+
+    monkeypatch.setitem(sys.modules, "pandas", None)
+    series = synthetic_series(50)
+    manager = SpreadSheetManager("key", cache_dir=None)
+    rules = manager.build_formatting_rules(REPORT_PARAMETERS)
+
+    write_workbook(str(tmp_path / "streamed.xlsx"), [render_sheet(series, rules)])
+    with pytest.raises(ValueError, match="pandas"):
+        manager.write_with_pandas(str(tmp_path / "framed.xlsx"), series, RuleContext(series), rules)
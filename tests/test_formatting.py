@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime, timedelta
-from app.formatting import FormatStyle, FormattingRule, FormattingRuleFactory
+import numpy as np
+from app.formatting import FormatStyle, FormattingRule, FormattingRuleFactory, RuleContext
 
 # Updated test data
 test_data = {
@@ -121,5 +122,61 @@ def test_formatting_rule_with_missing_data():
     assert result[datetime(2023, 1, 2)] == style
     assert result[datetime(2023, 1, 8)] is None
 
+def test_evaluate_returns_mask_aligned_with_sorted_dates():
+    style = FormatStyle(columns="close", background_color="green")
+    rule = FormattingRuleFactory.threshold_change_rule(2.9, "positive", "close", style)
+
+    mask = rule.evaluate(test_data)
+
+    assert mask.tolist() == [False, False, True, False, True, True, False]
+
+def test_legacy_condition_evaluates_through_mask():
+    style = FormatStyle(columns="close", background_color="green")
+    rule = FormattingRule(lambda data, date: data[date]["close"] > 104, style)
+
+    assert rule.evaluate(test_data).tolist() == [False, False, True, False, True, True, True]
+
+def test_factory_rule_condition_still_callable():
+    style = FormatStyle(columns="close", background_color="green")
+    rule = FormattingRuleFactory.consecutive_change_rule(3, "positive", "close", style)
+
+    assert rule.condition(test_data, datetime(2023, 1, 6)) is True
+    assert rule.condition(test_data, datetime(2023, 1, 2)) is False
+
+def test_rules_share_percent_changes_from_context(monkeypatch):
+    from app.data_processor import DataProcessor
+    calls = []
+    original = DataProcessor.daily_percent_change_array
+    monkeypatch.setattr(DataProcessor, "daily_percent_change_array",
+                        staticmethod(lambda closes: calls.append(1) or original(closes)))
+    style = FormatStyle(columns="close", background_color="green")
+    rules = [
+        FormattingRuleFactory.consecutive_change_rule(2, "positive", "close", style),
+        FormattingRuleFactory.threshold_change_rule(2, "positive", "close", style),
+        FormattingRuleFactory.threshold_change_rule(2, "negative", "close", style),
+    ]
+
+    context = RuleContext(test_data)
+    for rule in rules:
+        rule.apply(test_data, context)
+
+    assert len(calls) == 1
+
+def test_factory_rules_match_per_date_conditions():
+    from app.data_processor import DataProcessor
+    rng = np.random.default_rng(1)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.02, 200))
+    data = {datetime(2020, 1, 1) + timedelta(days=i): {"close": close} for i, close in enumerate(closes)}
+    percent_changes = DataProcessor.calculate_daily_percent_changes(data)
+    style = FormatStyle(columns="close", background_color="green")
+
+    rule = FormattingRuleFactory.consecutive_change_rule(3, "negative", "close", style)
+    expected = DataProcessor.check_consecutive_changes(percent_changes, 3, "negative")
+    assert {date: style is not None for date, style in rule.apply(data).items()} == {date: expected.get(date, False) for date in data}
+
+    rule = FormattingRuleFactory.cumulative_change_rule(4, 3, "close", style)
+    expected = DataProcessor.check_cumulative_change(data, 4, 3)
+    assert {date: style is not None for date, style in rule.apply(data).items()} == expected
+
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
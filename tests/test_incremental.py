@@ -0,0 +1,112 @@
+import pytest
+import numpy as np
+import openpyxl
+from app.data_processor import DataProcessor
+from app.excel_writer import render_sheet, write_workbook
+from app.formatting import FormatStyle, FormattingRule, RuleContext
+from app.incremental import Detector, IncrementalEvaluator, StreakDetector, update_workbook
+from app.price_series import PriceSeries
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+RULE_PARAMETERS = {
+    "consecutive_change": {"days": 3},
+    "daily_threshold": {"percent": 1.5},
+    "period_change": {"percent": 4, "days": 5},
+}
+
+def full_masks(closes, rules):
+    dates = np.datetime64('2000-01-03') + np.arange(len(closes))
+    context = RuleContext(PriceSeries(dates, closes, closes, closes, closes))
+    return [rule.evaluate(context) for rule in rules]
+
+@pytest.mark.parametrize("split", [0, 1, 7, 150, 299])
+def test_appending_matches_full_evaluation(split):
+    closes = synthetic_series(300, seed=5).close
+    closes[100:110] = closes[99]  # flat days break streaks and never pass a threshold
+    closes[200] = 0.0
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+
+    evaluator = IncrementalEvaluator(rules)
+    evaluator.prime(closes[max(split - evaluator.history, 0):split], split)
+    update = evaluator.append(closes[split:])
+
+    expected_changes = DataProcessor.daily_percent_change_array(closes)[split:]
+    if split > 0:
+        np.testing.assert_allclose(update.percent_changes, expected_changes)
+    for before, after, rows in zip(full_masks(closes[:split], rules), full_masks(closes, rules), update.highlights):
+        newly = np.zeros(len(closes), dtype=bool)
+        newly[rows] = True
+        assert len(set(rows.tolist())) == len(rows)
+        assert not np.any(newly[:split] & before)
+        assert np.array_equal(after, np.concatenate((before, np.zeros(len(closes) - split, dtype=bool))) | newly)
+
+def test_streak_highlights_whole_run_once_it_is_long_enough():
+    detector = StreakDetector(3, "positive")
+
+    assert [list(detector.push(0, change)) for change in [1, 2, -1, 1, 1, 1, 1]] == \
+        [[], [], [], [], [], [3, 4, 5], [6]]
+
+def test_hand_written_rules_are_rejected():
+    rule = FormattingRule(lambda data, day: True, FormatStyle("close", "red"))
+
+    with pytest.raises(ValueError):
+        IncrementalEvaluator([rule])
+
+def cell_fills(file_name):
+    worksheet = openpyxl.load_workbook(file_name)["Stock Data"]
+    return [[(cell.value, cell.fill.fill_type and cell.fill.start_color.rgb) for cell in row]
+            for row in worksheet.iter_rows(max_col=6)]
+
+def test_detectors_need_push():
+    with pytest.raises(TypeError):
+        type("Idle", (Detector,), {})()
+
+def test_update_workbook_matches_regenerated_report(tmp_path):
+    series = synthetic_series(400, seed=11)
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    updated, regenerated = str(tmp_path / "updated.xlsx"), str(tmp_path / "regenerated.xlsx")
+    write_workbook(updated, [render_sheet(series[:390], rules)])
+    write_workbook(regenerated, [render_sheet(series, rules)])
+
+    update = update_workbook(updated, series, rules)
+
+    assert update.rows_appended == 10
+    assert cell_fills(updated) == cell_fills(regenerated)
+    padding = np.zeros(10, dtype=bool)
+    newly = np.any([rule.evaluate(series) & ~np.concatenate((rule.evaluate(series[:390]), padding))
+                    for rule in rules], axis=0)
+    assert update.highlighted_dates == series.dates[newly].astype(object).tolist()
+
+def test_update_workbook_without_new_days_changes_nothing(tmp_path):
+    series = synthetic_series(50)
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    file_name = str(tmp_path / "report.xlsx")
+    write_workbook(file_name, [render_sheet(series, rules)])
+
+    update = update_workbook(file_name, series, rules)
+
+    assert update.rows_appended == 0
+    assert update.highlighted_dates == []
+
+def test_reports_with_custom_rules_are_not_updated(tmp_path):
+    manager = SpreadSheetManager("key", cache_dir=None)
+    user_input = dict(RULE_PARAMETERS, symbol="IBM", file_path=str(tmp_path / "report.xlsx"),
+                      custom_rules=[{"expression": "streak(3, up)", "columns": ["close"], "background_color": "green"}])
+
+    # Rejected before anything is fetched
+    with pytest.raises(ValueError, match="custom rules"):
+        manager.update_excel_file(user_input)
+
+def test_update_workbook_primes_over_a_missing_close(tmp_path):
+    series = synthetic_series(120, seed=4, volatility=0.03)
+    series.close[105] = np.nan
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    updated, regenerated = str(tmp_path / "updated.xlsx"), str(tmp_path / "regenerated.xlsx")
+    write_workbook(updated, [render_sheet(series[:110], rules)])
+    write_workbook(regenerated, [render_sheet(series, rules)])
+
+    update = update_workbook(updated, series, rules)
+
+    assert update.rows_appended == 10
+    assert cell_fills(updated) == cell_fills(regenerated)
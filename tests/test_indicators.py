@@ -0,0 +1,134 @@
+import pytest
+import numpy as np
+from app.formatting import FormatStyle, RuleContext
+from app.incremental import IncrementalEvaluator
+from app.indicators import (CrossoverSignal, IndicatorRuleFactory, RunningExtreme, RunningMean, RunningRSI,
+                            RunningVariance, Signal, bollinger_bands, breakouts, crossovers, ema, exponential_smoothing, rolling_extreme,
+                            rolling_std, rsi, sma)
+from app.synthetic import synthetic_series
+
+@pytest.fixture
+def closes():
+    return synthetic_series(3000, seed=5).close
+
+def windows(values, window):
+    return [values[i - window + 1:i + 1] for i in range(window - 1, values.size)]
+
+def test_rolling_statistics_match_direct_computation(closes):
+    for window in (1, 5, 20):
+        assert np.isnan(sma(closes, window)[:window - 1]).all()
+        assert np.allclose(sma(closes, window)[window - 1:], [w.mean() for w in windows(closes, window)])
+        assert np.allclose(rolling_std(closes, window)[window - 1:], [w.std() for w in windows(closes, window)])
+        assert np.array_equal(rolling_extreme(closes, window)[window - 1:], [w.max() for w in windows(closes, window)])
+        assert np.array_equal(rolling_extreme(closes, window, largest=False)[window - 1:],
+                              [w.min() for w in windows(closes, window)])
+    assert np.isnan(sma(closes[:3], 5)).all()
+
+@pytest.mark.parametrize("span", [1, 2, 12, 500])
+def test_ema_matches_the_recurrence(closes, span):
+    alpha = 2 / (span + 1)
+    expected = [closes[0]]
+    for close in closes[1:]:
+        expected.append(expected[-1] + alpha * (close - expected[-1]))
+
+    assert np.allclose(ema(closes, span), expected, rtol=1e-10)
+    assert np.allclose(exponential_smoothing(np.full(100000, 7.0), alpha), 7.0)
+
+def test_rsi_matches_wilders_definition(closes):
+    period = 14
+    changes = np.diff(closes)
+    gain, loss = np.maximum(changes[:period], 0).mean(), np.maximum(-changes[:period], 0).mean()
+    expected = [100 - 100 / (1 + gain / loss)]
+    for change in changes[period:]:
+        gain = (gain * (period - 1) + max(change, 0)) / period
+        loss = (loss * (period - 1) + max(-change, 0)) / period
+        expected.append(100 - 100 / (1 + gain / loss))
+
+    result = rsi(closes, period)
+
+    assert np.isnan(result[:period]).all()
+    assert np.allclose(result[period:], expected)
+    assert rsi(np.arange(20.0), 5)[-1] == 100
+    assert rsi(np.full(20, 3.0), 5)[-1] == 50
+
+@pytest.mark.parametrize("seed", [244, 1, 2, 3])
+def test_batch_and_incremental_ema_crossovers_agree(seed):
+    series = synthetic_series(500, seed=seed)
+    rule = IndicatorRuleFactory.moving_average_crossover_rule(5, 20, "positive", "close", STYLE, average="ema")
+    signal = CrossoverSignal(5, 20, "positive", average="ema")
+
+    pushed = [signal.push(close, 0.0) for close in series.close.tolist()]
+
+    assert ema(series.close, 5)[0] == ema(series.close, 20)[0] == series.close[0]
+    assert rule.evaluate(RuleContext(series)).tolist() == pushed
+
+def test_crossovers_and_breakouts():
+    fast = np.array([1, 2, 3, 2, 1, 2, np.nan, 3])
+    slow = np.full(8, 2.0)
+    closes = np.array([5, 4, 6, 6, 3, 2, 7])
+
+    assert crossovers(fast, slow, "positive").tolist() == [False, False, True, False, False, False, False, False]
+    assert crossovers(fast, slow, "negative").tolist() == [False, False, False, False, True, False, False, False]
+    assert breakouts(closes, 2, "positive").tolist() == [False, False, True, False, False, False, True]
+    assert breakouts(closes, 2, "negative").tolist() == [False, False, False, False, True, True, False]
+
+def test_running_forms_match_batch_forms(closes):
+    mean, variance = RunningMean(20), RunningVariance(20)
+    highest, relative = RunningExtreme(20), RunningRSI(14)
+
+    pushed = np.array([[mean.push(c), variance.push(c), highest.push(c), relative.push(c)] for c in closes.tolist()])
+
+    assert np.allclose(pushed[:, 0], sma(closes, 20), equal_nan=True)
+    assert np.allclose(np.sqrt(pushed[:, 1]), rolling_std(closes, 20), equal_nan=True)
+    assert np.array_equal(pushed[:, 2], rolling_extreme(closes, 20), equal_nan=True)
+    assert np.allclose(pushed[:, 3], rsi(closes, 14), equal_nan=True)
+
+def test_signals_need_push():
+    class Silent(Signal):
+        history = 5
+
+    with pytest.raises(TypeError):
+        Silent()
+
+STYLE = FormatStyle("close", "green")
+
+RULES = [
+    IndicatorRuleFactory.moving_average_crossover_rule(10, 30, "positive", "close", STYLE),
+    IndicatorRuleFactory.moving_average_crossover_rule(5, 20, "negative", "close", STYLE, average="ema"),
+    IndicatorRuleFactory.volatility_rule(10, 1.2, "close", STYLE),
+    IndicatorRuleFactory.rsi_rule(14, 65, "positive", "close", STYLE),
+    IndicatorRuleFactory.rsi_rule(14, 35, "negative", "close", STYLE),
+    IndicatorRuleFactory.bollinger_rule(20, 2, "positive", "close", STYLE),
+    IndicatorRuleFactory.bollinger_rule(20, 1.5, "negative", "close", STYLE),
+    IndicatorRuleFactory.breakout_rule(20, "positive", "close", STYLE),
+    IndicatorRuleFactory.breakout_rule(20, "negative", "close", STYLE),
+]
+
+def test_rules_match_their_batch_indicators(closes):
+    context = RuleContext(synthetic_series(3000, seed=5))
+    middle, upper, lower = bollinger_bands(closes, 20, 2)
+
+    masks = [rule.evaluate(context) for rule in RULES]
+
+    assert np.array_equal(masks[0], crossovers(sma(closes, 10), sma(closes, 30), "positive"))
+    assert np.array_equal(masks[3], rsi(closes, 14) >= 65)
+    assert np.array_equal(masks[5], closes > upper)
+    assert np.array_equal(masks[7], breakouts(closes, 20, "positive"))
+    assert all(mask.any() and not mask.all() for mask in masks)
+
+def test_incremental_evaluation_matches_batch(closes):
+    context = RuleContext(synthetic_series(3000, seed=5))
+    expected = [np.flatnonzero(rule.evaluate(context)) for rule in RULES]
+
+    evaluator = IncrementalEvaluator(RULES)
+    update = evaluator.append(closes)
+
+    for rows, expected_rows in zip(update.highlights, expected):
+        assert np.array_equal(rows, expected_rows)
+
+    # Rebuilt from the tail only, the smoothed indicators converge to the same signals
+    evaluator = IncrementalEvaluator(RULES)
+    evaluator.prime(closes[2000 - evaluator.history:2000], 2000)
+    update = evaluator.append(closes[2000:])
+    for rows, expected_rows in zip(update.highlights, expected):
+        assert np.array_equal(rows, expected_rows[expected_rows >= 2000])
@@ -0,0 +1,84 @@
+import json
+import pstats
+import numpy as np
+from datetime import date
+from app import instrumentation
+from app.instrumentation import CPROFILE_ENV, MEMORY_ENV, NULL_SPAN, PROFILE_ENV, profiling, profiling_from_env, span
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+class SeriesFetcher:
+    rate_limiter = None
+
+    def fetch_daily_price_series(self, stock_symbol, date_start, date_end):
+        return synthetic_series(500)
+
+def stats_by_name(recorder):
+    return {stats["name"]: stats for stats in recorder.summary()["spans"]}
+
+def test_span_is_a_no_op_when_not_profiling():
+    assert instrumentation.active_recorder() is None
+    with span("anything") as record:
+        record.add(rows=10)
+    assert record is NULL_SPAN
+
+def test_spans_aggregate_and_track_peak_memory():
+    with profiling(trace_memory=True) as recorder:
+        with span("outer"):
+            for _ in range(2):
+                with span("inner") as record:
+                    block = np.ones(1 << 20)
+                    record.add(rows=3, bytes=block.nbytes)
+                    del block
+
+    stats = stats_by_name(recorder)
+    assert stats["inner"]["calls"] == 2
+    assert stats["inner"]["rows"] == 6
+    assert stats["inner"]["bytes"] == 2 * 8 << 20
+    assert stats["inner"]["peak_bytes"] >= 8 << 20
+    assert stats["outer"]["peak_bytes"] >= stats["inner"]["peak_bytes"]
+    assert stats["outer"]["seconds"] >= stats["inner"]["seconds"]
+    assert instrumentation.active_recorder() is None
+
+def test_create_excel_file_records_each_stage(tmp_path):
+    manager = SpreadSheetManager("key", cache_dir=None)
+    manager.stock_data_fetcher = SeriesFetcher()
+    user_input = {
+        "symbol": "SYN",
+        "start_date": date(1900, 1, 1),
+        "end_date": date(1902, 1, 1),
+        "consecutive_change": {"days": 3},
+        "daily_threshold": {"percent": 2},
+        "period_change": {"percent": 5, "days": 5},
+        "file_path": str(tmp_path / "report.xlsx"),
+    }
+
+    with profiling() as recorder:
+        manager.create_excel_file(user_input)
+
+    stats = stats_by_name(recorder)
+    assert {"report", "fetch", "process.percent_changes", "rules.threshold_change", "write.render",
+            "write.rows", "write.save"} <= set(stats)
+    assert stats["fetch"]["rows"] == 500
+    assert stats["write.save"]["bytes"] > 0
+    assert stats["report"]["peak_bytes"] == 0
+    assert "write.rows=" in recorder.log_line()
+
+def test_profiling_from_env_writes_json_and_cprofile(tmp_path, capsys):
+    summary_path, dump_path = tmp_path / "summary.json", tmp_path / "run.prof"
+    environ = {PROFILE_ENV: str(summary_path), CPROFILE_ENV: str(dump_path), MEMORY_ENV: "1"}
+
+    with profiling_from_env(environ) as recorder:
+        with span("stage"):
+            sum(range(1000))
+
+    assert recorder is not None
+    assert [stats["name"] for stats in json.loads(summary_path.read_text())["spans"]] == ["stage"]
+    assert recorder.trace_memory
+    assert pstats.Stats(str(dump_path)).total_calls > 0
+    assert capsys.readouterr().err.startswith("profile ")
+
+def test_profiling_from_env_is_off_by_default():
+    with profiling_from_env({}) as recorder:
+        assert recorder is None
+        assert instrumentation.active_recorder() is None
@@ -0,0 +1,131 @@
+import pytest
+import numpy as np
+from datetime import date, timedelta
+from app.data_processor import DataProcessor
+from app.formatting import RuleContext
+from app.memo import MemoCache, fingerprint
+from app.price_cache import PriceCache
+from app.price_series import PriceSeries
+from app.spreadsheet_manager import SpreadSheetManager
+from app.stock_data_fetcher import StockDataFetcher
+from app.synthetic import synthetic_series
+
+def test_lru_evicts_least_recently_used_by_count_and_bytes():
+    memo = MemoCache(max_entries=2)
+    memo.put("a", 1)
+    memo.put("b", 2)
+    memo.get("a")
+    memo.put("c", 3)
+
+    assert "a" in memo and "c" in memo and "b" not in memo
+    assert memo.stats.evictions == 1
+
+    memo = MemoCache(max_bytes=1000)
+    memo.put("small", np.zeros(50))
+    memo.put("large", np.zeros(100))
+
+    assert "small" not in memo and "large" in memo
+    assert memo.nbytes == 800
+
+def test_get_or_compute_caches_read_only_values():
+    memo = MemoCache()
+    calls = []
+
+    first = memo.get_or_compute("key", lambda: calls.append(1) or np.arange(3))
+    second = memo.get_or_compute("key", lambda: calls.append(1) or np.arange(3))
+
+    assert first is second
+    assert calls == [1]
+    assert memo.stats.hits == 1 and memo.stats.misses == 1
+    with pytest.raises(ValueError):
+        first[0] = 5
+
+def test_put_leaves_the_callers_array_writable():
+    memo = MemoCache()
+    values = np.arange(3)
+
+    cached = memo.put("key", values)
+    values[0] = 5
+
+    assert values.flags.writeable and not cached.flags.writeable
+    assert memo.get("key") is cached
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    MemoCache(disk_dir=str(tmp_path)).put(("abc", "mask"), np.array([True, False]))
+    memo = MemoCache(disk_dir=str(tmp_path))
+
+    value = memo.get_or_compute(("abc", "mask"), lambda: pytest.fail("recomputed"))
+
+    assert value.tolist() == [True, False]
+    assert memo.stats.disk_hits == 1
+    assert memo.get(("abc", "other")) is None
+
+def test_disk_tier_is_pruned(tmp_path):
+    memo = MemoCache(disk_dir=str(tmp_path), disk_bytes=3000)
+    for i in range(5):
+        memo.put(i, np.zeros(100))
+
+    assert sum(f.stat().st_size for f in tmp_path.iterdir()) <= 3000
+    assert memo.get(4) is not None
+
+def test_disk_usage_counts_files_once(tmp_path):
+    memo = MemoCache(disk_dir=str(tmp_path))
+    for _ in range(3):
+        memo.put("same", np.zeros(100))
+    memo.put("other", np.zeros(10))
+
+    assert memo._disk_used == sum(f.stat().st_size for f in tmp_path.iterdir())
+
+def test_fingerprint_follows_content():
+    closes = np.arange(10, dtype=float)
+
+    assert fingerprint(closes) == fingerprint(closes.copy())
+    assert fingerprint(closes) != fingerprint(closes[:-1])
+    revised = closes.copy()
+    revised[3] += 0.01
+    assert fingerprint(closes) != fingerprint(revised)
+    assert fingerprint(closes[::2]) == fingerprint(closes[::2].copy())
+
+def test_tweaked_parameters_reuse_derived_values(monkeypatch):
+    calls = []
+    percent_changes = DataProcessor.daily_percent_change_array
+    monkeypatch.setattr(DataProcessor, "daily_percent_change_array",
+                        staticmethod(lambda closes: calls.append(1) or percent_changes(closes)))
+    series = synthetic_series(500, seed=2)
+    memo = MemoCache()
+    inputs = {"consecutive_change": {"days": 3}, "daily_threshold": {"percent": 1.5},
+              "period_change": {"percent": 4, "days": 5}}
+
+    first = [rule.evaluate(RuleContext(series, memo=memo))
+             for rule in SpreadSheetManager.build_formatting_rules(inputs)]
+    entries = len(memo)
+    inputs["daily_threshold"] = {"percent": 2.0}
+    second = [rule.evaluate(RuleContext(series, memo=memo))
+              for rule in SpreadSheetManager.build_formatting_rules(inputs)]
+
+    assert calls == [1]
+    assert all(a is b for a, b in zip(first[:3], second[:3]))
+    assert len(memo) == entries + 2
+    expected = DataProcessor.threshold_change_mask(percent_changes(series.close), 2.0, "positive")
+    assert np.array_equal(second[3], expected)
+
+    changed = PriceSeries(series.dates, series.open, series.high, series.low, series.close * 1.01)
+    RuleContext(changed, memo=memo).percent_changes
+    assert calls == [1, 1]
+
+def test_fetcher_keeps_loaded_entries_in_memory(tmp_path, monkeypatch):
+    today = date.today()
+    cache = PriceCache(str(tmp_path))
+    dates = np.datetime64(today - timedelta(days=99), 'D') + np.arange(100)
+    closes = np.linspace(100, 120, 100)
+    cache.save("IBM", PriceSeries(dates, closes, closes, closes, closes, "IBM"), today)
+    fetcher = StockDataFetcher("key", cache, memo=MemoCache())
+    loads = []
+    load = cache.load
+    monkeypatch.setattr(cache, "load", lambda symbol: loads.append(symbol) or load(symbol))
+
+    first = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=30), today)
+    second = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=10), today)
+
+    assert loads == ["IBM"]
+    assert len(first) == 31 and len(second) == 11
@@ -0,0 +1,93 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+from app.batch_fetcher import BatchFetcher, RateLimiter
+from app.mock_server import MockAlphaVantage, MockServer, MockSettings, synthetic_payload
+from app.price_cache import PriceCache
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError
+
+START, END = date(2000, 1, 1), date(2100, 1, 1)
+
+def test_json_and_csv_responses_parse_to_the_same_series():
+    with MockServer(MockSettings(rows=300)) as server:
+        as_json = StockDataFetcher("key", base_url=server.url).fetch_daily_price_series("IBM", START, END)
+        as_csv = StockDataFetcher("key", base_url=server.url, datatype="csv").fetch_daily_price_series("IBM", START, END)
+
+    assert len(as_json) == 300
+    assert as_json.symbol == "IBM"
+    assert np.array_equal(as_json.dates, as_csv.dates)
+    assert np.array_equal(as_json.close, as_csv.close)
+    assert as_json.dates[-1] == np.busday_offset(np.datetime64(date.today(), 'D'), 0, roll='backward')
+
+def test_base_url_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("ALPHAVANTAGE_BASE_URL", "http://127.0.0.1:1/query")
+
+    assert StockDataFetcher("key").base_url == "http://127.0.0.1:1/query"
+    assert StockDataFetcher("key", base_url="http://other/query").base_url == "http://other/query"
+
+def test_injected_throttling_and_errors():
+    with MockServer(MockSettings(rows=10, throttle_rate=1.0)) as server:
+        with pytest.raises(ThrottledError):
+            StockDataFetcher("key", base_url=server.url).fetch_daily_price_series("IBM", START, END)
+    with MockServer(MockSettings(rows=10, error_rate=1.0)) as server:
+        assert StockDataFetcher("key", base_url=server.url).fetch_daily_price_series("IBM", START, END) is None
+        assert server.stats.errors == 1
+
+def test_per_minute_limit_throttles_until_the_window_passes():
+    clock = [0.0]
+    api = MockAlphaVantage(MockSettings(rows=10, per_minute=2), clock=lambda: clock[0])
+    query = {"function": "TIME_SERIES_DAILY", "symbol": "IBM"}
+
+    answers = [json.loads(api.respond(query)[2]) for _ in range(3)]
+    clock[0] = 61.0
+    later = json.loads(api.respond(query)[2])
+
+    assert ["Note" in answer for answer in answers] == [False, False, True]
+    assert "Time Series (Daily)" in later
+    assert api.stats.throttled == 1
+
+def test_body_cache_is_bounded():
+    api = MockAlphaVantage(MockSettings(rows=10, cached_bodies=2))
+    for symbol in ("IBM", "MSFT", "IBM", "AAPL"):
+        api.respond({"function": "TIME_SERIES_DAILY", "symbol": symbol})
+
+    assert [key[0] for key in api.bodies] == ["IBM", "AAPL"]
+
+def test_replay_serves_recorded_responses(tmp_path):
+    (tmp_path / "IBM.json").write_text(json.dumps(synthetic_payload("IBM", 150, today=date(2024, 5, 10))))
+
+    with MockServer(MockSettings(replay_dir=str(tmp_path))) as server:
+        fetcher = StockDataFetcher("key", base_url=server.url)
+        ibm = fetcher.request_time_series("IBM", "compact")
+        missing = fetcher.request_time_series("MSFT")
+
+    assert len(ibm) == 100
+    assert ibm.dates[-1] == np.datetime64("2024-05-10")
+    assert missing is None
+
+def test_batch_fetch_under_injected_faults():
+    settings = MockSettings(rows=200, throttle_rate=0.2, error_rate=0.1, latency=0.001, seed=3)
+    symbols = [f"S{i}" for i in range(30)]
+
+    with MockServer(settings) as server:
+        fetcher = StockDataFetcher("key", base_url=server.url)
+        batch = BatchFetcher(fetcher, RateLimiter(per_minute=100_000, per_day=100_000), max_workers=8,
+                             max_retries=8, sleep=lambda seconds: None)
+        results = list(batch.fetch_many(symbols, START, END))
+
+    # Throttled symbols are retried; server errors fail the symbol
+    failed = [result for result in results if not result.ok]
+    assert server.stats.throttled > 0
+    assert len(failed) == server.stats.errors
+    assert server.stats.served == len(results) - len(failed)
+
+def test_cache_answers_repeat_fetches_without_requests(tmp_path):
+    with MockServer(MockSettings(rows=200)) as server:
+        fetcher = StockDataFetcher("key", PriceCache(str(tmp_path)), base_url=server.url)
+        first = fetcher.fetch_daily_price_series("IBM", START, END)
+        second = fetcher.fetch_daily_price_series("IBM", START, END)
+
+    assert server.stats.requests == 1
+    assert np.array_equal(first.close, second.close)
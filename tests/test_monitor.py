@@ -0,0 +1,204 @@
+import asyncio
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+from app.data_processor import DataProcessor
+from app.batch_fetcher import RateLimiter
+from app.formatting import FormatStyle
+from app.indicators import IndicatorRuleFactory
+from app.mock_server import MockServer, MockSettings
+from app.monitor import (AlertSink, FetcherQuoteSource, JsonLogSink, QuoteSource, SQLiteSink, SymbolWatch,
+                         WatchlistMonitor, WebhookSink)
+from app.price_series import PriceSeries
+from app.stock_data_fetcher import StockDataFetcher
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+RULE_PARAMETERS = {
+    "consecutive_change": {"days": 3},
+    "daily_threshold": {"percent": 1.5},
+    "period_change": {"percent": 4, "days": 5},
+}
+
+class FakeQuoteSource(QuoteSource):
+    """Serves a window of each symbol's history that ends at the current day, which tests advance."""
+    def __init__(self, histories, day, window=100):
+        self.histories = histories
+        self.day = day
+        self.window = window
+        self.requests = []
+
+    async def recent_bars(self, symbol, bars=100):
+        self.requests.append(symbol)
+        if symbol not in self.histories:
+            return None
+        return self.histories[symbol][max(self.day - self.window, 0):self.day]
+
+def expected_alerts(series, previous, day, rules):
+    """(symbol, day, kind, direction) for the rows previous..day - 1 that the rules highlight in the series up to day."""
+    prefix = series[:day]
+    days = prefix.date_list()
+    return {(series.symbol, days[row], rule.kind, rule.params.get("direction"))
+            for rule in rules for row in np.flatnonzero(rule.evaluate(prefix)[previous:]) + previous}
+
+def alert_keys(alerts):
+    return {(alert.symbol, alert.day, alert.kind, alert.params.get("direction")) for alert in alerts}
+
+def test_polls_alert_on_exactly_the_bars_the_rules_highlight():
+    histories = {symbol: synthetic_series(400, symbol=symbol, seed=seed)
+                 for seed, symbol in enumerate(["IBM", "MSFT", "AAPL"])}
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    source = FakeQuoteSource(histories, day=150)
+    monitor = WatchlistMonitor(histories, rules, source)
+
+    for day in [150, 151, 152, 155, 160, 161, 300]:
+        source.day = day
+        cycle = asyncio.run(monitor.poll_once())
+
+        # Several days may arrive at once; a later one can highlight the earlier ones
+        assert not cycle.errors
+        previous = {150: 149, 155: 152, 160: 155, 300: 299}.get(day, day - 1)
+        # At 300 the 100-day window no longer reaches day 161: the state is rebuilt from it and only
+        # the newest bar is checked
+        expected = set().union(*(expected_alerts(series, previous, day, rules) for series in histories.values()))
+        assert alert_keys(cycle.alerts) == expected
+
+def test_alerts_use_the_data_processor_checks():
+    closes = np.array([100, 101, 102, 103, 103, 100, 96.0])
+    dates = np.datetime64("2024-01-01") + np.arange(closes.size)
+    series = PriceSeries(dates, closes, closes, closes, closes, "X")
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    source = FakeQuoteSource({"X": series}, day=4)
+    monitor = WatchlistMonitor(["X"], rules, source)
+
+    first = asyncio.run(monitor.poll_once())
+    source.day = 7
+    later = asyncio.run(monitor.poll_once())
+
+    percent_changes = DataProcessor.daily_percent_change_array(closes)
+    assert DataProcessor.consecutive_change_mask(percent_changes, 3, "positive")[3]
+    assert {(alert.kind, alert.params.get("direction")) for alert in first.alerts} == {("consecutive_change", "positive")}
+    # The five-day fall to 96 highlights its whole window, including the new bars before the last
+    assert {(alert.day.isoformat(), alert.kind, alert.params.get("direction")) for alert in later.alerts} == {
+        ("2024-01-06", "threshold_change", "negative"),
+        ("2024-01-07", "threshold_change", "negative"),
+        ("2024-01-05", "cumulative_change", None),
+        ("2024-01-06", "cumulative_change", None),
+        ("2024-01-07", "cumulative_change", None),
+    }
+
+def test_sinks_record_alerts_once(tmp_path):
+    histories = {"IBM": synthetic_series(200, symbol="IBM", seed=1, volatility=0.05)}
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    posted = []
+    log, database = tmp_path / "alerts.jsonl", tmp_path / "alerts.db"
+    sinks = [JsonLogSink(str(log)), SQLiteSink(str(database)), WebhookSink("http://hooks.local/alerts",
+                                                                           post=lambda url, payload: posted.append(payload))]
+    source = FakeQuoteSource(histories, day=100)
+    cycles = []
+
+    async def run():
+        monitor = WatchlistMonitor(["IBM", "MISSING"], rules, source, sinks, interval=0)
+        for day in range(100, 200, 10):
+            source.day = day
+            cycles.append(await monitor.poll_once())
+        for sink in sinks:
+            sink.close()
+
+    asyncio.run(run())
+
+    alerts = [alert for cycle in cycles for alert in cycle.alerts]
+    assert alerts
+    assert all(set(cycle.errors) == {"MISSING"} for cycle in cycles)
+    logged = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [entry["day"] for entry in logged] == [alert.day.isoformat() for alert in alerts]
+    assert sum(len(payload["alerts"]) for payload in posted) == len(alerts)
+    with sqlite3.connect(str(database)) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == len(alerts)
+
+    # A second monitor re-alerting on the same bar leaves the table unchanged
+    sink = SQLiteSink(str(database))
+    sink.emit(alerts[-1:])
+    sink.close()
+    with sqlite3.connect(str(database)) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == len(alerts)
+
+def test_run_stops_after_cycles_and_reports_each():
+    histories = {"IBM": synthetic_series(120, symbol="IBM")}
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    source = FakeQuoteSource(histories, day=110)
+    seen = []
+
+    asyncio.run(WatchlistMonitor(["IBM"], rules, source, interval=0).run(cycles=3, on_cycle=seen.append))
+
+    assert len(seen) == 3
+    assert source.requests == ["IBM"] * 3
+
+def test_fetcher_source_spaces_requests_to_the_quota():
+    symbols = [f"S{i}" for i in range(20)]
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    now = [0.0]
+
+    async def sleep(seconds):
+        now[0] += seconds
+        await asyncio.sleep(0)
+
+    async def run(url):
+        limiter = RateLimiter(per_minute=10, per_day=1000, clock=lambda: now[0])
+        source = FetcherQuoteSource(StockDataFetcher("key", base_url=url), limiter, sleep=sleep)
+        return await WatchlistMonitor(symbols, rules, source, max_concurrency=8).poll_once()
+
+    with MockServer(MockSettings(rows=300)) as server:
+        cycle = asyncio.run(run(server.url))
+
+    # Ten requests go out at once; the other ten wait for the bucket to refill, one every 6 s
+    assert not cycle.errors
+    assert server.stats.requests == 20
+    assert now[0] == pytest.approx(60.0)
+
+def test_an_update_error_is_recorded_for_its_symbol():
+    histories = {symbol: synthetic_series(200, symbol=symbol, seed=seed, volatility=0.05)
+                 for seed, symbol in enumerate(["IBM", "MSFT"])}
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+    monitor = WatchlistMonitor(histories, rules, FakeQuoteSource(histories, day=150))
+
+    class FailingWatch(SymbolWatch):
+        def update(self, bars, detected_at):
+            raise RuntimeError("bad bars")
+    monitor.watches[0] = FailingWatch("IBM", rules)
+    cycle = asyncio.run(monitor.poll_once())
+
+    assert set(cycle.errors) == {"IBM"}
+    assert {alert.symbol for alert in cycle.alerts} == {"MSFT"}
+
+class RecordingFetcher:
+    """Answers request_time_series with a synthetic history as long as the output size allows."""
+    def __init__(self):
+        self.rate_limiter = "caller's limiter"
+        self.outputsizes = []
+
+    def request_time_series(self, symbol, outputsize="full"):
+        self.outputsizes.append(outputsize)
+        return synthetic_series(100 if outputsize == "compact" else 1000, symbol=symbol)
+
+def test_rules_with_long_history_prime_from_the_full_output():
+    rules = [IndicatorRuleFactory.rsi_rule(14, 70, "positive", "close", FormatStyle("close", "green"))]
+    fetcher = RecordingFetcher()
+    source = FetcherQuoteSource(fetcher, RateLimiter(per_minute=1000, per_day=1000))
+    monitor = WatchlistMonitor(["IBM"], rules, source)
+
+    for _ in range(2):
+        assert not asyncio.run(monitor.poll_once()).errors
+
+    assert monitor.watches[0].evaluator.history > 100
+    assert fetcher.outputsizes == ["full", "compact"]
+    assert fetcher.rate_limiter == "caller's limiter"
+
+def test_interfaces_need_their_methods():
+    class Incomplete(QuoteSource, AlertSink):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
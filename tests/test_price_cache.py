@@ -0,0 +1,171 @@
+import pytest
+import numpy as np
+import requests
+from datetime import date, timedelta
+from app.price_cache import CacheEntry, MemmapPriceCache, PriceCache
+from app.price_series import PriceSeries
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError
+
+def make_series(first_day, num_days, symbol="IBM"):
+    dates = np.datetime64(first_day, 'D') + np.arange(num_days)
+    closes = 100 + np.arange(num_days, dtype=float)
+    return PriceSeries(dates, closes, closes + 1, closes - 1, closes, symbol)
+
+class RecordingFetcher(StockDataFetcher):
+    def __init__(self, cache, history):
+        super().__init__("key", cache)
+        self.history = history
+        self.requests = []
+
+    def request_time_series(self, stock_symbol, outputsize='full'):
+        self.requests.append(outputsize)
+        if self.history is None:
+            return None
+        if outputsize == 'compact':
+            return self.history[-100:]
+        return self.history
+
+def test_save_and_load_round_trip(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    series = make_series(date(2020, 1, 1), 10)
+
+    cache.save("IBM", series, date(2020, 1, 11))
+    entry = cache.load("ibm")
+
+    assert entry.fetched_on == date(2020, 1, 11)
+    assert entry.series.symbol == "IBM"
+    assert entry.series.dates.tolist() == series.dates.tolist()
+    assert entry.series.close.tolist() == series.close.tolist()
+
+def test_load_missing_or_corrupt_returns_none(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    assert cache.load("IBM") is None
+
+    with open(cache.path_for("IBM"), "wb") as file:
+        file.write(b"not an npz file")
+    assert cache.load("IBM") is None
+
+def test_repeat_request_is_served_from_disk(tmp_path):
+    today = date.today()
+    fetcher = RecordingFetcher(PriceCache(str(tmp_path)), make_series(today - timedelta(days=500), 500))
+
+    first = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=30), today)
+    second = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=60), today)
+
+    assert fetcher.requests == ['full']
+    assert len(first) == 30
+    assert len(second) == 60
+
+def test_stale_cache_fetches_only_recent_days(tmp_path):
+    today = date.today()
+    cache = PriceCache(str(tmp_path))
+    cache.save("IBM", make_series(today - timedelta(days=500), 490), today - timedelta(days=10))
+    fetcher = RecordingFetcher(cache, make_series(today - timedelta(days=500), 500))
+
+    series = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=20), today)
+
+    assert fetcher.requests == ['compact']
+    assert series.dates[-1] == np.datetime64(today - timedelta(days=1))
+    assert len(cache.load("IBM").series) == 500
+
+def test_large_gap_refetches_full_history(tmp_path):
+    today = date.today()
+    cache = PriceCache(str(tmp_path))
+    cache.save("IBM", make_series(today - timedelta(days=500), 300), today - timedelta(days=200))
+    fetcher = RecordingFetcher(cache, make_series(today - timedelta(days=500), 500))
+
+    fetcher.fetch_daily_price_series("IBM", today - timedelta(days=20), today)
+
+    assert fetcher.requests == ['full']
+
+def test_failed_refresh_falls_back_to_cache(tmp_path):
+    today = date.today()
+    cache = PriceCache(str(tmp_path))
+    cache.save("IBM", make_series(today - timedelta(days=50), 40), today - timedelta(days=5))
+    fetcher = RecordingFetcher(cache, None)
+
+    series = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=50), today)
+
+    assert len(series) == 40
+
+@pytest.mark.parametrize("error", [ThrottledError("limit"), requests.ConnectionError("down")])
+def test_refresh_error_falls_back_to_cache(tmp_path, error):
+    today = date.today()
+    cache = PriceCache(str(tmp_path))
+    cache.save("IBM", make_series(today - timedelta(days=50), 40), today - timedelta(days=5))
+    fetcher = StockDataFetcher("key", cache)
+
+    def fail(url, params=None, stream=False):
+        raise error
+    fetcher.session.get = fail
+
+    series = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=50), today)
+
+    assert len(series) == 40
+
+def test_merged_with_prefers_newer_rows():
+    older = make_series(date(2020, 1, 1), 5)
+    newer = make_series(date(2020, 1, 4), 4)
+    newer.close[:] = 1
+
+    merged = older.merged_with(newer)
+
+    assert len(merged) == 7
+    assert merged.close.tolist() == [100, 101, 102, 1, 1, 1, 1]
+
+def test_is_fresh():
+    entry = CacheEntry(make_series(date(2020, 1, 1), 5), date(2020, 1, 6))
+
+    assert entry.is_fresh(date(2020, 1, 5), date(2020, 1, 10))
+    assert not entry.is_fresh(date(2020, 1, 9), date(2020, 1, 10))
+    assert entry.is_fresh(date(2020, 1, 9), date(2020, 1, 6))
+
+def is_mapped(array):
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+def test_memmap_cache_round_trip_maps_the_file(tmp_path):
+    cache = MemmapPriceCache(str(tmp_path))
+    series = make_series(date(2020, 1, 1), 1000)
+
+    cache.save("IBM", series, date(2022, 10, 1))
+    entry = cache.load("ibm")
+    window = entry.series.between(date(2020, 3, 1), date(2020, 3, 31))
+
+    assert entry.fetched_on == date(2022, 10, 1)
+    assert entry.series.symbol == "IBM"
+    assert np.array_equal(entry.series.dates, series.dates)
+    assert np.array_equal(entry.series.close, series.close)
+    assert len(window) == 31
+    assert is_mapped(window.close)
+    assert np.shares_memory(window.close, entry.series.close)
+
+def test_memmap_cache_rejects_truncated_or_foreign_files(tmp_path):
+    cache = MemmapPriceCache(str(tmp_path))
+    cache.save("IBM", make_series(date(2020, 1, 1), 10), date(2020, 1, 11))
+    cache.save("EMPTY", PriceSeries.empty("EMPTY"), date(2020, 1, 11))
+    assert len(cache.load("EMPTY").series) == 0
+
+    path = cache.path_for("IBM")
+    with open(path, "r+b") as file:
+        file.truncate(100)
+    assert cache.load("IBM") is None
+    with open(path, "wb") as file:
+        file.write(b"not a price file" * 10)
+    assert cache.load("IBM") is None
+    assert cache.load("MISSING") is None
+
+def test_fetcher_tops_up_a_memmap_cache(tmp_path):
+    today = date.today()
+    cache = MemmapPriceCache(str(tmp_path))
+    cache.save("IBM", make_series(today - timedelta(days=500), 490), today - timedelta(days=10))
+    fetcher = RecordingFetcher(cache, make_series(today - timedelta(days=500), 500))
+
+    series = fetcher.fetch_daily_price_series("IBM", today - timedelta(days=20), today)
+
+    assert fetcher.requests == ['compact']
+    assert series.dates[-1] == np.datetime64(today - timedelta(days=1))
+    assert len(cache.load("IBM").series) == 500
@@ -0,0 +1,80 @@
+import pytest
+import numpy as np
+from datetime import date, datetime
+from app.price_series import PriceSeries
+from app.data_processor import DataProcessor
+from app.formatting import FormatStyle, FormattingRule, FormattingRuleFactory
+
+@pytest.fixture
+def stock_data():
+    return {
+        "stock_symbol": "IBM",
+        date(2023, 1, 3): {"open": 104, "high": 106, "low": 103, "close": 105},
+        date(2023, 1, 1): {"open": 99, "high": 101, "low": 98, "close": 100},
+        date(2023, 1, 2): {"open": 100, "high": 103, "low": 99, "close": 102},
+        date(2023, 1, 4): {"open": 105, "high": 105, "low": 102, "close": 103},
+    }
+
+def test_from_dict_sorts_and_keeps_symbol(stock_data):
+    series = PriceSeries.from_dict(stock_data)
+
+    assert series.symbol == "IBM"
+    assert len(series) == 4
+    assert series.date_list() == [date(2023, 1, 1), date(2023, 1, 2), date(2023, 1, 3), date(2023, 1, 4)]
+    assert series.close.tolist() == [100, 102, 105, 103]
+    assert series.close.flags["C_CONTIGUOUS"]
+
+def test_to_dict_round_trip(stock_data):
+    assert PriceSeries.from_dict(stock_data).to_dict() == stock_data
+
+def test_to_frame(stock_data):
+    pytest.importorskip("pandas")
+    series = PriceSeries.from_dict(stock_data)
+
+    frame = series.to_frame(percent_change=np.arange(4.0))
+
+    assert list(frame.columns) == ["open", "high", "low", "close", "percent_change"]
+    assert list(frame.index) == series.date_list()
+    assert frame["close"].tolist() == [100, 102, 105, 103]
+
+def test_missing_columns_become_nan():
+    series = PriceSeries.from_dict({datetime(2023, 1, 1): {"close": 100}})
+
+    assert series.close.tolist() == [100]
+    assert np.isnan(series.open[0])
+
+def test_mapping_access(stock_data):
+    series = PriceSeries.from_dict(stock_data)
+
+    assert series["stock_symbol"] == "IBM"
+    assert series[date(2023, 1, 2)]["close"] == 102
+    assert series[datetime(2023, 1, 2)]["high"] == 103
+    assert date(2023, 1, 5) not in series
+    with pytest.raises(KeyError):
+        series[date(2023, 1, 5)]
+
+def test_between_is_inclusive(stock_data):
+    series = PriceSeries.from_dict(stock_data)
+
+    window = series.between(date(2023, 1, 2), date(2023, 1, 3))
+
+    assert window.date_list() == [date(2023, 1, 2), date(2023, 1, 3)]
+    assert np.shares_memory(window.close, series.close)
+
+def test_processor_accepts_series(stock_data):
+    series = PriceSeries.from_dict(stock_data)
+
+    assert DataProcessor.calculate_daily_percent_changes(series) == DataProcessor.calculate_daily_percent_changes(stock_data)
+    assert DataProcessor.check_cumulative_change(series, 2, 2.5) == DataProcessor.check_cumulative_change(stock_data, 2, 2.5)
+
+def test_formatting_rules_accept_series(stock_data):
+    series = PriceSeries.from_dict(stock_data)
+    style = FormatStyle(columns="close", background_color="green")
+    rules = [
+        FormattingRule(lambda data, date: data[date]["close"] > 101, style),
+        FormattingRuleFactory.threshold_change_rule(2.5, "positive", "close", style),
+    ]
+
+    prices = {day: values for day, values in stock_data.items() if day != "stock_symbol"}
+    for rule in rules:
+        assert rule.apply(series) == rule.apply(prices)
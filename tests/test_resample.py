@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+import openpyxl
+from datetime import date, timedelta
+from app.price_series import PriceSeries
+from app.resample import bar_starts, parse_frequency, resample
+from app.spreadsheet_manager import SpreadSheetManager
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(3)
+    days = np.datetime64('2023-01-02') + np.arange(400)
+    # Weekdays only, with a few holidays missing
+    days = days[(days.astype(np.int64) + 3) % 7 < 5]
+    days = np.delete(days, [0, 10, 11, 57, 140])
+    opens = 100 + rng.normal(size=days.size).cumsum()
+    closes = opens + rng.normal(size=days.size)
+    highs = np.maximum(opens, closes) + rng.random(days.size)
+    lows = np.minimum(opens, closes) - rng.random(days.size)
+    return PriceSeries(days, opens, highs, lows, closes, "SYN")
+
+def grouped(series, key):
+    groups = {}
+    for i, day in enumerate(series.date_list()):
+        groups.setdefault(key(day), []).append(i)
+    return list(groups.items())
+
+def check_bars(bars, series, groups):
+    assert len(bars) == len(groups)
+    for i, (label, rows) in enumerate(groups):
+        assert bars.dates[i] == np.datetime64(label, 'D')
+        assert bars.open[i] == series.open[rows[0]]
+        assert bars.high[i] == series.high[rows].max()
+        assert bars.low[i] == series.low[rows].min()
+        assert bars.close[i] == series.close[rows[-1]]
+
+def test_weekly_bars_start_on_monday(series):
+    bars = resample(series, "weekly")
+
+    check_bars(bars, series, grouped(series, lambda day: day - timedelta(days=day.weekday())))
+    assert bars.dates[0] == np.datetime64('2023-01-02')
+    assert bars.symbol == "SYN"
+
+def test_monthly_and_n_day_bars(series):
+    check_bars(resample(series, "monthly"), series, grouped(series, lambda day: day.replace(day=1)))
+
+    bars = resample(series, "4d")
+    groups = [(series.dates[i].astype(object), list(range(i, min(i + 4, len(series)))))
+              for i in range(0, len(series), 4)]
+    check_bars(bars, series, groups)
+
+def test_daily_and_empty_series_are_unchanged(series):
+    assert resample(series, "daily") is series
+    assert resample(series, "1d") is series
+    assert len(resample(PriceSeries.empty(), "weekly")) == 0
+    assert bar_starts(series.dates[:0], "monthly").size == 0
+
+def test_parse_frequency():
+    assert parse_frequency("Weekly") == "weekly"
+    assert parse_frequency(5) == "5d"
+    assert parse_frequency("10d") == "10d"
+    for value in ("hourly", "0d", "-3d", "d"):
+        with pytest.raises(ValueError):
+            parse_frequency(value)
+
+class SeriesFetcher:
+    def __init__(self, series):
+        self.series = series
+
+    def fetch_daily_price_series(self, symbol, date_start, date_end):
+        return self.series
+
+def test_weekly_report(series, tmp_path):
+    manager = SpreadSheetManager("key", cache_dir=None)
+    manager.stock_data_fetcher = SeriesFetcher(series)
+    user_input = {
+        "symbol": "SYN",
+        "start_date": date(2023, 1, 1),
+        "end_date": date(2024, 3, 1),
+        "consecutive_change": {"days": 2},
+        "daily_threshold": {"percent": 2},
+        "period_change": {"percent": 5, "days": 4},
+        "file_path": str(tmp_path / "weekly.xlsx"),
+        "frequency": "weekly",
+    }
+
+    manager.create_excel_file(user_input)
+
+    rows = list(openpyxl.load_workbook(user_input["file_path"])["Stock Data"].values)[1:]
+    weekly = resample(series, "weekly")
+    assert len(rows) == len(weekly)
+    assert [row[4] for row in rows] == pytest.approx(weekly.close.tolist())
+    with pytest.raises(ValueError):
+        manager.update_excel_file(user_input)
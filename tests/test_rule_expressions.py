@@ -0,0 +1,109 @@
+import pytest
+import numpy as np
+from app.data_processor import DataProcessor
+from app.excel_writer import render_sheet
+from app.formatting import FormatStyle, RuleContext
+from app.price_series import PriceSeries
+from app.rule_expressions import (And, Condition, CumulativeChange, DailyChange, Or, Streak, expression_rule,
+                                  parse_condition)
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+@pytest.fixture
+def series():
+    closes = synthetic_series(1500, seed=11).close
+    closes[40:45] = closes[39]
+    closes[300] = 0.0
+    dates = np.datetime64('2001-01-01') + np.arange(closes.size)
+    return PriceSeries(dates, closes, closes, closes, closes)
+
+@pytest.mark.parametrize("num_days", [0, 1, 3, 7])
+@pytest.mark.parametrize("direction", ["positive", "negative"])
+def test_leaves_match_report_rule_masks(series, num_days, direction):
+    context = RuleContext(series)
+    percent_changes = context.percent_changes
+
+    assert np.array_equal(Streak(num_days, direction).evaluate(context),
+                          DataProcessor.consecutive_change_mask(percent_changes, num_days, direction))
+    assert np.array_equal(DailyChange(num_days * 0.5, direction).evaluate(context),
+                          DataProcessor.threshold_change_mask(percent_changes, num_days * 0.5, direction))
+    assert np.array_equal(CumulativeChange(num_days, -num_days).evaluate(context),
+                          DataProcessor.cumulative_change_mask(series.close, num_days, -num_days))
+
+def test_combinations_share_intermediates(series, monkeypatch):
+    calls = []
+    streak_lengths = DataProcessor.streak_lengths
+    monkeypatch.setattr(DataProcessor, "streak_lengths", lambda moves: calls.append(1) or streak_lengths(moves))
+    context = RuleContext(series)
+    condition = parse_condition("streak(3, up) and daily(2, up) or cumulative(10, 8)")
+    rules = [expression_rule(condition, "close", FormatStyle("close", "green")),
+             expression_rule("streak(5, up) and not cumulative(10, 8)", "open", FormatStyle("open", "red")),
+             expression_rule("cumulative(10, 8) or daily(2, up) & streak(3, up)", "low", FormatStyle("low", "red"))]
+
+    masks = [rule.evaluate(context) for rule in rules]
+
+    percent_changes = context.percent_changes
+    streak = DataProcessor.consecutive_change_mask(percent_changes, 3, "positive")
+    daily = DataProcessor.threshold_change_mask(percent_changes, 2, "positive")
+    cumulative = DataProcessor.cumulative_change_mask(series.close, 10, 8)
+    assert np.array_equal(masks[0], streak & daily | cumulative)
+    assert np.array_equal(masks[1], DataProcessor.consecutive_change_mask(percent_changes, 5, "positive") & ~cumulative)
+    assert masks[2] is masks[0]
+    assert len(calls) == 1
+
+def test_near_equal_thresholds_keep_their_own_masks(series):
+    context = RuleContext(series)
+    largest = float(np.nanmax(context.percent_changes))
+    below, above = (expression_rule(DailyChange(largest + offset, "up"), "close", FormatStyle("close", "green"))
+                    for offset in (-1e-9, 1e-9))
+
+    assert below.params["expression"] == above.params["expression"]
+    assert below.evaluate(context).sum() == 1
+    assert above.evaluate(context).sum() == 0
+
+def test_parse_and_print_round_trip():
+    condition = parse_condition("NOT (streak(3, up) or daily(1.5, down)) and cumulative(10, -8)")
+
+    assert str(condition) == "not (streak(3, up) or daily(1.5, down)) and cumulative(10, 8)"
+    assert parse_condition(str(condition)) == condition
+    assert Streak(2, "up") & (DailyChange(1, "up") | CumulativeChange(5, 4)) == \
+        parse_condition("streak(2, up) and (daily(1, up) or cumulative(5, 4))")
+    assert isinstance(parse_condition("streak(2, up) | streak(2, down) | daily(3, up)"), Or)
+    assert len(parse_condition("streak(2, up) & (streak(2, down) & daily(3, up))").children) == 3
+    assert isinstance(Streak(2, "up") & Streak(3, "up"), And)
+
+def test_conditions_need_key_and_compute():
+    class Unfinished(Condition):
+        def key(self):
+            return ("unfinished",)
+
+    with pytest.raises(TypeError):
+        Unfinished()
+
+@pytest.mark.parametrize("text", ["streak(3)", "streak(up, 3)", "daily(2, sideways)", "volume(3, up)",
+                                  "streak(3, up) and", "(streak(3, up)", "streak(3, up) $ daily(1, up)", ""])
+def test_parse_errors(text):
+    with pytest.raises(ValueError):
+        parse_condition(text)
+
+def test_custom_rules_follow_report_rules_in_precedence(series):
+    user_input = {
+        "consecutive_change": {"days": 3},
+        "daily_threshold": {"percent": 1.5},
+        "period_change": {"percent": 4, "days": 5},
+        "custom_rules": [
+            {"expression": "daily(0, up)", "columns": ["close"], "background_color": "red"},
+            {"expression": "streak(2, up)", "columns": ["close", "percent_change"], "background_color": "black"},
+        ],
+    }
+    rules = SpreadSheetManager.build_formatting_rules(user_input)
+
+    sheet = render_sheet(series, rules)
+
+    assert [rule.kind for rule in rules[-2:]] == ["expression", "expression"]
+    context = RuleContext(series)
+    up = DataProcessor.threshold_change_mask(context.percent_changes, 0, "positive")
+    streak = DataProcessor.consecutive_change_mask(context.percent_changes, 2, "positive")
+    close = sheet.cell_styles[:, sheet.columns.index("close")]
+    assert np.all(close[streak] == sheet.styles.index(("black", "black", True)))
+    assert np.all(close[up & ~streak] == sheet.styles.index(("red", "black", True)))
@@ -0,0 +1,95 @@
+import numpy as np
+import openpyxl
+from app.price_series import PriceSeries
+from app.screener import SIGNALS, PriceMatrix, screen, screen_lookback, write_screen_workbook
+from app.spreadsheet_manager import SpreadSheetManager
+from app.synthetic import synthetic_series
+
+RULE_PARAMETERS = {
+    "consecutive_change": {"days": 2},
+    "daily_threshold": {"percent": 1.0},
+    "period_change": {"percent": 3, "days": 4},
+}
+
+def universe(count=200, rows=60):
+    """Series with gaps, late listings, stale symbols, flat days and zero closes."""
+    rng = np.random.default_rng(1)
+    universe = []
+    for i in range(count):
+        series = synthetic_series(rows, symbol=f"S{i}", seed=i, start="2020-01-01")
+        keep = rng.random(rows) > 0.1
+        keep[:rng.integers(0, rows)] &= i % 7 != 0
+        if i % 11 == 0:
+            keep[-1] = False
+        closes = series.close.copy()
+        if i % 13 == 0:
+            closes[-3:] = closes[-4]
+        if i % 17 == 0:
+            closes[-2] = 0.0
+        universe.append(PriceSeries(series.dates[keep], closes[keep], closes[keep], closes[keep], closes[keep],
+                                    series.symbol))
+    return universe
+
+def test_screen_matches_each_symbols_last_row():
+    series = universe()
+    matrix = PriceMatrix.from_series(series)
+    rules = SpreadSheetManager.build_formatting_rules(RULE_PARAMETERS)
+
+    result = screen(matrix, RULE_PARAMETERS)
+
+    for column, s in enumerate(series):
+        traded = len(s) > 0 and s.dates[-1] == matrix.dates[-1]
+        expected = [bool(traded and rule.evaluate(s)[-1]) for rule in rules]
+        assert result.matches[column].tolist() == expected, s.symbol
+    assert result.matches.any(axis=1).sum() == len(result.ranking)
+    assert 0 < len(result.ranking) < len(series)
+
+def test_streaks_skip_missing_days_and_ranking_puts_most_signals_first():
+    dates = np.datetime64('2021-03-01') + np.arange(5)
+    up = np.array([10.0, 11.0, 12.0, 13.0, 14.0])
+    series = [
+        PriceSeries(dates[[0, 1, 3, 4]], up[[0, 1, 3, 4]], up[[0, 1, 3, 4]], up[[0, 1, 3, 4]], up[[0, 1, 3, 4]], "GAP"),
+        PriceSeries(dates, up[::-1], up[::-1], up[::-1], up[::-1], "DOWN"),
+        PriceSeries(dates[:4], up[:4], up[:4], up[:4], up[:4], "STALE"),
+        PriceSeries(dates, np.full(5, 10.0), np.full(5, 10.0), np.full(5, 10.0), np.full(5, 10.0), "FLAT"),
+    ]
+
+    result = screen(PriceMatrix.from_series(series), RULE_PARAMETERS)
+
+    assert result.as_of == dates[-1].astype(object)
+    assert result.streak.tolist() == [3, -4, 3, 0]
+    # Three signals each; GAP's 40% over four days outranks DOWN's 23% fall
+    assert [row["symbol"] for row in result.table()] == ["GAP", "DOWN"]
+    assert result.table()[1]["signals"] == ["cumulative", "consecutive_down", "threshold_down"]
+
+def test_lookback_keeps_the_last_dates():
+    series = universe(count=5, rows=30)
+
+    matrix = PriceMatrix.from_series(series, lookback=10)
+
+    assert matrix.closes.shape == (10, 5)
+    assert matrix.dates[-1] == max(s.dates[-1] for s in series)
+
+def test_trailing_window_screens_like_the_full_history():
+    series = universe()
+    lookback = screen_lookback(RULE_PARAMETERS)
+
+    full = screen(PriceMatrix.from_series(series), RULE_PARAMETERS)
+    trailing = screen(PriceMatrix.from_series([s[-lookback:] for s in series]), RULE_PARAMETERS)
+
+    assert np.array_equal(trailing.matches, full.matches)
+    assert np.array_equal(trailing.ranking, full.ranking)
+    np.testing.assert_array_equal(trailing.cumulative_change, full.cumulative_change)
+    np.testing.assert_array_equal(trailing.percent_change, full.percent_change)
+    assert np.array_equal(trailing.streak, np.clip(full.streak, 1 - lookback, lookback - 1))
+
+def test_write_screen_workbook(tmp_path):
+    result = screen(PriceMatrix.from_series(universe(count=20)), RULE_PARAMETERS)
+    file_name = str(tmp_path / "screen.xlsx")
+
+    write_screen_workbook(file_name, result)
+
+    rows = list(openpyxl.load_workbook(file_name)["Screen"].values)
+    assert rows[1] == ('symbol', 'close', 'percent_change', 'streak', 'cumulative_change', 'signals')
+    assert [row[0] for row in rows[2:]] == [row["symbol"] for row in result.table()]
+    assert all(set(row[5].split(', ')) <= set(SIGNALS) for row in rows[2:])
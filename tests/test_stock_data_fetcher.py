@@ -0,0 +1,103 @@
+import json
+import pytest
+from datetime import date
+from app.stock_data_fetcher import StockDataFetcher, ThrottledError
+
+PAYLOAD = {
+    "Meta Data": {"2. Symbol": "IBM"},
+    "Time Series (Daily)": {
+        "2023-01-05": {"1. open": "104.0", "2. high": "106.0", "3. low": "103.0", "4. close": "105.5", "5. volume": "10"},
+        "2023-01-04": {"1. open": "103.0", "2. high": "104.0", "3. low": "102.0", "4. close": "103.5", "5. volume": "10"},
+        "2023-01-03": {"1. open": "101.0", "2. high": "103.0", "3. low": "100.0", "4. close": "102.5", "5. volume": "10"},
+    },
+}
+
+CSV = """timestamp,open,high,low,close,volume
+2023-01-05,104.0,106.0,103.0,105.5,10
+2023-01-04,103.0,104.0,102.0,103.5,10
+2023-01-03,101.0,103.0,100.0,102.5,10
+"""
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, encoding=None):
+        self.body = body
+        self.status_code = status_code
+        self.encoding = encoding
+        self.lines_read = 0
+
+    @property
+    def content(self):
+        return self.body.encode()
+
+    def json(self):
+        return json.loads(self.body)
+
+    def iter_lines(self, decode_unicode=False):
+        # Like requests, lines are only decoded when the encoding is known
+        for line in self.body.encode().splitlines():
+            self.lines_read += 1
+            yield line.decode(self.encoding) if decode_unicode and self.encoding else line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+def fetcher_returning(response, **kwargs):
+    fetcher = StockDataFetcher("key", **kwargs)
+    fetcher.session.get = lambda url, params=None, stream=False: response
+    return fetcher
+
+def test_parse_json_time_series():
+    series = StockDataFetcher.parse_json_time_series(PAYLOAD)
+
+    assert series.symbol == "IBM"
+    assert series.date_list() == [date(2023, 1, 3), date(2023, 1, 4), date(2023, 1, 5)]
+    assert series.open.tolist() == [101.0, 103.0, 104.0]
+    assert series.close.tolist() == [102.5, 103.5, 105.5]
+
+def test_parse_json_time_series_stops_before_start():
+    series = StockDataFetcher.parse_json_time_series(PAYLOAD, date(2023, 1, 4))
+
+    assert series.date_list() == [date(2023, 1, 4), date(2023, 1, 5)]
+
+def test_csv_matches_json():
+    fetcher = fetcher_returning(FakeResponse(CSV), datatype="csv")
+
+    series = fetcher.request_time_series("IBM")
+    expected = StockDataFetcher.parse_json_time_series(PAYLOAD)
+
+    assert series.symbol == "IBM"
+    assert series.dates.tolist() == expected.dates.tolist()
+    for column in ("open", "high", "low", "close"):
+        assert getattr(series, column).tolist() == getattr(expected, column).tolist()
+
+def test_csv_without_charset_is_decoded():
+    response = FakeResponse(CSV)
+    fetcher = fetcher_returning(response, datatype="csv")
+
+    series = fetcher.request_time_series("IBM")
+
+    assert response.encoding == "utf-8"
+    assert series.close.tolist() == [102.5, 103.5, 105.5]
+
+def test_csv_stops_reading_before_start():
+    response = FakeResponse(CSV)
+    fetcher = fetcher_returning(response, datatype="csv")
+
+    series = fetcher.fetch_daily_price_series("IBM", date(2023, 1, 5), date(2023, 1, 31))
+
+    assert series.date_list() == [date(2023, 1, 5)]
+    assert response.lines_read == 3
+
+def test_csv_throttle_notice_raises():
+    fetcher = fetcher_returning(FakeResponse('{\n"Note": "API call frequency exceeded"\n}'), datatype="csv")
+
+    with pytest.raises(ThrottledError):
+        fetcher.request_time_series("IBM")
+
+def test_failed_request_returns_none():
+    fetcher = fetcher_returning(FakeResponse("", status_code=500))
+
+    assert fetcher.fetch_daily_price_series("IBM", date(2023, 1, 1), date(2023, 1, 31)) is None
@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+import openpyxl
+from app.data_processor import DataProcessor
+from app.price_series import PriceSeries
+from app.sweep import ParameterSweep, sweep_report, write_sweep_workbook
+from app.synthetic import synthetic_series
+
+@pytest.fixture
+def closes():
+    closes = synthetic_series(2000, seed=4).close
+    closes[50:60] = closes[49]
+    closes[500] = 0.0
+    return closes
+
+@pytest.fixture
+def sweep(closes):
+    dates = np.datetime64('2000-01-03') + np.arange(closes.size)
+    return ParameterSweep(PriceSeries(dates, closes, closes, closes, closes))
+
+NUM_DAYS = [0, 1, 2, 3, 5, 8, 3000]
+THRESHOLDS = [0, 0.5, 1, 2.5, -3]
+
+@pytest.mark.parametrize("direction", ["positive", "negative"])
+def test_threshold_and_streak_sweeps_match_rule_masks(sweep, closes, direction):
+    percent_changes = DataProcessor.daily_percent_change_array(closes)
+    thresholds = sweep.threshold(THRESHOLDS, direction)
+    streaks = sweep.consecutive(NUM_DAYS, direction)
+
+    for j, threshold in enumerate(THRESHOLDS):
+        expected = DataProcessor.threshold_change_mask(percent_changes, threshold, direction)
+        assert np.array_equal(thresholds.mask(0, j), expected)
+        assert thresholds.hits[0, j] == expected.sum()
+    for i, num_days in enumerate(NUM_DAYS):
+        expected = DataProcessor.consecutive_change_mask(percent_changes, num_days, direction)
+        assert np.array_equal(streaks.mask(i, 0), expected)
+        assert streaks.hits[i, 0] == expected.sum()
+
+def test_cumulative_sweep_matches_rule_masks(sweep, closes):
+    result = sweep.cumulative(NUM_DAYS, THRESHOLDS)
+    masks = result.masks()
+
+    assert result.hits.shape == (len(NUM_DAYS), len(THRESHOLDS))
+    for i, num_days in enumerate(NUM_DAYS):
+        for j, threshold in enumerate(THRESHOLDS):
+            expected = DataProcessor.cumulative_change_mask(closes, num_days, threshold)
+            assert np.array_equal(masks[i, j], expected)
+            assert result.hits[i, j] == expected.sum()
+
+def test_rolling_max():
+    values = np.random.default_rng(1).normal(size=50)
+
+    for window in (1, 2, 7, 50):
+        expected = [values[i:i + window].max() for i in range(values.size - window + 1)]
+        assert np.array_equal(DataProcessor.rolling_max(values, window), expected)
+    assert DataProcessor.rolling_max(values, 51).size == 0
+
+def test_summary_workbook(tmp_path):
+    results = sweep_report(synthetic_series(300), [2, 3], [1, 2, 3])
+    file_name = str(tmp_path / "sweep.xlsx")
+
+    write_sweep_workbook(file_name, results)
+
+    rows = list(openpyxl.load_workbook(file_name)["Sweep"].values)
+    assert rows[0][0] == "consecutive_change (positive): rows highlighted of 300"
+    cumulative = rows.index(("cumulative_change: rows highlighted of 300", None, None, None))
+    assert rows[cumulative + 2] == (2,) + tuple(results[-1].hits[0].tolist())
@@ -0,0 +1,23 @@
+import numpy as np
+from app.synthetic import synthetic_series
+
+def test_prices_are_consistent():
+    series = synthetic_series(5000, seed=3)
+
+    assert len(series) == 5000
+    assert np.all(series.high >= np.maximum(series.open, series.close))
+    assert np.all(series.low <= np.minimum(series.open, series.close))
+    assert np.all(series.low > 0)
+
+def test_dates_are_consecutive_business_days():
+    series = synthetic_series(30, start="2023-01-01")
+
+    assert series.dates[0] == np.datetime64("2023-01-02")
+    assert np.all(np.is_busday(series.dates))
+    assert np.all(np.diff(series.dates) > np.timedelta64(0, 'D'))
+
+def test_same_seed_gives_same_series():
+    first, second = synthetic_series(100, seed=7), synthetic_series(100, seed=7)
+
+    assert np.array_equal(first.close, second.close)
+    assert not np.array_equal(first.close, synthetic_series(100, seed=8).close)
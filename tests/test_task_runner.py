@@ -0,0 +1,102 @@
+import threading
+import pytest
+import numpy as np
+from datetime import date
+from app.price_series import PriceSeries
+from app.spreadsheet_manager import SpreadSheetManager
+from app.task_runner import BackgroundRunner, ReportCancelled
+
+class FakeFetcher:
+    rate_limiter = None
+
+    def fetch_daily_price_series(self, stock_symbol, date_start, date_end):
+        closes = 100 + np.cumsum(np.sin(np.arange(40)))
+        dates = np.datetime64('2023-01-02') + np.arange(closes.size)
+        return PriceSeries(dates, closes, closes + 1, closes - 1, closes, stock_symbol)
+
+def user_input(file_path):
+    return {
+        "symbol": "IBM",
+        "start_date": date(2023, 1, 1),
+        "end_date": date(2023, 3, 1),
+        "consecutive_change": {"days": 3},
+        "daily_threshold": {"percent": 0.5},
+        "period_change": {"percent": 1, "days": 4},
+        "file_path": file_path,
+    }
+
+@pytest.fixture
+def runner():
+    runner = BackgroundRunner()
+    yield runner
+    runner.shutdown(wait=True)
+
+def wait_for(runner):
+    runner.jobs.join()
+    runner.dispatch_events()
+
+def test_jobs_run_in_order_and_callbacks_wait_for_dispatch(runner):
+    results = []
+    runner.submit(lambda progress: 1, on_done=results.append)
+    runner.submit(lambda progress: 2, on_done=results.append)
+    runner.jobs.join()
+
+    assert results == []
+    runner.dispatch_events()
+    assert results == [1, 2]
+    assert not runner.busy
+
+def test_errors_are_reported(runner):
+    errors = []
+    def fail(progress):
+        raise ValueError("boom")
+
+    runner.submit(fail, on_error=errors.append)
+    wait_for(runner)
+
+    assert [str(e) for e in errors] == ["boom"]
+
+def test_cancel_stops_running_job(runner):
+    started = threading.Event()
+    release = threading.Event()
+    outcome = []
+    def work(progress):
+        progress("fetch", 0.0)
+        started.set()
+        release.wait()
+        progress("write", 0.5)
+        return "finished"
+
+    runner.submit(work, on_done=outcome.append, on_cancelled=lambda: outcome.append("cancelled"))
+    runner.submit(lambda progress: "next", on_done=outcome.append)
+    started.wait()
+    runner.cancel()
+    release.set()
+    wait_for(runner)
+
+    assert outcome == ["cancelled", "next"]
+
+def test_progress_stages(tmp_path):
+    manager = SpreadSheetManager("key", cache_dir=None)
+    manager.stock_data_fetcher = FakeFetcher()
+    stages = []
+
+    manager.create_excel_file(user_input(str(tmp_path / "report.xlsx")),
+                              lambda stage, fraction: stages.append((stage, fraction)))
+
+    assert [stage for stage, _ in stages][:3] == ["fetch", "process", "write"]
+    assert stages[-1] == ("done", 1.0)
+    fractions = [fraction for _, fraction in stages]
+    assert fractions == sorted(fractions)
+
+def test_cancelled_write_leaves_no_file(tmp_path):
+    manager = SpreadSheetManager("key", cache_dir=None)
+    manager.stock_data_fetcher = FakeFetcher()
+    file_name = tmp_path / "report.xlsx"
+    def progress(stage, fraction):
+        if stage == "write" and fraction > 0.5:
+            raise ReportCancelled()
+
+    with pytest.raises(ReportCancelled):
+        manager.create_excel_file(user_input(str(file_name)), progress)
+    assert not file_name.exists()